@@ -0,0 +1,177 @@
+"""Benchmark et fuzzing du pipeline de réparation JSON des réponses LLM.
+
+Mesure, sur un corpus de sorties LLM réelles ou typiques (tronquées, en bloc
+markdown, virgules finales, guillemets simples, fermetures inversées...):
+
+- le débit (Mo/s) d'``extract_json_payload`` + ``safe_json_loads``;
+- le taux d'utilisation de chaque étape (extraction, chemin rapide, réparation);
+- le taux de réparation réussie (résultat identique à la valeur attendue);
+- la robustesse sur des variantes générées aléatoirement (aucune exception
+  autre que ValueError, valeurs préservées: une URL non quotée ne doit pas
+  être tronquée au ``//``).
+
+Les seuils de non-régression (``THRESHOLDS``) sont vérifiés par les tests.
+"""
+import json
+import os
+import random
+import re
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.utils.json_utils import extract_json_payload, safe_json_loads
+
+CORPUS_PATH = Path(__file__).parent / "corpus.jsonl"
+
+# Seuils de non-régression (le débit minimal peut être ajusté pour des machines lentes)
+THRESHOLDS = {
+    "repair_success_rate": 0.9,
+    "fuzz_crashes": 0,
+    "fuzz_preserved_rate": 0.95,
+    "min_throughput_mb_s": float(os.getenv("JSON_BENCH_MIN_MB_S", "1.0")),
+}
+
+
+def load_corpus(path: Path = CORPUS_PATH) -> List[Dict]:
+    """Charge le corpus (une sortie LLM par ligne: id, category, raw, expected)"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def parse_llm_output(raw: str, stages: Optional[Counter] = None) -> Any:
+    """Pipeline complet utilisé par les agents: extraction puis parsing tolérant"""
+    return safe_json_loads(extract_json_payload(raw, stages), stages)
+
+
+def _attempt(raw: str, stages: Optional[Counter] = None):
+    """Retourne (valeur, erreur) sans propager les ValueError attendues"""
+    try:
+        return parse_llm_output(raw, stages), None
+    except ValueError as exc:
+        return None, exc
+
+
+# Valeur texte d'un objet qui reste non ambiguë une fois ses guillemets retirés (URL, phrase)
+_UNQUOTABLE = re.compile(r'(?<=": )"([^"\\\n,{}\[\]]+)"')
+_NOT_TEXT = re.compile(r"[-+.\deE]+|true|false|null|none", re.IGNORECASE)
+
+
+def _unquoted_value(rng: random.Random, text: str) -> List[Dict]:
+    """Retire les guillemets d'une valeur texte (les URL ne doivent pas être coupées au //)"""
+    candidates = [
+        match for match in _UNQUOTABLE.finditer(text)
+        if match.group(1).strip() == match.group(1) and not _NOT_TEXT.fullmatch(match.group(1))
+        and " //" not in match.group(1) and " /*" not in match.group(1)
+    ]
+    if not candidates:
+        return []
+    match = rng.choice(candidates)
+    raw = text[:match.start()] + match.group(1) + text[match.end():]
+    return [{"kind": "unquoted_value", "preserving": True, "raw": raw}]
+
+
+def _mutations(rng: random.Random, text: str) -> List[Dict]:
+    """Variantes d'un JSON valide; preserving=True si la valeur doit rester identique"""
+    closers = [idx for idx, char in enumerate(text) if char in "}]"]
+    closer = rng.choice(closers)
+    swapped = "]" if text[closer] == "}" else "}"
+    cut = rng.randrange(1, len(text))
+
+    return _unquoted_value(rng, text) + [
+        {"kind": "fenced", "preserving": True, "raw": f"```json\n{text}\n```"},
+        {"kind": "prose", "preserving": True, "raw": f"Voici le résultat :\n{text}\nBonne chance !"},
+        {"kind": "trailing_comma", "preserving": True, "raw": text[:closer] + "," + text[closer:]},
+        {"kind": "truncated", "preserving": False, "raw": text[:cut]},
+        {"kind": "swapped_closer", "preserving": False, "raw": text[:closer] + swapped + text[closer + 1:]},
+        {"kind": "dropped_closer", "preserving": False, "raw": text[:closer] + text[closer + 1:]},
+    ]
+
+
+def run_fuzz(corpus: List[Dict], rounds: int = 50, seed: int = 0) -> Dict:
+    """Applique des mutations aléatoires (déterministes) aux exemples valides du corpus"""
+    rng = random.Random(seed)
+    seeds = [case["expected"] for case in corpus if case["category"] == "valid"]
+    kinds = Counter()
+    preserving = 0
+    preserved = 0
+    crashes = []
+
+    for _ in range(rounds):
+        expected = rng.choice(seeds)
+        text = json.dumps(expected, ensure_ascii=False, indent=rng.choice([None, 2]))
+        for mutation in _mutations(rng, text):
+            kinds[mutation["kind"]] += 1
+            try:
+                value, _ = _attempt(mutation["raw"])
+            except Exception as exc:  # toute autre exception est un bug du parser
+                crashes.append({"kind": mutation["kind"], "raw": mutation["raw"], "error": repr(exc)})
+                continue
+            if mutation["preserving"]:
+                preserving += 1
+                preserved += value == expected
+
+    return {
+        "cases": sum(kinds.values()),
+        "by_kind": dict(kinds),
+        "crashes": len(crashes),
+        "crash_samples": crashes[:5],
+        "preserved_rate": preserved / preserving if preserving else 1.0,
+    }
+
+
+def run_benchmark(corpus: Optional[List[Dict]] = None, repeat: int = 200,
+                  fuzz_rounds: int = 50) -> Dict:
+    """Mesure débit, taux par étape et taux de réparation sur le corpus"""
+    corpus = corpus if corpus is not None else load_corpus()
+
+    # 1. Exactitude et étapes utilisées (une passe)
+    stages = Counter()
+    failures = []
+    by_category: Dict[str, Counter] = {}
+    for case in corpus:
+        value, error = _attempt(case["raw"], stages)
+        # Un exemple sans JSON doit être rejeté (expected = null)
+        ok = error is not None if case["expected"] is None else value == case["expected"]
+        counter = by_category.setdefault(case["category"], Counter())
+        counter["total"] += 1
+        counter["ok"] += ok
+        if not ok:
+            failures.append({"id": case["id"], "got": value, "error": str(error) if error else None})
+
+    # 2. Débit du pipeline complet
+    payload_bytes = sum(len(case["raw"].encode("utf-8")) for case in corpus)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for case in corpus:
+            _attempt(case["raw"])
+    elapsed = time.perf_counter() - started
+
+    parses = stages["parse.fast"] + stages["parse.repair"] + stages["parse.failed"]
+    return {
+        "cases": len(corpus),
+        "throughput_mb_s": payload_bytes * repeat / elapsed / 1e6 if elapsed else float("inf"),
+        "mean_us_per_payload": elapsed / (repeat * len(corpus)) * 1e6 if corpus else 0.0,
+        "stage_hit_rates": {stage: count / parses for stage, count in sorted(stages.items())} if parses else {},
+        "repair_success_rate": (len(corpus) - len(failures)) / len(corpus) if corpus else 1.0,
+        "by_category": {
+            category: counter["ok"] / counter["total"] for category, counter in sorted(by_category.items())
+        },
+        "failures": failures,
+        "fuzz": run_fuzz(corpus, rounds=fuzz_rounds),
+    }
+
+
+def check_thresholds(report: Dict, thresholds: Dict = THRESHOLDS) -> List[str]:
+    """Retourne la liste des seuils de non-régression non respectés"""
+    violations = []
+    if report["repair_success_rate"] < thresholds["repair_success_rate"]:
+        violations.append(f"repair_success_rate {report['repair_success_rate']:.3f} < {thresholds['repair_success_rate']}")
+    if report["fuzz"]["crashes"] > thresholds["fuzz_crashes"]:
+        violations.append(f"fuzz_crashes {report['fuzz']['crashes']} > {thresholds['fuzz_crashes']}")
+    if report["fuzz"]["preserved_rate"] < thresholds["fuzz_preserved_rate"]:
+        violations.append(f"fuzz_preserved_rate {report['fuzz']['preserved_rate']:.3f} < {thresholds['fuzz_preserved_rate']}")
+    if report["throughput_mb_s"] < thresholds["min_throughput_mb_s"]:
+        violations.append(f"throughput {report['throughput_mb_s']:.2f} MB/s < {thresholds['min_throughput_mb_s']}")
+    return violations
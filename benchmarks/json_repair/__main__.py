@@ -0,0 +1,43 @@
+"""Usage: python -m benchmarks.json_repair [--repeat N] [--fuzz-rounds N] [--json]"""
+import argparse
+import json
+import sys
+
+from benchmarks.json_repair import check_thresholds, run_benchmark
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark du pipeline de réparation JSON")
+    parser.add_argument("--repeat", type=int, default=200, help="passes de mesure du débit")
+    parser.add_argument("--fuzz-rounds", type=int, default=200, help="nombre de graines mutées")
+    parser.add_argument("--json", action="store_true", help="rapport brut en JSON")
+    args = parser.parse_args()
+
+    report = run_benchmark(repeat=args.repeat, fuzz_rounds=args.fuzz_rounds)
+    violations = check_thresholds(report)
+
+    if args.json:
+        print(json.dumps({**report, "violations": violations}, ensure_ascii=False, indent=2))
+    else:
+        print(f"Corpus: {report['cases']} sorties LLM")
+        print(f"Débit: {report['throughput_mb_s']:.2f} Mo/s ({report['mean_us_per_payload']:.1f} µs/sortie)")
+        print(f"Réparations réussies: {report['repair_success_rate']:.1%}")
+        print("Étapes:")
+        for stage, rate in report["stage_hit_rates"].items():
+            print(f"  {stage:<22} {rate:.1%}")
+        print("Par catégorie:")
+        for category, rate in report["by_category"].items():
+            print(f"  {category:<22} {rate:.1%}")
+        for failure in report["failures"]:
+            print(f"  ÉCHEC {failure['id']}: {failure['got']!r} {failure['error'] or ''}")
+        fuzz = report["fuzz"]
+        print(f"Fuzzing: {fuzz['cases']} variantes, {fuzz['crashes']} crashs, "
+              f"{fuzz['preserved_rate']:.1%} de valeurs préservées")
+        for violation in violations:
+            print(f"RÉGRESSION: {violation}")
+
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""Profil du temps de démarrage: temps d'import à froid des points d'entrée.
+
+Chaque module est importé dans un interpréteur neuf avec ``python -X importtime``:
+
+- temps d'import total (médiane sur plusieurs démarrages à froid);
+- modules les plus coûteux (temps propre, comme la sortie de ``-X importtime``);
+- modules lourds chargés alors qu'ils doivent l'être à la première utilisation
+  (langgraph, chromadb, langfuse, httpx, PyPDF2, docx...).
+
+Les seuils de non-régression (``THRESHOLDS``) sont vérifiés par les tests; une
+référence enregistrée (``--save-baseline``) permet de détecter une dérive relative.
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[2]
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+# Point d'entrée -> modules lourds qu'il ne doit pas importer à froid
+ENTRY_POINTS = {
+    "src.ui.streamlit_app": ["langgraph", "langchain_chroma", "chromadb", "langfuse", "httpx",
+                             "PyPDF2", "docx", "langchain_openai"],
+    "src.tools.document_parser": ["PyPDF2", "docx"],
+    "src.tools.vector_store": ["chromadb", "langchain_chroma", "langchain"],
+    "src.tools.web_search": ["httpx"],
+    "src.utils.langfuse_config": ["langfuse"],
+}
+
+# Seuils de non-régression (le temps maximal peut être ajusté pour des machines lentes)
+THRESHOLDS = {
+    "max_import_ms": float(os.getenv("STARTUP_BENCH_MAX_MS", "3000")),
+    # Dérive tolérée par rapport à la référence enregistrée
+    "max_baseline_ratio": float(os.getenv("STARTUP_BENCH_MAX_RATIO", "1.5")),
+}
+
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Lignes de ``-X importtime``: module, temps propre et cumulé (µs), profondeur"""
+    entries = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append({
+                "module": module,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": (len(indent) - 1) // 2,
+            })
+    return entries
+
+
+def profile_import(module: str, top: int = 10) -> Dict:
+    """Importe un module dans un interpréteur neuf et retourne son profil d'import"""
+    code = (
+        "import sys, time\n"
+        "started = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - started)\n"
+    )
+    python_path = os.pathsep.join(filter(None, [str(ROOT), os.getenv("PYTHONPATH")]))
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, env={**os.environ, "PYTHONPATH": python_path}
+    )
+    entries = parse_importtime(process.stderr)
+    if process.returncode != 0:
+        error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else "import failed"
+        return {"module": module, "error": error, "entries": len(entries)}
+
+    loaded = {entry["module"] for entry in entries}
+    return {
+        "module": module,
+        "error": None,
+        "import_ms": float(process.stdout.strip().splitlines()[-1]) * 1000,
+        "modules_loaded": len(loaded),
+        "slowest": [
+            {"module": entry["module"], "self_ms": entry["self_us"] / 1000,
+             "cumulative_ms": entry["cumulative_us"] / 1000}
+            for entry in sorted(entries, key=lambda entry: entry["self_us"], reverse=True)[:top]
+        ],
+        "eager_heavy": sorted(
+            name for name in ENTRY_POINTS.get(module, []) if name in loaded
+        ),
+    }
+
+
+def run_benchmark(modules: Optional[List[str]] = None, repeat: int = 3, top: int = 10) -> Dict:
+    """Profile chaque point d'entrée sur ``repeat`` démarrages à froid (médiane du temps)"""
+    results = {}
+    for module in modules or list(ENTRY_POINTS):
+        runs = [profile_import(module, top) for _ in range(max(repeat, 1))]
+        failed = next((run for run in runs if run["error"]), None)
+        if failed is not None:
+            results[module] = failed
+            continue
+        fastest = min(runs, key=lambda run: run["import_ms"])
+        results[module] = {
+            **fastest,
+            "import_ms": statistics.median(run["import_ms"] for run in runs),
+        }
+    return {"python": sys.version.split()[0], "repeat": repeat, "modules": results}
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> Optional[Dict]:
+    """Référence enregistrée sur cette machine (None si absente)"""
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(report: Dict, path: Path = BASELINE_PATH) -> None:
+    """Enregistre le temps d'import de chaque point d'entrée comme référence"""
+    baseline = {
+        module: result["import_ms"]
+        for module, result in report["modules"].items()
+        if not result.get("error")
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def check_thresholds(report: Dict, thresholds: Dict = THRESHOLDS,
+                     baseline: Optional[Dict] = None) -> List[str]:
+    """Retourne la liste des seuils de non-régression non respectés"""
+    violations = []
+    for module, result in report["modules"].items():
+        if result.get("error"):
+            violations.append(f"{module}: {result['error']}")
+            continue
+        if result["eager_heavy"]:
+            violations.append(f"{module} importe à froid: {', '.join(result['eager_heavy'])}")
+        if result["import_ms"] > thresholds["max_import_ms"]:
+            violations.append(f"{module} import {result['import_ms']:.0f} ms > {thresholds['max_import_ms']:.0f} ms")
+        reference = (baseline or {}).get(module)
+        if reference and result["import_ms"] > reference * thresholds["max_baseline_ratio"]:
+            violations.append(
+                f"{module} import {result['import_ms']:.0f} ms > "
+                f"{thresholds['max_baseline_ratio']}x référence ({reference:.0f} ms)"
+            )
+    return violations
@@ -0,0 +1,41 @@
+"""Usage: python -m benchmarks.startup [--repeat N] [--top N] [--save-baseline] [--json]"""
+import argparse
+import json
+import sys
+
+from benchmarks.startup import ENTRY_POINTS, check_thresholds, load_baseline, run_benchmark, save_baseline
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Profil du temps d'import à froid des points d'entrée")
+    parser.add_argument("modules", nargs="*", help=f"modules à profiler (défaut: {', '.join(ENTRY_POINTS)})")
+    parser.add_argument("--repeat", type=int, default=3, help="démarrages à froid par module")
+    parser.add_argument("--top", type=int, default=10, help="modules les plus lents affichés")
+    parser.add_argument("--save-baseline", action="store_true", help="enregistre les temps comme référence")
+    parser.add_argument("--json", action="store_true", help="rapport brut en JSON")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.modules or None, repeat=args.repeat, top=args.top)
+    if args.save_baseline:
+        save_baseline(report)
+    violations = check_thresholds(report, baseline=load_baseline())
+
+    if args.json:
+        print(json.dumps({**report, "violations": violations}, ensure_ascii=False, indent=2))
+    else:
+        print(f"Python {report['python']}, médiane sur {report['repeat']} démarrages à froid")
+        for module, result in report["modules"].items():
+            if result.get("error"):
+                print(f"{module}: ÉCHEC {result['error']}")
+                continue
+            print(f"{module}: {result['import_ms']:.0f} ms, {result['modules_loaded']} modules")
+            for entry in result["slowest"]:
+                print(f"  {entry['self_ms']:8.1f} ms  {entry['cumulative_ms']:8.1f} ms  {entry['module']}")
+        for violation in violations:
+            print(f"RÉGRESSION: {violation}")
+
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+import contextlib
+import os
+import threading
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from src.utils.cache import llm_identity
+from src.utils.json_utils import extract_json_payload, safe_json_loads
+from src.utils.prompt_builder import PromptBuilder
+
+# Modes de sortie: texte libre (défaut), JSON mode du provider, ou schéma pydantic (tool calling)
+STRUCTURED_OUTPUT_MODES = ("text", "json", "schema")
+
+CONTINUATION_PROMPT = (
+    "Ta réponse a été coupée. Continue exactement là où tu t'es arrêté, "
+    "sans répéter ce qui précède ni ajouter de texte autour."
+)
+
+
+class AgentSession:
+    """Éléments propres à une session utilisateur: monitoring et callbacks de chaque agent"""
+
+    def __init__(self, monitor=None, user_id: str = "anonymous_user"):
+        self.monitor = monitor
+        self.user_id = user_id
+        self._callbacks: Dict[str, List] = {}
+        # Relances de sortie tronquée de la session, par agent
+        self.continuations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def callbacks(self, agent_name: str) -> List:
+        """Handlers de callbacks de l'agent pour cette session (créés au premier appel)"""
+        if not self.monitor:
+            return []
+        with self._lock:
+            if agent_name not in self._callbacks:
+                handler = self.monitor.get_callback_handler(agent_name, self.user_id)
+                self._callbacks[agent_name] = [handler] if handler else []
+            return self._callbacks[agent_name]
+
+    def record_continuation(self, agent_name: str) -> None:
+        """Compte une relance de sortie tronquée de l'agent dans cette session"""
+        with self._lock:
+            self.continuations[agent_name] = self.continuations.get(agent_name, 0) + 1
+
+
+# Session courante: les agents sont partagés par le process, le contexte suit chaque appel
+# (propagé aux threads des nœuds LangGraph et aux tâches asyncio)
+_current_session: ContextVar[Optional[AgentSession]] = ContextVar("agent_session", default=None)
+
+
+def set_agent_session(session: Optional[AgentSession]):
+    """Définit la session des appels d'agents du contexte courant"""
+    return _current_session.set(session)
+
+
+def current_agent_session() -> Optional[AgentSession]:
+    """Session des appels d'agents du contexte courant (None hors session)"""
+    return _current_session.get()
+
+
+@contextlib.contextmanager
+def agent_session(session: Optional[AgentSession]):
+    """Exécute les appels d'agents du bloc pour une session donnée"""
+    token = _current_session.set(session)
+    try:
+        yield session
+    finally:
+        _current_session.reset(token)
+
+
+class BaseAgent:
+    """Socle commun des agents: appels LLM (sync/async), callbacks et parsing JSON"""
+
+    agent_name = "agent"
+    # Nombre maximal de relances quand la sortie est coupée par max_tokens
+    max_continuations = int(os.getenv("LLM_MAX_CONTINUATIONS", "2"))
+
+    def __init__(self, llm, callbacks: Optional[List] = None, langfuse_monitor=None,
+                 structured_output: Optional[str] = None):
+        self.llm = llm
+        self.callbacks = callbacks or []
+        self.langfuse_monitor = langfuse_monitor
+        self.structured_output = (structured_output or "text").lower()
+        if self.structured_output not in STRUCTURED_OUTPUT_MODES:
+            raise ValueError(f"Mode de sortie inconnu: {structured_output}")
+        self._schema_llms: Dict[type, Any] = {}
+        # Total des relances de l'agent (partagé par les sessions, d'où le verrou)
+        self.continuations = 0
+        self._continuations_lock = threading.Lock()
+
+    def _output_llm(self, schema=None):
+        """LLM à appeler: contraint par le schéma pydantic en mode 'schema'"""
+        if self.structured_output != "schema" or schema is None:
+            return self.llm
+        if schema not in self._schema_llms:
+            self._schema_llms[schema] = self.llm.with_structured_output(schema)
+        return self._schema_llms[schema]
+
+    def _callbacks(self) -> List:
+        """Callbacks de l'agent et, si une session est active, ceux de la session"""
+        session = _current_session.get()
+        if session is None:
+            return self.callbacks
+        return [*self.callbacks, *session.callbacks(self.agent_name)]
+
+    def _monitor(self):
+        """Monitoring de la session courante, sinon celui fourni au constructeur"""
+        session = _current_session.get()
+        return session.monitor if session is not None else self.langfuse_monitor
+
+    def _record_continuation(self) -> None:
+        """Compte une relance: total de l'agent et compteur de la session courante"""
+        with self._continuations_lock:
+            self.continuations += 1
+        session = _current_session.get()
+        if session is not None:
+            session.record_continuation(self.agent_name)
+
+    def _run_config(self) -> Dict:
+        """Configuration LangChain transmise à chaque appel"""
+        callbacks = self._callbacks()
+        return {"callbacks": callbacks} if callbacks else {}
+
+    def _callback_context(self):
+        """Utilise le premier callback comme context manager s'il le supporte"""
+        callbacks = self._callbacks()
+        if callbacks:
+            callback = callbacks[0]
+            if hasattr(callback, '__enter__') and hasattr(callback, '__exit__'):
+                return callback
+        return contextlib.nullcontext()
+
+    @staticmethod
+    def _finish_reason(response) -> str:
+        """Raison d'arrêt de la génération ("length" = coupée par max_tokens)"""
+        metadata = getattr(response, "response_metadata", None) or {}
+        return metadata.get("finish_reason") or ""
+
+    @staticmethod
+    def _prompt_messages(runnable, payload: Any) -> Optional[List[BaseMessage]]:
+        """Reconstitue les messages envoyés (prompt brut ou premier maillon d'une chaîne)"""
+        if isinstance(payload, str):
+            return [HumanMessage(content=payload)]
+        prompt = getattr(runnable, "first", None)
+        if prompt is not None and hasattr(prompt, "format_prompt"):
+            return prompt.format_prompt(**payload).to_messages()
+        return None
+
+    def _continuation_llm(self):
+        """LLM de relance: en JSON mode, la suite n'est pas un objet JSON complet"""
+        if self.structured_output == "json":
+            return self.llm.bind(response_format={"type": "text"})
+        return self.llm
+
+    @staticmethod
+    def _continuation_messages(prompt_messages: List[BaseMessage], partial: str) -> List[BaseMessage]:
+        """Messages demandant de reprendre la sortie partielle là où elle s'est arrêtée"""
+        return [*prompt_messages, AIMessage(content=partial), HumanMessage(content=CONTINUATION_PROMPT)]
+
+    def _complete_truncated(self, runnable, payload: Any, response):
+        """Relance le LLM tant que la sortie est coupée par max_tokens et concatène les suites"""
+        if self._finish_reason(response) != "length" or self.max_continuations <= 0:
+            return response
+        prompt_messages = self._prompt_messages(runnable, payload)
+        if prompt_messages is None:
+            return response
+
+        text = self._response_text(response)
+        for _ in range(self.max_continuations):
+            response = self._continuation_llm().invoke(
+                self._continuation_messages(prompt_messages, text),
+                config=self._run_config()
+            )
+            self._record_continuation()
+            text += self._response_text(response)
+            if self._finish_reason(response) != "length":
+                break
+        return AIMessage(content=text, response_metadata=response.response_metadata)
+
+    async def _acomplete_truncated(self, runnable, payload: Any, response):
+        """Relance le LLM tant que la sortie est coupée (version asynchrone)"""
+        if self._finish_reason(response) != "length" or self.max_continuations <= 0:
+            return response
+        prompt_messages = self._prompt_messages(runnable, payload)
+        if prompt_messages is None:
+            return response
+
+        text = self._response_text(response)
+        for _ in range(self.max_continuations):
+            response = await self._continuation_llm().ainvoke(
+                self._continuation_messages(prompt_messages, text),
+                config=self._run_config()
+            )
+            self._record_continuation()
+            text += self._response_text(response)
+            if self._finish_reason(response) != "length":
+                break
+        return AIMessage(content=text, response_metadata=response.response_metadata)
+
+    def _invoke(self, runnable, payload: Any):
+        """Appel synchrone du LLM (ou d'une chaîne)"""
+        with self._callback_context():
+            response = runnable.invoke(payload, config=self._run_config())
+            response = self._complete_truncated(runnable, payload, response)
+        return response
+
+    async def _ainvoke(self, runnable, payload: Any):
+        """Appel asynchrone du LLM (ou d'une chaîne) via ainvoke"""
+        with self._callback_context():
+            response = await runnable.ainvoke(payload, config=self._run_config())
+            response = await self._acomplete_truncated(runnable, payload, response)
+        return response
+
+    def _stream_text(self, prompt: str) -> Iterator[str]:
+        """Streame le texte généré, en enchaînant les relances si la sortie est coupée"""
+        prompt_messages = [HumanMessage(content=prompt)]
+        messages, llm, text = prompt_messages, self.llm, ""
+
+        for attempt in range(self.max_continuations + 1):
+            finish_reason = ""
+            for chunk in llm.stream(messages, config=self._run_config()):
+                piece = self._response_text(chunk)
+                text += piece
+                finish_reason = self._finish_reason(chunk) or finish_reason
+                yield piece
+            if finish_reason != "length" or attempt == self.max_continuations:
+                return
+            self._record_continuation()
+            messages = self._continuation_messages(prompt_messages, text)
+            llm = self._continuation_llm()
+
+    async def _astream_text(self, prompt: str) -> AsyncIterator[str]:
+        """Streame le texte généré avec relances (version asynchrone)"""
+        prompt_messages = [HumanMessage(content=prompt)]
+        messages, llm, text = prompt_messages, self.llm, ""
+
+        for attempt in range(self.max_continuations + 1):
+            finish_reason = ""
+            async for chunk in llm.astream(messages, config=self._run_config()):
+                piece = self._response_text(chunk)
+                text += piece
+                finish_reason = self._finish_reason(chunk) or finish_reason
+                yield piece
+            if finish_reason != "length" or attempt == self.max_continuations:
+                return
+            self._record_continuation()
+            messages = self._continuation_messages(prompt_messages, text)
+            llm = self._continuation_llm()
+
+    def _prompt_builder(self) -> PromptBuilder:
+        """Assembleur de prompt avec budgets et comptage de tokens pour le modèle de l'agent"""
+        return PromptBuilder(model=llm_identity(self.llm))
+
+    @staticmethod
+    def _response_text(response) -> str:
+        """Extrait le texte d'une réponse LLM"""
+        return response.content if hasattr(response, "content") else str(response)
+
+    def _extract_json_payload(self, raw_text: str) -> str:
+        """Nettoie la réponse du LLM pour extraire uniquement le JSON"""
+        return extract_json_payload(raw_text)
+
+    def _parse_json(self, payload: str) -> Dict:
+        """Parse un JSON en tolérant quelques erreurs courantes des LLM"""
+        return safe_json_loads(payload)
+
+    def _parse_response(self, response) -> Dict:
+        """Convertit la réponse du LLM en dictionnaire selon le mode de sortie"""
+        # Mode 'schema': objet pydantic déjà validé
+        if hasattr(response, "dict") and not hasattr(response, "content"):
+            return response.dict()
+        if isinstance(response, dict):
+            return response
+
+        response_text = self._response_text(response)
+        if self.structured_output == "json":
+            # JSON mode: la réponse est un objet JSON brut, sans bloc markdown ni texte autour
+            return self._parse_json(response_text)
+        return self._parse_json(self._extract_json_payload(response_text))
+
+    def _log_execution(self, agent_name: str, input_data: Dict, output_data: Dict) -> None:
+        """Logger manuellement l'output dans Langfuse si disponible"""
+        monitor = self._monitor()
+        if not monitor:
+            return
+        try:
+            monitor.log_agent_execution(
+                agent_name=agent_name,
+                input_data=input_data,
+                output_data=output_data
+            )
+        except Exception:
+            pass  # Ne pas bloquer si le logging échoue
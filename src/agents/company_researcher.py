@@ -1,58 +1,122 @@
-from typing import Dict, List, Optional
-import json
-from src.utils.json_utils import safe_json_loads
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+from src.agents.base import BaseAgent
+from src.utils.cache import SingleFlight, llm_identity, make_cache_key
+from src.utils.schemas import CompanyInfo
 
-class CompanyResearcherAgent:
-    def __init__(self, llm, web_search_tool, callbacks: Optional[List] = None, langfuse_monitor=None):
-        self.llm = llm
+# Formes juridiques ignorées en fin de nom pour la clé de cache ("Acme SAS" = "ACME")
+_LEGAL_SUFFIXES = {"sa", "sas", "sasu", "sarl", "inc", "ltd", "llc", "gmbh", "corp", "corporation",
+                   "plc", "ag", "bv", "nv"}
+_ABBREVIATION = re.compile(r"[.'’]")
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize_company_name(name: str) -> str:
+    """Nom d'entreprise normalisé: sans accents, casse, ponctuation ni forme juridique"""
+    name = unicodedata.normalize("NFKD", name or "")
+    name = "".join(char for char in name if not unicodedata.combining(char)).casefold()
+    tokens = _NON_WORD.sub(" ", _ABBREVIATION.sub("", name)).split()
+    # Seules les formes juridiques finales sont retirées ("AG Insurance" reste distinct de "Insurance")
+    while len(tokens) > 1 and tokens[-1] in _LEGAL_SUFFIXES:
+        tokens.pop()
+    return " ".join(tokens)
+
+
+class CompanyResearcherAgent(BaseAgent):
+    agent_name = "company_researcher"
+    # Budget de tokens par résultat de recherche web
+    section_budgets = {"source": 350}
+
+    def __init__(self, llm, web_search_tool, callbacks: Optional[List] = None, langfuse_monitor=None,
+                 cache=None, structured_output: Optional[str] = None):
+        super().__init__(llm, callbacks=callbacks, langfuse_monitor=langfuse_monitor,
+                         structured_output=structured_output)
         self.web_search = web_search_tool
-        self.callbacks = callbacks or []
-        self.langfuse_monitor = langfuse_monitor
-
-    def _extract_json_payload(self, raw_text: str) -> str:
-        """Nettoie la réponse du LLM pour ne garder que le JSON"""
-        cleaned = (raw_text or "").strip()
-        if not cleaned:
-            raise ValueError("Réponse LLM vide - impossibilité de parser le JSON.")
-        
-        if "```json" in cleaned:
-            cleaned = cleaned.split("```json", 1)[1]
-            cleaned = cleaned.split("```", 1)[0].strip()
-        elif "```" in cleaned:
-            cleaned = cleaned.split("```", 1)[1]
-            cleaned = cleaned.split("```", 1)[0].strip()
-
-        start_idx = cleaned.find("{")
-        end_idx = cleaned.rfind("}")
-        if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-            cleaned = cleaned[start_idx : end_idx + 1]
-
-        return cleaned
-
-    def _parse_json(self, payload: str) -> Dict:
-        """Parse un JSON en tolérant quelques erreurs courantes des LLM"""
-        return safe_json_loads(payload)
-        
-    def research(self, company_name: str, industry: str = "") -> Dict:
-        """Recherche des informations sur une entreprise"""
-        # 1. Recherche web
-        search_results = self.web_search.search_company_info(company_name, industry)
-        
-        if not search_results["success"]:
-            return {
-                "success": False,
-                "error": "Web search failed",
-                "info": {}
-            }
-        
-        # 2. Synthèse avec LLM
-        results_text = "\n\n".join([
-            f"Source: {r.get('url', 'N/A')}\n{r.get('content', '')}"
-            for r in search_results["results"][:3]
-        ])
-        
-        prompt = f"""Synthétise les informations suivantes sur l'entreprise {company_name}:
+        # Cache persistant (TTL) des recherches et synthèses, partagé entre sessions
+        self.cache = cache
+        # Les sessions qui recherchent la même entreprise au même moment partagent un seul calcul
+        self.inflight = SingleFlight()
+
+    def _search_key(self, company_name: str) -> str:
+        return make_cache_key("company_search", normalize_company_name(company_name))
+
+    def _research_key(self, company_name: str, industry: str) -> str:
+        """Clé de cache: entreprise et secteur normalisés + modèle de synthèse"""
+        return make_cache_key(
+            "company_researcher",
+            normalize_company_name(company_name),
+            " ".join((industry or "").casefold().split()),
+            llm_identity(self.llm),
+        )
 
+    def _cache_get(self, key: str) -> Optional[Dict]:
+        if self.cache is None:
+            return None
+        try:
+            return self.cache.get(key)
+        except Exception:
+            return None
+
+    def _cache_set(self, key: str, value: Dict) -> None:
+        """Enregistre un résultat réussi (le cache ne doit jamais bloquer la recherche)"""
+        if self.cache is None or not value.get("success"):
+            return
+        try:
+            self.cache.set(key, value)
+        except Exception:
+            pass
+
+    def _cached_search(self, key: str, company_name: str) -> Dict:
+        # Revérifier le cache: un calcul concurrent a pu se terminer entre-temps
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        search_results = self.web_search.search_company_info(company_name)
+        # Une recherche sans résultat n'est pas gardée: elle serait servie à toutes les sessions
+        if search_results.get("results"):
+            self._cache_set(key, search_results)
+        return search_results
+
+    async def _acached_search(self, key: str, company_name: str) -> Dict:
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        search_results = await self.web_search.asearch_company_info(company_name)
+        # Une recherche sans résultat n'est pas gardée: elle serait servie à toutes les sessions
+        if search_results.get("results"):
+            self._cache_set(key, search_results)
+        return search_results
+
+    def search(self, company_name: str) -> Dict:
+        """Recherche web sur l'entreprise (ne dépend que du nom, lançable dès l'entrée du graphe)"""
+        key = self._search_key(company_name)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        return self.inflight.do(key, self._cached_search, key, company_name)
+
+    async def asearch(self, company_name: str) -> Dict:
+        """Recherche web sur l'entreprise (version asynchrone)"""
+        key = self._search_key(company_name)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        return await self.inflight.ado(key, self._acached_search, key, company_name)
+
+    def _build_prompt(self, company_name: str, industry: str, search_results: Dict) -> Tuple[str, Dict]:
+        """Construit le prompt de synthèse à partir des résultats web (et ses comptes de tokens)"""
+        builder = self._prompt_builder()
+        sources = []
+        for idx, r in enumerate(search_results["results"][:3]):
+            content = builder.text_section(f"source_{idx}", r.get("content", ""), self.section_budgets["source"])
+            sources.append(f"Source: {r.get('url', 'N/A')}\n{content}")
+        results_text = "\n\n".join(sources)
+        # Le secteur (issu de l'analyse JD) affine uniquement la synthèse, pas la recherche
+        industry_line = f"\nSecteur visé par le poste: {industry}\n" if industry else ""
+
+        prompt = f"""Synthétise les informations suivantes sur l'entreprise {company_name}:
+{industry_line}
 {results_text}
 
 Retourne un JSON avec:
@@ -65,55 +129,109 @@ Retourne un JSON avec:
 - interesting_facts: faits intéressants (liste)
 
 JSON:"""
-        
+        return builder.finish(prompt), builder.report()
+
+    def _build_result(self, company_name: str, industry: str, search_results: Dict, response,
+                      prompt_tokens: Dict) -> Dict:
+        """Parse la synthèse du LLM et la logge"""
+        info = self._parse_response(response)
+        sources = [r.get("url") for r in search_results["results"][:3]]
+
+        self._log_execution(
+            "company_researcher",
+            {"company_name": company_name, "industry": industry, "prompt_tokens": prompt_tokens},
+            {"info": info, "sources": sources}
+        )
+
+        return {
+            "success": True,
+            "info": info,
+            "sources": sources,
+            "prompt_tokens": prompt_tokens
+        }
+
+    def research(self, company_name: str, industry: str = "",
+                 search_results: Optional[Dict] = None) -> Dict:
+        """Recherche des informations sur une entreprise (résultat en cache si déjà synthétisé)"""
+        key = self._research_key(company_name, industry)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return {**cached, "cached": True}
+        return self.inflight.do(key, self._research, key, company_name, industry, search_results)
+
+    async def aresearch(self, company_name: str, industry: str = "",
+                        search_results: Optional[Dict] = None) -> Dict:
+        """Recherche des informations sur une entreprise (version asynchrone)"""
+        key = self._research_key(company_name, industry)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return {**cached, "cached": True}
+        return await self.inflight.ado(key, self._aresearch, key, company_name, industry, search_results)
+
+    def _research(self, key: str, company_name: str, industry: str,
+                  search_results: Optional[Dict]) -> Dict:
+        """Recherche web puis synthèse LLM, enregistrée dans le cache"""
+        cached = self._cache_get(key)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+        # 1. Recherche web (sauf si déjà lancée de façon spéculative)
+        if search_results is None:
+            search_results = self.search(company_name)
+
+        if not search_results["success"]:
+            return {
+                "success": False,
+                "error": "Web search failed",
+                "info": {}
+            }
+
+        # 2. Synthèse avec LLM
         try:
-            config = {"callbacks": self.callbacks} if self.callbacks else {}
-            
-            # Utiliser le callback comme context manager si possible
-            if self.callbacks and len(self.callbacks) > 0:
-                callback = self.callbacks[0]
-                if hasattr(callback, '__enter__') and hasattr(callback, '__exit__'):
-                    with callback:
-                        response = self.llm.invoke(prompt, config=config)
-                else:
-                    response = self.llm.invoke(prompt, config=config)
-            else:
-                response = self.llm.invoke(prompt, config=config)
-            
-            # Flush les callbacks pour s'assurer que les données sont envoyées à Langfuse
-            if self.callbacks:
-                for callback in self.callbacks:
-                    if hasattr(callback, 'flush'):
-                        try:
-                            callback.flush()
-                        except Exception:
-                            pass
-
-            response_text = (
-                response.content if hasattr(response, "content") else str(response)
-            )
-            payload = self._extract_json_payload(response_text)
-            info = self._parse_json(payload)
-            
-            # Logger manuellement l'output dans Langfuse si disponible
-            if self.langfuse_monitor:
-                try:
-                    self.langfuse_monitor.log_agent_execution(
-                        agent_name="company_researcher",
-                        input_data={"company_name": company_name, "industry": industry},
-                        output_data={"info": info, "sources": [r.get("url") for r in search_results["results"][:3]]}
-                    )
-                except Exception:
-                    pass
-            
+            prompt, prompt_tokens = self._build_prompt(company_name, industry, search_results)
+            response = self._invoke(self._output_llm(CompanyInfo), prompt)
+            result = self._build_result(company_name, industry, search_results, response, prompt_tokens)
+            # Une synthèse vide ou mal formée n'est pas gardée pendant toute la durée du TTL
+            if isinstance(result["info"], dict) and result["info"]:
+                self._cache_set(key, result)
+            return result
+        except Exception as e:
             return {
-                "success": True,
-                "info": info,
-                "sources": [r.get("url") for r in search_results["results"][:3]]
+                "success": False,
+                "error": str(e),
+                "info": {}
+            }
+
+    async def _aresearch(self, key: str, company_name: str, industry: str,
+                         search_results: Optional[Dict]) -> Dict:
+        """Recherche web puis synthèse LLM, enregistrée dans le cache (version asynchrone)"""
+        cached = self._cache_get(key)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+        # 1. Recherche web (sauf si déjà lancée de façon spéculative)
+        if search_results is None:
+            search_results = await self.asearch(company_name)
+
+        if not search_results["success"]:
+            return {
+                "success": False,
+                "error": "Web search failed",
+                "info": {}
             }
+
+        # 2. Synthèse avec LLM
+        try:
+            prompt, prompt_tokens = self._build_prompt(company_name, industry, search_results)
+            response = await self._ainvoke(self._output_llm(CompanyInfo), prompt)
+            result = self._build_result(company_name, industry, search_results, response, prompt_tokens)
+            # Une synthèse vide ou mal formée n'est pas gardée pendant toute la durée du TTL
+            if isinstance(result["info"], dict) and result["info"]:
+                self._cache_set(key, result)
+            return result
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e),
                 "info": {}
-            }
\ No newline at end of file
+            }
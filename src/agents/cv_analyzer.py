@@ -1,12 +1,19 @@
 from langchain.prompts import PromptTemplate
-from typing import Dict, Optional, List
-from src.utils.json_utils import safe_json_loads
-
-class CVAnalyzerAgent:
-    def __init__(self, llm, callbacks: Optional[List] = None, langfuse_monitor=None):
-        self.llm = llm
-        self.callbacks = callbacks or []
-        self.langfuse_monitor = langfuse_monitor
+from typing import Dict, Optional, List, Tuple
+from src.agents.base import BaseAgent
+from src.utils.cache import llm_identity, make_cache_key, normalize_text
+from src.utils.schemas import CVAnalysis
+
+class CVAnalyzerAgent(BaseAgent):
+    agent_name = "cv_analyzer"
+    # Budget de tokens du document envoyé au LLM
+    section_budgets = {"cv_text": 3000}
+
+    def __init__(self, llm, callbacks: Optional[List] = None, langfuse_monitor=None, cache=None,
+                 structured_output: Optional[str] = None):
+        super().__init__(llm, callbacks=callbacks, langfuse_monitor=langfuse_monitor,
+                         structured_output=structured_output)
+        self.cache = cache
         self.prompt = PromptTemplate.from_template(
             """Analyse ce CV et retourne UNIQUEMENT un JSON valide (sans texte avant/après):
 {cv_text}
@@ -15,81 +22,98 @@ JSON avec: skills (liste), experience_years (nombre), experience_domains (liste)
 
 JSON:"""
         )
-    
-    def _extract_json_payload(self, raw_text: str) -> str:
-        """Nettoie la réponse du LLM pour extraire uniquement le JSON"""
-        cleaned = (raw_text or "").strip()
-        if not cleaned:
-            raise ValueError("Réponse LLM vide - impossibilité de parser le JSON.")
-
-        if "```json" in cleaned:
-            cleaned = cleaned.split("```json", 1)[1]
-            cleaned = cleaned.split("```", 1)[0].strip()
-        elif "```" in cleaned:
-            cleaned = cleaned.split("```", 1)[1]
-            cleaned = cleaned.split("```", 1)[0].strip()
-
-        start_idx = cleaned.find("{")
-        end_idx = cleaned.rfind("}")
-        if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-            cleaned = cleaned[start_idx : end_idx + 1]
-
-        return cleaned
+
+    def _cache_key(self, cv_text: str) -> str:
+        """Clé de cache: texte normalisé + template du prompt + modèle"""
+        return make_cache_key(
+            "cv_analyzer",
+            normalize_text(cv_text),
+            self.prompt.template,
+            llm_identity(self.llm),
+        )
+
+    def _lookup_cache(self, cv_text: str) -> Tuple[Optional[str], Optional[Dict]]:
+        """Réutiliser une analyse déjà calculée pour le même texte"""
+        if self.cache is None:
+            return None, None
+        cache_key = self._cache_key(cv_text)
+        try:
+            return cache_key, self.cache.get(cache_key)
+        except Exception:
+            return cache_key, None
+
+    def _build_prompt_text(self, cv_text: str) -> Tuple[str, Dict]:
+        """Limite le document au budget de tokens et compte les tokens du prompt"""
+        builder = self._prompt_builder()
+        prompt_text = builder.text_section("cv_text", cv_text, self.section_budgets["cv_text"])
+        builder.finish(self.prompt.format(cv_text=prompt_text))
+        return prompt_text, builder.report()
+
+    def _build_result(self, cv_text: str, response, cache_key: Optional[str],
+                      prompt_tokens: Dict) -> Dict:
+        """Parse la réponse du LLM, l'enregistre dans le cache et la logge"""
+        response_text = self._response_text(response)
+
+        self._log_execution(
+            "cv_analyzer",
+            {"cv_text": cv_text[:500], "prompt_tokens": prompt_tokens},  # Limiter la taille
+            {"response": response_text[:2000]}  # Limiter la taille
+        )
+
+        # Extraire et parser le JSON
+        analysis = self._parse_response(response)
+
+        if cache_key and analysis:
+            try:
+                self.cache.set(cache_key, analysis)
+            except Exception:
+                pass  # Le cache ne doit jamais bloquer l'analyse
+
+        return {
+            "success": True,
+            "analysis": analysis
+        }
 
     def analyze(self, cv_text: str) -> Dict:
         """Analyse un CV"""
         try:
-            chain = self.prompt | self.llm
-            config = {"callbacks": self.callbacks} if self.callbacks else {}
-            
-            # Utiliser le callback comme context manager si possible
-            if self.callbacks and len(self.callbacks) > 0:
-                callback = self.callbacks[0]
-                # Si le callback supporte le context manager, l'utiliser
-                if hasattr(callback, '__enter__') and hasattr(callback, '__exit__'):
-                    with callback:
-                        response = chain.invoke({"cv_text": cv_text}, config=config)
-                else:
-                    response = chain.invoke({"cv_text": cv_text}, config=config)
-            else:
-                response = chain.invoke({"cv_text": cv_text}, config=config)
-            
-            # Flush les callbacks pour s'assurer que les données sont envoyées à Langfuse
-            if self.callbacks:
-                for callback in self.callbacks:
-                    if hasattr(callback, 'flush'):
-                        try:
-                            callback.flush()
-                        except Exception:
-                            pass
-            
-            # Nettoyer la réponse
-            response_text = (
-                response.content if hasattr(response, "content") else str(response)
-            )
-            
-            # Logger manuellement l'output dans Langfuse si disponible
-            if self.langfuse_monitor:
-                try:
-                    self.langfuse_monitor.log_agent_execution(
-                        agent_name="cv_analyzer",
-                        input_data={"cv_text": cv_text[:500]},  # Limiter la taille
-                        output_data={"response": response_text[:2000]}  # Limiter la taille
-                    )
-                except Exception:
-                    pass  # Ne pas bloquer si le logging échoue
-            
-            # Extraire et parser le JSON
-            payload = self._extract_json_payload(response_text)
-            analysis = safe_json_loads(payload)
-            
+            cache_key, cached = self._lookup_cache(cv_text)
+            if cached:
+                return {
+                    "success": True,
+                    "analysis": cached,
+                    "cached": True
+                }
+
+            chain = self.prompt | self._output_llm(CVAnalysis)
+            prompt_text, prompt_tokens = self._build_prompt_text(cv_text)
+            response = self._invoke(chain, {"cv_text": prompt_text})
+            return self._build_result(cv_text, response, cache_key, prompt_tokens)
+        except Exception as e:
             return {
-                "success": True,
-                "analysis": analysis
+                "success": False,
+                "error": str(e),
+                "analysis": {}
             }
+
+    async def aanalyze(self, cv_text: str) -> Dict:
+        """Analyse un CV (version asynchrone)"""
+        try:
+            cache_key, cached = self._lookup_cache(cv_text)
+            if cached:
+                return {
+                    "success": True,
+                    "analysis": cached,
+                    "cached": True
+                }
+
+            chain = self.prompt | self._output_llm(CVAnalysis)
+            prompt_text, prompt_tokens = self._build_prompt_text(cv_text)
+            response = await self._ainvoke(chain, {"cv_text": prompt_text})
+            return self._build_result(cv_text, response, cache_key, prompt_tokens)
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e),
                 "analysis": {}
-            }
\ No newline at end of file
+            }
@@ -1,50 +1,64 @@
-from typing import Dict, Optional, List
-import json
-from src.utils.json_utils import safe_json_loads
-
-class InterviewCoachAgent:
-    def __init__(self, llm, callbacks: Optional[List] = None, langfuse_monitor=None):
-        self.llm = llm
-        self.callbacks = callbacks or []
-        self.langfuse_monitor = langfuse_monitor
-
-    def _extract_json_payload(self, raw_text: str) -> str:
-        """Nettoie la réponse du LLM pour ne garder que le JSON"""
-        cleaned = (raw_text or "").strip()
-        if not cleaned:
-            raise ValueError("Réponse LLM vide - impossibilité de parser.")
-        
-        if "```json" in cleaned:
-            cleaned = cleaned.split("```json", 1)[1]
-            cleaned = cleaned.split("```", 1)[0].strip()
-        elif "```" in cleaned:
-            cleaned = cleaned.split("```", 1)[1]
-            cleaned = cleaned.split("```", 1)[0].strip()
-
-        start_idx = cleaned.find("{")
-        end_idx = cleaned.rfind("}")
-        if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-            cleaned = cleaned[start_idx : end_idx + 1]
-
-        return cleaned
-
-    def _parse_json(self, payload: str) -> Dict:
-        """Parse un JSON en tolérant quelques erreurs courantes des LLM"""
-        return safe_json_loads(payload)
-        
-    def evaluate_answer(self, question: str, answer: str, 
-                       context: Dict) -> Dict:
-        """Évalue une réponse et donne du feedback"""
-        
-        prompt = f"""Tu es un coach d'entretien bienveillant. Évalue cette réponse:
-
-QUESTION: {question}
-
-RÉPONSE DU CANDIDAT:
-{answer}
+from typing import AsyncIterator, Dict, Iterator, Optional, List, Tuple, Any, Union
+from src.agents.base import BaseAgent
+from src.utils.json_utils import IncrementalJSONReader
+from src.utils.prompt_builder import PromptBuilder
+from src.utils.schemas import AnswerFeedback, PreparationTips
+
+# Champs utiles à l'évaluation des réponses, par ordre d'importance
+COACHING_FIELDS = {
+    "cv": ["skills", "experience_years", "experience_domains", "strengths"],
+    "jd": ["job_title", "seniority_level", "required_skills", "experience_required",
+           "key_responsibilities"],
+}
+COACHING_CONTEXT_BUDGET = 300
+
+
+def build_coaching_context(cv_analysis: Dict, jd_analysis: Dict, model: Optional[str] = None,
+                           max_tokens: int = COACHING_CONTEXT_BUDGET) -> str:
+    """Résumé compact et déterministe du profil et du poste, calculé une fois par session"""
+    builder = PromptBuilder(model)
+    budget = max_tokens // 2
+    sections = []
+    for label, key, analysis in (("CANDIDAT", "cv", cv_analysis), ("POSTE", "jd", jd_analysis)):
+        fields = COACHING_FIELDS[key]
+        digest = {field: (analysis or {})[field] for field in fields if field in (analysis or {})}
+        sections.append(f"{label}: {builder.json_section(key, digest, budget, priorities=fields)}")
+    return "\n".join(sections)
+
+
+class InterviewCoachAgent(BaseAgent):
+    agent_name = "interview_coach"
+    # Budgets de tokens par section de prompt
+    section_budgets = {"question": 150, "answer": 700, "context": COACHING_CONTEXT_BUDGET, "cv": 500, "jd": 500}
+
+    def __init__(self, llm, callbacks: Optional[List] = None, langfuse_monitor=None,
+                 structured_output: Optional[str] = None):
+        super().__init__(llm, callbacks=callbacks, langfuse_monitor=langfuse_monitor,
+                         structured_output=structured_output)
+
+    def build_coaching_context(self, cv_analysis: Dict, jd_analysis: Dict) -> str:
+        """Contexte de coaching de la session, à réutiliser pour chaque évaluation"""
+        return build_coaching_context(cv_analysis, jd_analysis, model=self._prompt_builder().model,
+                                      max_tokens=self.section_budgets["context"])
+
+    def _evaluation_prompt(self, question: str, answer: str,
+                           context: Union[str, Dict]) -> Tuple[str, Dict]:
+        """Construit le prompt d'évaluation d'une réponse (et ses comptes de tokens)"""
+        # Contexte brut {"cv": ..., "jd": ...}: le résumer (les appelants passent le résumé de la session)
+        if isinstance(context, dict):
+            context = self.build_coaching_context(context.get("cv"), context.get("jd"))
+
+        builder = self._prompt_builder()
+        context_text = builder.text_section("context", context, self.section_budgets["context"])
+        question = builder.text_section("question", question, self.section_budgets["question"])
+        answer = builder.text_section("answer", answer, self.section_budgets["answer"])
+
+        # Préfixe identique pour toutes les questions de la session (cache de prompt du fournisseur):
+        # seules la question et la réponse, en fin de prompt, varient
+        prompt = f"""Tu es un coach d'entretien bienveillant. Tu évalues les réponses du candidat.
 
 CONTEXTE (CV/Poste):
-{json.dumps(context, indent=2)}
+{context_text}
 
 Fournis en JSON:
 - score: note sur 10
@@ -56,66 +70,24 @@ Fournis en JSON:
 
 Sois constructif, spécifique et encourageant.
 
+QUESTION: {question}
+
+RÉPONSE DU CANDIDAT:
+{answer}
+
 JSON:"""
+        return builder.finish(prompt), builder.report()
+
+    def _tips_prompt(self, cv_analysis: Dict, jd_analysis: Dict) -> Tuple[str, Dict]:
+        """Construit le prompt de conseils généraux (et ses comptes de tokens)"""
+        builder = self._prompt_builder()
+        profile = builder.json_section("cv", cv_analysis, self.section_budgets["cv"])
+        position = builder.json_section("jd", jd_analysis, self.section_budgets["jd"])
 
-        try:
-            config = {"callbacks": self.callbacks} if self.callbacks else {}
-            
-            # Utiliser le callback comme context manager si possible
-            if self.callbacks and len(self.callbacks) > 0:
-                callback = self.callbacks[0]
-                if hasattr(callback, '__enter__') and hasattr(callback, '__exit__'):
-                    with callback:
-                        response = self.llm.invoke(prompt, config=config)
-                else:
-                    response = self.llm.invoke(prompt, config=config)
-            else:
-                response = self.llm.invoke(prompt, config=config)
-            
-            # Flush les callbacks pour s'assurer que les données sont envoyées à Langfuse
-            if self.callbacks:
-                for callback in self.callbacks:
-                    if hasattr(callback, 'flush'):
-                        try:
-                            callback.flush()
-                        except Exception:
-                            pass
-            
-            response_text = (
-                response.content if hasattr(response, "content") else str(response)
-            )
-            payload = self._extract_json_payload(response_text)
-            feedback = self._parse_json(payload)
-            
-            # Logger manuellement l'output dans Langfuse si disponible
-            if self.langfuse_monitor:
-                try:
-                    self.langfuse_monitor.log_agent_execution(
-                        agent_name="interview_coach_evaluate",
-                        input_data={"question": question[:200], "answer": answer[:500]},
-                        output_data={"feedback": feedback}
-                    )
-                except Exception:
-                    pass
-            
-            return {
-                "success": True,
-                "feedback": feedback
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "feedback": {}
-            }
-    
-    def generate_general_tips(self, cv_analysis: Dict, jd_analysis: Dict) -> Dict:
-        """Génère des conseils généraux de préparation"""
-        
         prompt = f"""Génère des conseils personnalisés de préparation d'entretien.
 
-PROFIL: {json.dumps(cv_analysis, indent=2)}
-POSTE: {json.dumps(jd_analysis, indent=2)}
+PROFIL: {profile}
+POSTE: {position}
 
 Fournis en JSON:
 - preparation_checklist: liste de 5-7 actions à faire
@@ -126,54 +98,141 @@ Fournis en JSON:
 - common_mistakes: erreurs à éviter (liste)
 
 JSON:"""
+        return builder.finish(prompt), builder.report()
+
+    def _evaluation_result(self, question: str, answer: str, response, prompt_tokens: Dict) -> Dict:
+        """Parse le feedback du LLM et le logge"""
+        feedback = self._parse_response(response)
+
+        self._log_execution(
+            "interview_coach_evaluate",
+            {"question": question[:200], "answer": answer[:500], "prompt_tokens": prompt_tokens},
+            {"feedback": feedback}
+        )
+
+        return {
+            "success": True,
+            "feedback": feedback,
+            "prompt_tokens": prompt_tokens
+        }
+
+    def _tips_result(self, cv_analysis: Dict, jd_analysis: Dict, response, prompt_tokens: Dict) -> Dict:
+        """Parse les conseils du LLM et les logge"""
+        tips = self._parse_response(response)
+
+        self._log_execution(
+            "interview_coach_tips",
+            {"cv_analysis": str(cv_analysis)[:500], "jd_analysis": str(jd_analysis)[:500],
+             "prompt_tokens": prompt_tokens},
+            {"tips": tips}
+        )
+
+        return {
+            "success": True,
+            "tips": tips,
+            "prompt_tokens": prompt_tokens
+        }
+
+    def evaluate_answer(self, question: str, answer: str,
+                       context: Union[str, Dict]) -> Dict:
+        """Évalue une réponse et donne du feedback"""
+        try:
+            prompt, prompt_tokens = self._evaluation_prompt(question, answer, context)
+            response = self._invoke(self._output_llm(AnswerFeedback), prompt)
+            return self._evaluation_result(question, answer, response, prompt_tokens)
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "feedback": {}
+            }
 
+    async def aevaluate_answer(self, question: str, answer: str,
+                               context: Union[str, Dict]) -> Dict:
+        """Évalue une réponse et donne du feedback (version asynchrone)"""
         try:
-            config = {"callbacks": self.callbacks} if self.callbacks else {}
-            
-            # Utiliser le callback comme context manager si possible
-            if self.callbacks and len(self.callbacks) > 0:
-                callback = self.callbacks[0]
-                if hasattr(callback, '__enter__') and hasattr(callback, '__exit__'):
-                    with callback:
-                        response = self.llm.invoke(prompt, config=config)
-                else:
-                    response = self.llm.invoke(prompt, config=config)
-            else:
-                response = self.llm.invoke(prompt, config=config)
-            
-            # Flush les callbacks pour s'assurer que les données sont envoyées à Langfuse
-            if self.callbacks:
-                for callback in self.callbacks:
-                    if hasattr(callback, 'flush'):
-                        try:
-                            callback.flush()
-                        except Exception:
-                            pass
-            
-            response_text = (
-                response.content if hasattr(response, "content") else str(response)
-            )
-            payload = self._extract_json_payload(response_text)
-            tips = self._parse_json(payload)
-            
-            # Logger manuellement l'output dans Langfuse si disponible
-            if self.langfuse_monitor:
-                try:
-                    self.langfuse_monitor.log_agent_execution(
-                        agent_name="interview_coach_tips",
-                        input_data={"cv_analysis": str(cv_analysis)[:500], "jd_analysis": str(jd_analysis)[:500]},
-                        output_data={"tips": tips}
-                    )
-                except Exception:
-                    pass
-            
+            prompt, prompt_tokens = self._evaluation_prompt(question, answer, context)
+            response = await self._ainvoke(self._output_llm(AnswerFeedback), prompt)
+            return self._evaluation_result(question, answer, response, prompt_tokens)
+        except Exception as e:
             return {
-                "success": True,
-                "tips": tips
+                "success": False,
+                "error": str(e),
+                "feedback": {}
             }
+
+    def _remaining_fields(self, reader: IncrementalJSONReader, response_text: str,
+                          question: str, answer: str, prompt_tokens: Dict) -> List[Tuple[str, Any]]:
+        """Complète le streaming par un parsing tolérant (JSON tronqué ou mal formé) et logge"""
+        try:
+            feedback = self._parse_response(response_text)
+        except Exception:
+            feedback = {}
+        if not isinstance(feedback, dict):
+            feedback = {}
+
+        remaining = [(key, value) for key, value in feedback.items() if key not in reader.fields]
+
+        self._log_execution(
+            "interview_coach_evaluate",
+            {"question": question[:200], "answer": answer[:500], "streaming": True,
+             "prompt_tokens": prompt_tokens},
+            {"feedback": {**reader.fields, **dict(remaining)}}
+        )
+        return remaining
+
+    def stream_evaluate_answer(self, question: str, answer: str,
+                               context: Union[str, Dict]) -> Iterator[Tuple[str, Any]]:
+        """Évalue une réponse en streaming: émet (champ, valeur) dès que chaque champ est complet"""
+        prompt, prompt_tokens = self._evaluation_prompt(question, answer, context)
+        reader = IncrementalJSONReader()
+        chunks = []
+
+        with self._callback_context():
+            for text in self._stream_text(prompt):
+                chunks.append(text)
+                yield from reader.feed(text)
+
+        yield from self._remaining_fields(reader, "".join(chunks), question, answer, prompt_tokens)
+
+    async def astream_evaluate_answer(self, question: str, answer: str,
+                                      context: Union[str, Dict]) -> AsyncIterator[Tuple[str, Any]]:
+        """Évalue une réponse en streaming (version asynchrone)"""
+        prompt, prompt_tokens = self._evaluation_prompt(question, answer, context)
+        reader = IncrementalJSONReader()
+        chunks = []
+
+        with self._callback_context():
+            async for text in self._astream_text(prompt):
+                chunks.append(text)
+                for field in reader.feed(text):
+                    yield field
+
+        for field in self._remaining_fields(reader, "".join(chunks), question, answer, prompt_tokens):
+            yield field
+
+    def generate_general_tips(self, cv_analysis: Dict, jd_analysis: Dict) -> Dict:
+        """Génère des conseils généraux de préparation"""
+        try:
+            prompt, prompt_tokens = self._tips_prompt(cv_analysis, jd_analysis)
+            response = self._invoke(self._output_llm(PreparationTips), prompt)
+            return self._tips_result(cv_analysis, jd_analysis, response, prompt_tokens)
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "tips": {}
+            }
+
+    async def agenerate_general_tips(self, cv_analysis: Dict, jd_analysis: Dict) -> Dict:
+        """Génère des conseils généraux de préparation (version asynchrone)"""
+        try:
+            prompt, prompt_tokens = self._tips_prompt(cv_analysis, jd_analysis)
+            response = await self._ainvoke(self._output_llm(PreparationTips), prompt)
+            return self._tips_result(cv_analysis, jd_analysis, response, prompt_tokens)
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e),
                 "tips": {}
-            }
\ No newline at end of file
+            }
@@ -1,7 +1,9 @@
 from langgraph.graph import StateGraph, END
-from typing import TypedDict, Annotated, List, Dict
+from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from typing import TypedDict, Annotated, List, Dict, Tuple
+import asyncio
 import operator
-import concurrent.futures
 
 # Définition de l'état partagé
 class InterviewPrepState(TypedDict):
@@ -10,12 +12,14 @@ class InterviewPrepState(TypedDict):
     jd_text: str
     jd_analysis: Dict
     company_name: str
+    company_search: Dict
     company_info: Dict
     questions: List[Dict]
     current_question_idx: int
     user_answers: List[Dict]
     feedback_history: List[Dict]
     general_tips: Dict
+    coaching_context: str
     human_approval_needed: bool
     human_feedback: str
     next_step: str
@@ -33,16 +37,17 @@ class InterviewPrepSupervisor:
         workflow = StateGraph(InterviewPrepState)
         
         # Ajouter les nœuds
-        workflow.add_node("research_company", self.research_company_node)
-        workflow.add_node("generate_questions", self.generate_questions_node)
+        # Les nœuds qui appellent un LLM ont une variante async, utilisée par graph.astream
+        workflow.add_node("research_company", self._node(self.research_company_node, self.aresearch_company_node))
+        workflow.add_node("generate_questions", self._node(self.generate_questions_node, self.agenerate_questions_node))
         workflow.add_node("human_review", self.human_review_node)
         workflow.add_node("conduct_interview", self.conduct_interview_node)
-        workflow.add_node("provide_feedback", self.provide_feedback_node)
-        workflow.add_node("generate_tips", self.generate_tips_node)
+        workflow.add_node("provide_feedback", self._node(self.provide_feedback_node, self.aprovide_feedback_node))
+        workflow.add_node("generate_tips", self._node(self.generate_tips_node, self.agenerate_tips_node))
         
         # Définir le flux
         # Exécuter analyze_cv et analyze_jd en parallèle pour gagner du temps
-        workflow.add_node("analyze_parallel", self.analyze_parallel_node)
+        workflow.add_node("analyze_parallel", self._node(self.analyze_parallel_node, self.aanalyze_parallel_node))
         workflow.set_entry_point("analyze_parallel")
         
         workflow.add_edge("analyze_parallel", "research_company")
@@ -73,45 +78,89 @@ class InterviewPrepSupervisor:
             }
         )
         
-        return workflow.compile(checkpointer=self.memory)
+        # Interruption avant la validation humaine: la décision est injectée au checkpoint
+        # puis le workflow reprend sans rejouer les analyses. L'entretien est piloté par l'UI.
+        return workflow.compile(
+            checkpointer=self.memory,
+            interrupt_before=["human_review", "conduct_interview"]
+        )
+    
+    @staticmethod
+    def initial_state(cv_text: str, jd_text: str, company_name: str) -> InterviewPrepState:
+        """État d'entrée du workflow pour un triplet CV / offre / entreprise"""
+        return {
+            "cv_text": cv_text,
+            "cv_analysis": {},
+            "jd_text": jd_text,
+            "jd_analysis": {},
+            "company_name": company_name,
+            "company_search": {},
+            "company_info": {},
+            "questions": [],
+            "current_question_idx": 0,
+            "user_answers": [],
+            "feedback_history": [],
+            "general_tips": {},
+            "coaching_context": "",
+            "human_approval_needed": False,
+            "human_feedback": "",
+            "next_step": "",
+            "error": ""
+        }
+    
+    @staticmethod
+    def _node(func, afunc):
+        """Nœud exécutable en synchrone (graph.stream) et en asynchrone (graph.astream)"""
+        return RunnableLambda(func, afunc=afunc, name=func.__name__)
     
     def get_graph(self):
         """Retourne le graph compilé"""
         return self.graph
     
-    def analyze_parallel_node(self, state: InterviewPrepState) -> InterviewPrepState:
-        """Nœud qui exécute l'analyse CV et JD en parallèle pour gagner du temps"""
-        def analyze_cv():
-            try:
-                if not state.get("cv_text") or not state["cv_text"].strip():
-                    return {}, "CV text is empty"
-                result = self.agents["cv_analyzer"].analyze(state["cv_text"])
-                if result.get("success") and result.get("analysis"):
-                    return result.get("analysis", {}), ""
-                return {}, result.get("error", "CV Analysis failed")
-            except Exception as e:
-                return {}, f"CV Analysis exception: {str(e)}"
-        
-        def analyze_jd():
-            try:
-                if not state.get("jd_text") or not state["jd_text"].strip():
-                    return {}, "JD text is empty"
-                result = self.agents["jd_analyzer"].analyze(state["jd_text"])
-                if result.get("success") and result.get("analysis"):
-                    return result.get("analysis", {}), ""
-                return {}, result.get("error", "JD Analysis failed")
-            except Exception as e:
-                return {}, f"JD Analysis exception: {str(e)}"
-        
-        # Exécuter les deux analyses en parallèle
-        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-            cv_future = executor.submit(analyze_cv)
-            jd_future = executor.submit(analyze_jd)
-            
-            cv_analysis, cv_error = cv_future.result()
-            jd_analysis, jd_error = jd_future.result()
-        
-        # Stocker dans vector DB si succès
+    def resume_after_review(self, config: Dict, human_feedback: str):
+        """Reprend le workflow depuis le checkpoint avec uniquement la décision humaine"""
+        self.graph.update_state(
+            config,
+            {"human_feedback": human_feedback},
+            as_node="generate_questions"
+        )
+        return self.graph.stream(None, config)
+    
+    async def aresume_after_review(self, config: Dict, human_feedback: str):
+        """Reprend le workflow depuis le checkpoint (version asynchrone, via graph.astream)"""
+        await self.graph.aupdate_state(
+            config,
+            {"human_feedback": human_feedback},
+            as_node="generate_questions"
+        )
+        return self.graph.astream(None, config)
+    
+    def _analyze_document(self, agent_key: str, text: str, label: str) -> Tuple[Dict, str]:
+        """Analyse un document (CV ou JD) et retourne (analyse, erreur)"""
+        try:
+            if not text or not text.strip():
+                return {}, f"{label} text is empty"
+            result = self.agents[agent_key].analyze(text)
+            if result.get("success") and result.get("analysis"):
+                return result.get("analysis", {}), ""
+            return {}, result.get("error", f"{label} Analysis failed")
+        except Exception as e:
+            return {}, f"{label} Analysis exception: {str(e)}"
+    
+    async def _aanalyze_document(self, agent_key: str, text: str, label: str) -> Tuple[Dict, str]:
+        """Analyse un document (CV ou JD) de façon asynchrone"""
+        try:
+            if not text or not text.strip():
+                return {}, f"{label} text is empty"
+            result = await self.agents[agent_key].aanalyze(text)
+            if result.get("success") and result.get("analysis"):
+                return result.get("analysis", {}), ""
+            return {}, result.get("error", f"{label} Analysis failed")
+        except Exception as e:
+            return {}, f"{label} Analysis exception: {str(e)}"
+    
+    def _store_analyses(self, state: InterviewPrepState, cv_analysis: Dict, jd_analysis: Dict) -> None:
+        """Stocke les documents analysés dans le vector DB"""
         if cv_analysis:
             try:
                 self.vector_store.add_documents(
@@ -131,151 +180,115 @@ class InterviewPrepSupervisor:
                 )
             except Exception:
                 pass
-        
-        # Combiner les erreurs
+    
+    def _prefetch_company_search(self, state: InterviewPrepState) -> Dict:
+        """Recherche web spéculative: ne dépend que du nom de l'entreprise"""
+        if not state.get("company_name"):
+            return {}
+        try:
+            return self.agents["company_researcher"].search(state["company_name"])
+        except Exception as e:
+            return {"success": False, "error": str(e), "results": []}
+    
+    async def _aprefetch_company_search(self, state: InterviewPrepState) -> Dict:
+        """Recherche web spéculative (version asynchrone)"""
+        if not state.get("company_name"):
+            return {}
+        try:
+            return await self.agents["company_researcher"].asearch(state["company_name"])
+        except Exception as e:
+            return {"success": False, "error": str(e), "results": []}
+    
+    def _merge_analyses(self, state: InterviewPrepState, cv_analysis: Dict, cv_error: str,
+                        jd_analysis: Dict, jd_error: str) -> InterviewPrepState:
+        """Combine les analyses et les erreurs dans l'état"""
         errors = []
         if cv_error:
             errors.append(f"CV: {cv_error}")
         if jd_error:
             errors.append(f"JD: {jd_error}")
         
+        # Résumé calculé une fois (budgété pour le modèle du coach), réutilisé par chaque évaluation.
+        # Si une analyse a échoué, il reste vide et le coach le recalcule à partir de l'état.
+        coaching_context = ""
+        if cv_analysis and jd_analysis:
+            coaching_context = self.agents["interview_coach"].build_coaching_context(cv_analysis, jd_analysis)
+        
         return {
             **state,
             "cv_analysis": cv_analysis,
             "jd_analysis": jd_analysis,
+            "coaching_context": coaching_context,
             "error": "; ".join(errors) if errors else ""
         }
     
-    def analyze_cv_node(self, state: InterviewPrepState) -> InterviewPrepState:
-        """Nœud d'analyse CV"""
-        try:
-            # Vérifier que cv_text n'est pas vide
-            if not state.get("cv_text") or not state["cv_text"].strip():
-                return {
-                    **state,
-                    "cv_analysis": {},
-                    "error": "CV text is empty"
-                }
-            
-            result = self.agents["cv_analyzer"].analyze(state["cv_text"])
-            
-            # Debug: vérifier la structure de result
-            if not isinstance(result, dict):
-                return {
-                    **state,
-                    "cv_analysis": {},
-                    "error": f"CV Analysis returned invalid result: {type(result)}"
-                }
-            
-            # Vérifier que result contient bien les données
-            if not result.get("success", False):
-                error_msg = result.get("error", "Unknown error")
-                return {
-                    **state,
-                    "cv_analysis": {},
-                    "error": f"CV Analysis failed: {error_msg}"
-                }
-            
-            analysis = result.get("analysis", {})
-            
-            # Vérifier que analysis n'est pas vide
-            if not analysis or (isinstance(analysis, dict) and len(analysis) == 0):
-                return {
-                    **state,
-                    "cv_analysis": {},
-                    "error": "CV Analysis returned empty result"
-                }
-            
-            if result["success"] and analysis:
-                # Stocker dans vector DB
-                try:
-                    self.vector_store.add_documents(
-                        "cv_data",
-                        [state["cv_text"]],
-                        [{"type": "cv", "analysis": analysis}]
-                    )
-                except Exception as e:
-                    # Ne pas bloquer si le vector store échoue
-                    pass
+    def analyze_parallel_node(self, state: InterviewPrepState) -> InterviewPrepState:
+        """Nœud qui exécute l'analyse CV et JD en parallèle pour gagner du temps"""
+        # Exécuter les deux analyses en parallèle, avec la recherche web entreprise
+        # lancée dès l'entrée du graphe (elle ne dépend pas des analyses).
+        # Le contexte (session des agents, callbacks) est copié dans chaque thread.
+        with ContextThreadPoolExecutor(max_workers=3) as executor:
+            search_future = executor.submit(self._prefetch_company_search, state)
+            cv_future = executor.submit(self._analyze_document, "cv_analyzer", state.get("cv_text"), "CV")
+            jd_future = executor.submit(self._analyze_document, "jd_analyzer", state.get("jd_text"), "JD")
             
-            return {
-                **state,
-                "cv_analysis": analysis,
-                "error": ""
-            }
-        except Exception as e:
-            import traceback
-            error_trace = traceback.format_exc()
-            return {
-                **state,
-                "cv_analysis": {},
-                "error": f"CV Analysis exception: {str(e)}\n{error_trace}"
-            }
+            cv_analysis, cv_error = cv_future.result()
+            jd_analysis, jd_error = jd_future.result()
+            company_search = search_future.result()
+        
+        # Stocker dans vector DB si succès
+        self._store_analyses(state, cv_analysis, jd_analysis)
+        
+        return {
+            **self._merge_analyses(state, cv_analysis, cv_error, jd_analysis, jd_error),
+            "company_search": company_search
+        }
     
-    def analyze_jd_node(self, state: InterviewPrepState) -> InterviewPrepState:
-        """Nœud d'analyse JD"""
-        try:
-            result = self.agents["jd_analyzer"].analyze(state["jd_text"])
-            
-            # Debug: vérifier la structure de result
-            if not isinstance(result, dict):
-                return {
-                    **state,
-                    "jd_analysis": {},
-                    "error": f"JD Analysis returned invalid result: {type(result)}"
-                }
-            
-            # Vérifier que result contient bien les données
-            if not result.get("success", False):
-                error_msg = result.get("error", "Unknown error")
-                return {
-                    **state,
-                    "jd_analysis": {},
-                    "error": f"JD Analysis failed: {error_msg}"
-                }
-            
-            analysis = result.get("analysis", {})
-            
-            # Vérifier que analysis n'est pas vide
-            if not analysis or (isinstance(analysis, dict) and len(analysis) == 0):
-                return {
-                    **state,
-                    "jd_analysis": {},
-                    "error": "JD Analysis returned empty result"
-                }
-            
-            if result["success"] and analysis:
-                # Stocker dans vector DB
-                try:
-                    self.vector_store.add_documents(
-                        "jd_data",
-                        [state["jd_text"]],
-                        [{"type": "jd", "analysis": analysis}]
-                    )
-                except Exception as e:
-                    # Ne pas bloquer si le vector store échoue
-                    pass
-            
-            return {
-                **state,
-                "jd_analysis": analysis,
-                "error": ""
-            }
-        except Exception as e:
-            return {
-                **state,
-                "jd_analysis": {},
-                "error": f"JD Analysis exception: {str(e)}"
-            }
+    async def aanalyze_parallel_node(self, state: InterviewPrepState) -> InterviewPrepState:
+        """Nœud async: analyses CV/JD et recherche web concurrentes sur la boucle d'événements"""
+        (cv_analysis, cv_error), (jd_analysis, jd_error), company_search = await asyncio.gather(
+            self._aanalyze_document("cv_analyzer", state.get("cv_text"), "CV"),
+            self._aanalyze_document("jd_analyzer", state.get("jd_text"), "JD"),
+            self._aprefetch_company_search(state)
+        )
+        
+        # Le vector store (Chroma) est synchrone: l'exécuter hors de la boucle
+        await asyncio.to_thread(self._store_analyses, state, cv_analysis, jd_analysis)
+        
+        return {
+            **self._merge_analyses(state, cv_analysis, cv_error, jd_analysis, jd_error),
+            "company_search": company_search
+        }
     
     def research_company_node(self, state: InterviewPrepState) -> InterviewPrepState:
         """Nœud de recherche entreprise"""
         industry = state["jd_analysis"].get("industry", "")
         result = self.agents["company_researcher"].research(
             state["company_name"],
-            industry
+            industry,
+            search_results=self._prefetched_search(state)
         )
-        
+        return self._company_update(state, result)
+    
+    async def aresearch_company_node(self, state: InterviewPrepState) -> InterviewPrepState:
+        """Nœud de recherche entreprise (version asynchrone)"""
+        industry = state["jd_analysis"].get("industry", "")
+        result = await self.agents["company_researcher"].aresearch(
+            state["company_name"],
+            industry,
+            search_results=self._prefetched_search(state)
+        )
+        return self._company_update(state, result)
+    
+    @staticmethod
+    def _prefetched_search(state: InterviewPrepState):
+        """Résultats de la recherche spéculative, ou None pour relancer la recherche"""
+        company_search = state.get("company_search") or {}
+        return company_search if company_search.get("success") else None
+    
+    @staticmethod
+    def _company_update(state: InterviewPrepState, result: Dict) -> InterviewPrepState:
+        """Applique le résultat de la recherche entreprise à l'état"""
         return {
             **state,
             "company_info": result.get("info", {}),
@@ -289,21 +302,37 @@ class InterviewPrepSupervisor:
             state["jd_analysis"],
             state["company_info"]
         )
-        
+        return self._questions_update(state, result)
+    
+    async def agenerate_questions_node(self, state: InterviewPrepState) -> InterviewPrepState:
+        """Nœud de génération de questions (version asynchrone)"""
+        result = await self.agents["question_generator"].agenerate_questions(
+            state["cv_analysis"],
+            state["jd_analysis"],
+            state["company_info"]
+        )
+        return self._questions_update(state, result)
+    
+    @staticmethod
+    def _questions_update(state: InterviewPrepState, result: Dict) -> InterviewPrepState:
+        """Applique les questions générées à l'état"""
         return {
             **state,
             "questions": result.get("questions", []),
             "current_question_idx": 0,
             "human_approval_needed": True,
+            "next_step": "awaiting_human_input",
             "error": "" if result["success"] else result.get("error", "")
         }
     
     def human_review_node(self, state: InterviewPrepState) -> InterviewPrepState:
-        """Nœud d'attente de validation humaine"""
-        # Ce nœud met en pause le workflow pour intervention humaine
+        """Nœud de validation humaine"""
+        # Le graphe est interrompu avant ce nœud; il s'exécute à la reprise,
+        # une fois la décision (human_feedback) écrite dans le checkpoint
         return {
             **state,
-            "next_step": "awaiting_human_input"
+            "human_approval_needed": False,
+            "next_step": state.get("human_feedback") or "approved"
         }
     
     def conduct_interview_node(self, state: InterviewPrepState) -> InterviewPrepState:
@@ -320,17 +349,41 @@ class InterviewPrepSupervisor:
         last_answer = state["user_answers"][-1]
         question = state["questions"][last_answer["question_idx"]]
         
-        context = {
-            "cv": state["cv_analysis"],
-            "jd": state["jd_analysis"]
-        }
+        context = self._coaching_context(state)
         
         result = self.agents["interview_coach"].evaluate_answer(
             question["question"],
             last_answer["answer"],
             context
         )
+        return self._feedback_update(state, last_answer, result)
+    
+    async def aprovide_feedback_node(self, state: InterviewPrepState) -> InterviewPrepState:
+        """Nœud de feedback sur une réponse (version asynchrone)"""
+        if not state["user_answers"]:
+            return state
         
+        last_answer = state["user_answers"][-1]
+        question = state["questions"][last_answer["question_idx"]]
+        
+        context = self._coaching_context(state)
+        
+        result = await self.agents["interview_coach"].aevaluate_answer(
+            question["question"],
+            last_answer["answer"],
+            context
+        )
+        return self._feedback_update(state, last_answer, result)
+    
+    def _coaching_context(self, state: InterviewPrepState) -> str:
+        """Contexte de coaching de la session (recalculé si l'état n'en contient pas)"""
+        return state.get("coaching_context") or self.agents["interview_coach"].build_coaching_context(
+            state["cv_analysis"], state["jd_analysis"]
+        )
+    
+    @staticmethod
+    def _feedback_update(state: InterviewPrepState, last_answer: Dict, result: Dict) -> InterviewPrepState:
+        """Ajoute le feedback à l'historique et passe à la question suivante"""
         feedback_history = state.get("feedback_history", [])
         if result["success"]:
             feedback_history.append({
@@ -356,6 +409,18 @@ class InterviewPrepSupervisor:
             "general_tips": result.get("tips", {})
         }
     
+    async def agenerate_tips_node(self, state: InterviewPrepState) -> InterviewPrepState:
+        """Nœud de génération de conseils généraux (version asynchrone)"""
+        result = await self.agents["interview_coach"].agenerate_general_tips(
+            state["cv_analysis"],
+            state["jd_analysis"]
+        )
+        
+        return {
+            **state,
+            "general_tips": result.get("tips", {})
+        }
+    
     def route_after_human_review(self, state: InterviewPrepState) -> str:
         """Détermine la route après validation humaine"""
         feedback = state.get("human_feedback", "approved")
@@ -0,0 +1,314 @@
+"""Préparation d'entretien en lot: questions et conseils pour une cohorte de candidats.
+
+Usage:
+    python -m src.cli.batch_prep --cv-dir cvs/ --jd offre.pdf --company ACME -o resultats.jsonl
+    python -m src.cli.batch_prep --cv-dir cvs/ --jd offres/ --company ACME -o resultats.jsonl
+    python -m src.cli.batch_prep --manifest cohorte.jsonl -o resultats.jsonl --concurrency 8
+
+Le manifeste (JSONL ou CSV) décrit un triplet par ligne: ``id`` (optionnel), ``cv``,
+``jd`` et ``company``; les chemins relatifs sont résolus depuis le dossier du manifeste.
+Avec ``--jd`` un dossier, chaque CV est associé à l'offre de même nom de fichier.
+
+Chaque résultat est ajouté au JSONL dès qu'il est prêt. Après un arrêt, relancer la
+même commande reprend le lot: les candidats déjà écrits sont ignorés et ceux en cours
+repartent de leur dernier checkpoint (CHECKPOINT_DB_PATH).
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import csv
+import json
+import math
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.tools.document_parser import SUPPORTED_EXTENSIONS, DocumentParser
+from src.utils.cache import make_cache_key
+
+# Nœuds avant lesquels le workflow s'interrompt (décision humaine, entretien piloté par l'UI)
+_INTERRUPTS = ("human_review", "conduct_interview")
+# Champs de l'état final écrits dans le JSONL
+RESULT_FIELDS = ["company_name", "questions", "general_tips", "cv_analysis", "jd_analysis", "company_info"]
+
+
+def _documents(directory: Path) -> List[Path]:
+    return sorted(
+        path for path in directory.iterdir()
+        if path.is_file() and path.suffix.lstrip(".").lower() in SUPPORTED_EXTENSIONS
+    )
+
+
+def discover_items(cv_dir: str, jd: str, company: str) -> List[Dict]:
+    """Triplets depuis un dossier de CV et une offre commune (fichier) ou par CV (dossier)"""
+    jd_path = Path(jd)
+    jd_by_stem = {path.stem: path for path in _documents(jd_path)} if jd_path.is_dir() else None
+
+    items = []
+    for cv_path in _documents(Path(cv_dir)):
+        jd_file = jd_path if jd_by_stem is None else jd_by_stem.get(cv_path.stem)
+        if jd_file is None:
+            print(f"⚠️  {cv_path.name}: aucune offre {cv_path.stem}.* dans {jd}, ignoré", file=sys.stderr)
+            continue
+        items.append({"id": cv_path.stem, "cv": str(cv_path), "jd": str(jd_file), "company": company})
+    return items
+
+
+def load_manifest(path: str) -> List[Dict]:
+    """Triplets depuis un manifeste JSONL ou CSV (colonnes id, cv, jd, company)"""
+    manifest = Path(path)
+    with open(manifest, "r", encoding="utf-8", newline="") as f:
+        if manifest.suffix.lower() == ".csv":
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    items = []
+    for line_number, row in enumerate(rows, start=1):
+        if not row.get("cv") or not row.get("jd"):
+            raise ValueError(f"{path}:{line_number}: champs cv et jd requis")
+        cv_path, jd_path = (manifest.parent / row[field] for field in ("cv", "jd"))
+        items.append({
+            "id": str(row.get("id") or cv_path.stem),
+            "cv": str(cv_path),
+            "jd": str(jd_path),
+            "company": row.get("company") or "",
+        })
+    return items
+
+
+def load_completed(output: str) -> Set[str]:
+    """Identifiants déjà traités avec succès (une ligne tronquée par un arrêt est ignorée)"""
+    completed = set()
+    if not os.path.exists(output):
+        return completed
+    with open(output, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok":
+                completed.add(record["id"])
+    return completed
+
+
+def parse_documents(cv_path: str, jd_path: str) -> Tuple[str, str]:
+    """Texte du CV et de l'offre (exécuté dans un processus du pool de parsing)"""
+    return (
+        DocumentParser.parse_document(cv_path)["content"],
+        DocumentParser.parse_document(jd_path)["content"],
+    )
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile (rang le plus proche) d'une liste de valeurs"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class _JsonlWriter:
+    """Ajout ligne à ligne, écrit sur disque dès qu'un résultat est prêt"""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "a+", encoding="utf-8")
+        # Terminer une ligne laissée incomplète par un arrêt brutal
+        if self._file.tell() > 0:
+            self._file.seek(self._file.tell() - 1)
+            if self._file.read(1) != "\n":
+                self._file.write("\n")
+
+    def write(self, record: Dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class BatchRunner:
+    """Exécute le workflow (analyses, questions, conseils) pour chaque candidat d'un lot"""
+
+    def __init__(self, supervisor, output: str, concurrency: int = 4, parse_workers: int = 2,
+                 monitoring: bool = True):
+        self.supervisor = supervisor
+        self.output = output
+        self.concurrency = max(concurrency, 1)
+        self.parse_workers = max(parse_workers, 1)
+        self.monitoring = monitoring
+
+    @staticmethod
+    def thread_id(item: Dict, cv_text: str, jd_text: str) -> str:
+        """Thread de checkpoints du candidat: change si un des documents change"""
+        return "batch-" + make_cache_key(item["id"], cv_text, jd_text, item["company"])[:32]
+
+    def _agent_session(self, thread_id: str):
+        """Monitoring du candidat (désactivé ou indisponible: aucune trace)"""
+        from src.agents.base import AgentSession
+
+        if not self.monitoring:
+            return AgentSession()
+        try:
+            from src.utils.langfuse_config import get_monitoring
+            return AgentSession(monitor=get_monitoring(session_id=thread_id), user_id="batch_prep")
+        except Exception:
+            return AgentSession()
+
+    async def _run_workflow(self, item: Dict, cv_text: str, jd_text: str, config: Dict) -> Dict:
+        """Pilote le graphe jusqu'aux conseils, en reprenant le checkpoint s'il existe"""
+        graph = self.supervisor.get_graph()
+        snapshot = await graph.aget_state(config)
+
+        if not snapshot.values:
+            initial_state = self.supervisor.initial_state(cv_text, jd_text, item["company"])
+            async for _ in graph.astream(initial_state, config):
+                pass
+        elif snapshot.next and snapshot.next[0] not in _INTERRUPTS:
+            # Arrêt pendant un nœud: reprise depuis le dernier checkpoint
+            async for _ in graph.astream(None, config):
+                pass
+
+        snapshot = await graph.aget_state(config)
+        if "human_review" in (snapshot.next or ()):
+            # Pas de relecture humaine en lot: les questions générées sont validées
+            async for _ in await self.supervisor.aresume_after_review(config, "approved"):
+                pass
+            snapshot = await graph.aget_state(config)
+        return dict(snapshot.values)
+
+    async def _process(self, item: Dict, executor: concurrent.futures.Executor) -> Dict:
+        """Parse les documents puis exécute le workflow d'un candidat"""
+        from src.agents.base import agent_session
+
+        started = time.perf_counter()
+        record = {"id": item["id"], "cv": item["cv"], "jd": item["jd"]}
+        try:
+            loop = asyncio.get_running_loop()
+            cv_text, jd_text = await loop.run_in_executor(executor, parse_documents, item["cv"], item["jd"])
+            parse_seconds = time.perf_counter() - started
+
+            thread_id = self.thread_id(item, cv_text, jd_text)
+            config = {"configurable": {"thread_id": thread_id}, "recursion_limit": 50}
+            session = self._agent_session(thread_id)
+            with agent_session(session):
+                state = await self._run_workflow(item, cv_text, jd_text, config)
+            if session.monitor:
+                session.monitor.flush()
+
+            record.update({field: state.get(field) for field in RESULT_FIELDS})
+            record.update({
+                "status": "ok" if state.get("questions") else "error",
+                "error": state.get("error") or ("" if state.get("questions") else "Aucune question générée"),
+                "thread_id": thread_id,
+                "parse_seconds": round(parse_seconds, 3),
+            })
+        except Exception as e:
+            record.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+        record["latency_seconds"] = round(time.perf_counter() - started, 3)
+        return record
+
+    async def run(self, items: List[Dict]) -> Dict:
+        """Traite le lot (concurrence bornée) et retourne débit et percentiles de latence"""
+        completed = load_completed(self.output)
+        pending = [item for item in items if item["id"] not in completed]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        writer = _JsonlWriter(self.output)
+        latencies: List[float] = []
+        errors = 0
+        started = time.perf_counter()
+
+        async def bounded(item: Dict, executor: concurrent.futures.Executor) -> Dict:
+            async with semaphore:
+                return await self._process(item, executor)
+
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.parse_workers) as executor:
+                tasks = [asyncio.ensure_future(bounded(item, executor)) for item in pending]
+                # Chaque résultat est écrit dès qu'il est prêt, dans l'ordre de fin
+                for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+                    record = await task
+                    writer.write(record)
+                    if record["status"] == "ok":
+                        latencies.append(record["latency_seconds"])
+                        detail = ""
+                    else:
+                        errors += 1
+                        detail = f" {record['error']}"
+                    print(f"[{done}/{len(pending)}] {record['id']}: {record['status']} "
+                          f"({record['latency_seconds']:.1f}s){detail}", file=sys.stderr)
+        finally:
+            writer.close()
+
+        elapsed = time.perf_counter() - started
+        return {
+            "total": len(items),
+            "skipped": len(items) - len(pending),
+            "succeeded": len(latencies),
+            "failed": errors,
+            "elapsed_seconds": elapsed,
+            "throughput_per_minute": len(pending) / elapsed * 60 if pending and elapsed else 0.0,
+            "latency_seconds": {
+                "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+                "p50": percentile(latencies, 50),
+                "p90": percentile(latencies, 90),
+                "p99": percentile(latencies, 99),
+            },
+        }
+
+
+def print_report(report: Dict) -> None:
+    latency = report["latency_seconds"]
+    print(f"Candidats: {report['total']} ({report['skipped']} déjà traités), "
+          f"{report['succeeded']} réussis, {report['failed']} en échec")
+    print(f"Durée: {report['elapsed_seconds']:.1f}s, débit {report['throughput_per_minute']:.1f} candidats/min")
+    print(f"Latence: moyenne {latency['mean']:.1f}s, p50 {latency['p50']:.1f}s, "
+          f"p90 {latency['p90']:.1f}s, p99 {latency['p99']:.1f}s")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Préparation d'entretien en lot (questions et conseils)")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", help="manifeste JSONL ou CSV (id, cv, jd, company)")
+    source.add_argument("--cv-dir", help="dossier de CV (pdf, docx, txt)")
+    parser.add_argument("--jd", help="offre commune (fichier) ou dossier d'offres associées par nom")
+    parser.add_argument("--company", default="", help="entreprise (avec --cv-dir)")
+    parser.add_argument("-o", "--output", required=True, help="fichier JSONL des résultats (reprise)")
+    parser.add_argument("--concurrency", type=int, default=4, help="candidats traités en parallèle")
+    parser.add_argument("--parse-workers", type=int, default=min(os.cpu_count() or 1, 4),
+                        help="processus de parsing des documents")
+    parser.add_argument("--no-monitoring", action="store_true", help="désactive le traçage Langfuse")
+    parser.add_argument("--json", action="store_true", help="rapport final brut en JSON")
+    args = parser.parse_args(argv)
+
+    if args.cv_dir and not args.jd:
+        parser.error("--jd est requis avec --cv-dir")
+    items = load_manifest(args.manifest) if args.manifest else discover_items(args.cv_dir, args.jd, args.company)
+    if not items:
+        print("Aucun candidat à traiter", file=sys.stderr)
+        return 1
+
+    # Import différé: clients LLM, graphe et checkpointer ne sont construits qu'une fois le lot validé
+    from src.utils.runtime import build_runtime
+
+    runtime = build_runtime()
+    runner = BatchRunner(runtime.supervisor, args.output, concurrency=args.concurrency,
+                         parse_workers=args.parse_workers, monitoring=not args.no_monitoring)
+    report = asyncio.run(runner.run(items))
+    report["http_pool"] = runtime.http_pool.stats()
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,49 +1,276 @@
-import PyPDF2
-import docx
-from typing import Dict, Optional
+import codecs
+import hashlib
+import io
+import os
+import threading
+import zipfile
+import concurrent.futures
+from collections import OrderedDict
+from typing import BinaryIO, Dict, Iterator, List, Optional, Union
+from src.utils.cache import PersistentCache, make_cache_key
+
+# Nombre de pages à partir duquel l'extraction PDF est répartie sur plusieurs processus
+PDF_PARALLEL_PAGE_THRESHOLD = int(os.getenv("PDF_PARALLEL_PAGE_THRESHOLD", "8"))
+
+# Version du parsing: à incrémenter quand l'extraction change pour invalider le cache
+PARSER_VERSION = "2"
+PARSE_CACHE_MAX_ENTRIES = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "64"))
+
+SUPPORTED_EXTENSIONS = ("pdf", "docx", "doc", "txt")
+
+# Conteneur OLE des documents Word 97-2003 (.doc), non lisible par python-docx
+_OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+_LEGACY_DOC_ERROR = "Format non supporté: document Word 97-2003 (.doc), convertissez-le en .docx ou PDF"
+# Préfixe décodé pour reconnaître un texte UTF-8 sans décoder tout le contenu
+_TEXT_SNIFF_BYTES = 4096
+
+# Un document peut être un chemin, des octets (bytes, memoryview) ou un objet fichier binaire
+DocumentSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+
+def _is_path(source) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+
+def _read_bytes(source) -> bytes:
+    """Lit le contenu binaire d'une source en mémoire (buffer d'upload, objet fichier)"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if hasattr(source, "getvalue"):
+        return bytes(source.getvalue())
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source.read()
+
+
+def _open_binary(source) -> BinaryIO:
+    """Ouvre une source (chemin ou octets) en flux binaire"""
+    if _is_path(source):
+        return open(source, 'rb')
+    return io.BytesIO(source)
+
+
+def detect_format(data: bytes) -> str:
+    """Détecte le format d'un document à partir de ses premiers octets"""
+    head = data[:8]
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if head.startswith(_OLE_MAGIC):
+        raise ValueError(_LEGACY_DOC_ERROR)
+    if head.startswith(b"PK\x03\x04"):
+        # Conteneur ZIP: seul un document Word en contient la partie principale (xlsx, odt, pptx...)
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                names = set(archive.namelist())
+        except zipfile.BadZipFile:
+            raise ValueError("Format non supporté: archive ZIP invalide")
+        if "word/document.xml" not in names:
+            raise ValueError("Format non supporté: archive ZIP qui n'est pas un document Word (.docx)")
+        return "docx"
+    try:
+        # Décodage incrémental: un caractère multi-octets coupé en fin de préfixe reste valide
+        codecs.getincrementaldecoder("utf-8")().decode(data[:_TEXT_SNIFF_BYTES], final=False)
+    except UnicodeDecodeError:
+        raise ValueError("Format non supporté: contenu binaire inconnu")
+    return "txt"
+
+
+# Lecteur PDF d'un processus worker, ouvert une seule fois (initializer du pool)
+_worker_reader = None
+
+
+def _init_pdf_worker(source) -> None:
+    """Ouvre le PDF une fois par worker: par son chemin, ou depuis des octets transmis une seule fois"""
+    global _worker_reader
+    import PyPDF2
+
+    _worker_reader = PyPDF2.PdfReader(_open_binary(source))
+
+
+def _extract_page_range(start: int, stop: int) -> List[str]:
+    """Extrait le texte des pages [start, stop) du PDF ouvert par le worker"""
+    return [_worker_reader.pages[idx].extract_text() or "" for idx in range(start, stop)]
+
 
 class DocumentParser:
+    # Cache des documents parsés, clé = (version du parser, format, SHA-256 des octets)
+    _parse_cache: "OrderedDict[str, Dict]" = OrderedDict()
+    _parse_cache_lock = threading.Lock()
+    _parse_cache_max_entries = PARSE_CACHE_MAX_ENTRIES
+    _disk_cache: Optional[PersistentCache] = None
+    cache_hits = 0
+    cache_misses = 0
+
+    @classmethod
+    def configure_cache(cls, disk_cache: Optional[PersistentCache] = None,
+                        max_entries: Optional[int] = None) -> None:
+        """Configure le cache de parsing (taille du LRU mémoire, tier disque optionnel)"""
+        with cls._parse_cache_lock:
+            cls._disk_cache = disk_cache
+            if max_entries is not None:
+                cls._parse_cache_max_entries = max_entries
+                while len(cls._parse_cache) > max_entries:
+                    cls._parse_cache.popitem(last=False)
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        """Vide le cache mémoire (le tier disque est conservé)"""
+        with cls._parse_cache_lock:
+            cls._parse_cache.clear()
+            cls.cache_hits = 0
+            cls.cache_misses = 0
+
+    @classmethod
+    def cache_stats(cls) -> Dict:
+        """Compteurs hit/miss du cache de parsing"""
+        with cls._parse_cache_lock:
+            total = cls.cache_hits + cls.cache_misses
+            return {
+                "hits": cls.cache_hits,
+                "misses": cls.cache_misses,
+                "hit_rate": cls.cache_hits / total if total else 0.0,
+                "size": len(cls._parse_cache)
+            }
+
+    @classmethod
+    def _cache_get(cls, key: str) -> Optional[Dict]:
+        """Cherche un document parsé dans le LRU mémoire puis sur disque"""
+        with cls._parse_cache_lock:
+            parsed = cls._parse_cache.get(key)
+            if parsed is not None:
+                cls._parse_cache.move_to_end(key)
+                cls.cache_hits += 1
+                return parsed
+            disk_cache = cls._disk_cache
+
+        parsed = disk_cache.get(key) if disk_cache is not None else None
+        with cls._parse_cache_lock:
+            if parsed is None:
+                cls.cache_misses += 1
+                return None
+            cls.cache_hits += 1
+        cls._cache_set(key, parsed, persist=False)
+        return parsed
+
+    @classmethod
+    def _cache_set(cls, key: str, parsed: Dict, persist: bool = True) -> None:
+        """Enregistre un document parsé (LRU mémoire et, si configuré, disque)"""
+        with cls._parse_cache_lock:
+            cls._parse_cache[key] = parsed
+            cls._parse_cache.move_to_end(key)
+            while len(cls._parse_cache) > cls._parse_cache_max_entries:
+                cls._parse_cache.popitem(last=False)
+            disk_cache = cls._disk_cache
+
+        if persist and disk_cache is not None:
+            disk_cache.set(key, parsed)
+
     @staticmethod
-    def parse_pdf(file_path: str) -> str:
-        """Extrait le texte d'un PDF"""
+    def iter_pdf_pages(source: DocumentSource, parallel: Optional[bool] = None,
+                       max_workers: Optional[int] = None) -> Iterator[str]:
+        """Génère le texte de chaque page d'un PDF, dans l'ordre, dès qu'il est extrait"""
+        if not _is_path(source):
+            source = _read_bytes(source)
+
         try:
-            with open(file_path, 'rb') as file:
+            # Import différé: PyPDF2 n'est chargé qu'au premier PDF parsé
+            import PyPDF2
+
+            with _open_binary(source) as file:
                 reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-                return text.strip()
+                page_count = len(reader.pages)
+
+                if parallel is None:
+                    parallel = page_count >= PDF_PARALLEL_PAGE_THRESHOLD
+                workers = max_workers or min(os.cpu_count() or 1, page_count)
+
+                # Petits fichiers: chemin série, sans coût de démarrage de processus
+                if not parallel or workers < 2:
+                    for page in reader.pages:
+                        yield page.extract_text() or ""
+                    return
+
+            # Découper en lots de pages contigus (2 lots par worker pour équilibrer)
+            batch_size = max(1, -(-page_count // (workers * 2)))
+            starts = list(range(0, page_count, batch_size))
+            stops = [min(start + batch_size, page_count) for start in starts]
+
+            # Chaque lot ne transmet que ses bornes de pages; le document est ouvert une fois par worker
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_pdf_worker,
+                                                        initargs=(source,)) as executor:
+                # executor.map restitue les lots dans l'ordre des pages
+                for pages in executor.map(_extract_page_range, starts, stops):
+                    yield from pages
         except Exception as e:
             raise Exception(f"Erreur parsing PDF: {str(e)}")
-    
+
+    @staticmethod
+    def parse_pdf(source: DocumentSource, parallel: Optional[bool] = None,
+                  max_workers: Optional[int] = None) -> str:
+        """Extrait le texte d'un PDF"""
+        pages = DocumentParser.iter_pdf_pages(source, parallel=parallel, max_workers=max_workers)
+        return "\n".join(pages).strip()
+
     @staticmethod
-    def parse_docx(file_path: str) -> str:
+    def parse_docx(source: DocumentSource) -> str:
         """Extrait le texte d'un DOCX"""
         try:
-            doc = docx.Document(file_path)
+            import docx
+
+            if not _is_path(source):
+                source = io.BytesIO(_read_bytes(source))
+            doc = docx.Document(source)
             text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
             return text.strip()
         except Exception as e:
             raise Exception(f"Erreur parsing DOCX: {str(e)}")
-    
+
     @staticmethod
-    def parse_document(file_path: str) -> Dict:
-        """Parse un document et retourne le contenu"""
-        extension = file_path.split('.')[-1].lower()
-        
+    def _parse_bytes(data: bytes, extension: str) -> str:
+        """Extrait le texte d'un document déjà chargé en mémoire"""
         if extension == 'pdf':
-            content = DocumentParser.parse_pdf(file_path)
-        elif extension in ['docx', 'doc']:
-            content = DocumentParser.parse_docx(file_path)
-        elif extension == 'txt':
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            return DocumentParser.parse_pdf(data)
+        if extension in ['docx', 'doc']:
+            if data.startswith(_OLE_MAGIC):
+                raise ValueError(_LEGACY_DOC_ERROR)
+            return DocumentParser.parse_docx(data)
+        # Même normalisation des fins de ligne qu'une lecture en mode texte
+        return data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+    @classmethod
+    def parse_document(cls, source: DocumentSource, filename: Optional[str] = None,
+                       use_cache: bool = True) -> Dict:
+        """Parse un document (chemin, octets ou objet fichier) et retourne le contenu"""
+        if _is_path(source):
+            file_path = os.fspath(source)
+            extension = file_path.split('.')[-1].lower()
+            if extension not in SUPPORTED_EXTENSIONS:
+                raise ValueError(f"Format non supporté: {extension}")
+            with open(file_path, 'rb') as f:
+                data = f.read()
         else:
-            raise ValueError(f"Format non supporté: {extension}")
-        
+            # Contenu en mémoire: format détecté depuis les octets, sans écriture disque
+            data = _read_bytes(source)
+            file_path = filename
+            extension = detect_format(data)
+
+        # Un même fichier (retry, CV modèle partagé) n'est parsé qu'une fois
+        key = make_cache_key("document", PARSER_VERSION, extension, hashlib.sha256(data).hexdigest())
+        parsed = cls._cache_get(key) if use_cache else None
+
+        if parsed is None:
+            content = cls._parse_bytes(data, extension)
+            parsed = {
+                "content": content,
+                "extension": extension,
+                "length": len(content)
+            }
+            if use_cache:
+                cls._cache_set(key, parsed)
+
         return {
-            "content": content,
+            "content": parsed["content"],
             "file_path": file_path,
-            "extension": extension,
-            "length": len(content)
-        }
\ No newline at end of file
+            "extension": parsed["extension"],
+            "length": parsed["length"]
+        }
@@ -1,44 +1,348 @@
-from langchain_chroma import Chroma
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.schema import Document
-from chromadb.config import Settings
-from typing import List, Dict
+import json
+import os
+import threading
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from typing import Any, List, Dict, Optional
+from src.utils.cache import PersistentCache, llm_identity, make_cache_key
+
+
+def chunk_id(text: str) -> str:
+    """Identifiant stable d'un chunk: hash SHA-256 de son contenu"""
+    return make_cache_key(text)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings avec cache local persistant, clé = (modèle, hash du chunk)"""
+
+    def __init__(self, embeddings, cache: PersistentCache, model_name: Optional[str] = None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name or llm_identity(embeddings)
+        self.computed = 0
+
+    def _key(self, text: str) -> str:
+        return make_cache_key(self.model_name, chunk_id(text))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Retourne les vecteurs en ne calculant que ceux absents du cache"""
+        keys = [self._key(text) for text in texts]
+        # Une seule transaction SQLite pour la lecture du lot, une autre pour l'écriture des vecteurs calculés
+        cached = self.cache.get_many(keys)
+        vectors: List[Optional[List[float]]] = [cached.get(key) for key in keys]
+        missing = [idx for idx, vector in enumerate(vectors) if vector is None]
+
+        if missing:
+            computed = self.embeddings.embed_documents([texts[idx] for idx in missing])
+            self.computed += len(missing)
+            for idx, vector in zip(missing, computed):
+                vectors[idx] = vector
+            self.cache.set_many({keys[idx]: vectors[idx] for idx in missing})
+
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """Retourne le vecteur d'une requête (mis en cache)"""
+        key = self._key(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.computed += 1
+            self.cache.set(key, vector)
+        return vector
+
 
 class VectorStore:
-    def __init__(self, embeddings, persist_directory="./data/vector_db"):
+    # Un seul client chromadb par persist_directory, partagé par toutes les instances du process
+    _clients: Dict[str, Any] = {}
+    _client_refs: Dict[str, int] = {}
+    _clients_lock = threading.Lock()
+
+    def __init__(self, embeddings, persist_directory="./data/vector_db",
+                 embedding_cache: Optional[PersistentCache] = None):
+        # Les embeddings déjà calculés sont relus depuis le cache local
+        if embedding_cache is not None:
+            embeddings = CachedEmbeddings(embeddings, embedding_cache)
         self.embeddings = embeddings
         self.persist_directory = persist_directory
-        self.client_settings = Settings(anonymized_telemetry=False)
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
-        )
-        
+        # chromadb et le splitter sont importés à la première utilisation
+        self._client_settings = None
+        self._text_splitter = None
+        # Registre des collections ouvertes (handles Chroma réutilisés entre appels)
+        self._collections: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._client_key = None
+        self.opened = 0
+        self.reused = 0
+
+    @property
+    def client_settings(self):
+        if self._client_settings is None:
+            from chromadb.config import Settings
+            self._client_settings = Settings(anonymized_telemetry=False)
+        return self._client_settings
+
+    @property
+    def text_splitter(self):
+        if self._text_splitter is None:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+            self._text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=1000,
+                chunk_overlap=200
+            )
+        return self._text_splitter
+
+    def _get_client(self):
+        """Retourne le client chromadb partagé pour le répertoire de persistance"""
+        if self._client_key is None:
+            key = os.path.abspath(self.persist_directory)
+            with VectorStore._clients_lock:
+                if key not in VectorStore._clients:
+                    import chromadb
+                    VectorStore._clients[key] = chromadb.PersistentClient(
+                        path=key,
+                        settings=self.client_settings
+                    )
+                    VectorStore._client_refs[key] = 0
+                VectorStore._client_refs[key] += 1
+            self._client_key = key
+        return VectorStore._clients[self._client_key]
+
     def create_or_load_store(self, collection_name: str):
-        """Crée ou charge une collection"""
-        return Chroma(
-            collection_name=collection_name,
-            embedding_function=self.embeddings,
-            persist_directory=self.persist_directory,
-            client_settings=self.client_settings
-        )
-    
+        """Crée ou charge une collection (handle mis en cache après la première ouverture)"""
+        with self._lock:
+            vectorstore = self._collections.get(collection_name)
+            if vectorstore is not None:
+                self.reused += 1
+                return vectorstore
+
+            from langchain_chroma import Chroma
+            vectorstore = Chroma(
+                collection_name=collection_name,
+                embedding_function=self.embeddings,
+                client=self._get_client(),
+                client_settings=self.client_settings
+            )
+            self._collections[collection_name] = vectorstore
+            self.opened += 1
+            return vectorstore
+
+    def close_collection(self, collection_name: str) -> None:
+        """Libère le handle d'une collection"""
+        with self._lock:
+            self._collections.pop(collection_name, None)
+
+    def close(self) -> None:
+        """Libère tous les handles et la référence au client partagé"""
+        with self._lock:
+            self._collections.clear()
+            if self._client_key is None:
+                return
+            with VectorStore._clients_lock:
+                VectorStore._client_refs[self._client_key] -= 1
+                if VectorStore._client_refs[self._client_key] <= 0:
+                    VectorStore._clients.pop(self._client_key, None)
+                    VectorStore._client_refs.pop(self._client_key, None)
+            self._client_key = None
+
+    def stats(self) -> Dict:
+        """Compteurs d'ouverture/réutilisation des collections"""
+        with self._lock:
+            return {
+                "open_collections": len(self._collections),
+                "opened": self.opened,
+                "reused": self.reused
+            }
+
+    @staticmethod
+    def _sanitize_metadata(metadata: Dict) -> Dict:
+        """Chroma n'accepte que des scalaires: sérialiser les valeurs complexes en JSON"""
+        return {
+            key: value if isinstance(value, (str, int, float, bool)) else json.dumps(value, ensure_ascii=False)
+            for key, value in (metadata or {}).items()
+            if value is not None
+        }
+
     def add_documents(self, collection_name: str, texts: List[str], metadatas: List[Dict] = None):
-        """Ajoute des documents au vector store"""
+        """Ajoute des documents au vector store (les chunks déjà présents sont ignorés)"""
         vectorstore = self.create_or_load_store(collection_name)
-        
+
         # Split texts
-        documents = [Document(page_content=text, metadata=meta or {}) 
+        documents = [Document(page_content=text, metadata=self._sanitize_metadata(meta))
                     for text, meta in zip(texts, metadatas or [{}]*len(texts))]
-        
+
         splits = self.text_splitter.split_documents(documents)
-        
+
+        # Dédupliquer: le hash du contenu sert d'id Chroma
+        unique_splits = {}
+        for split in splits:
+            unique_splits.setdefault(chunk_id(split.page_content), split)
+
+        if not unique_splits:
+            return vectorstore
+
+        existing = vectorstore.get(ids=list(unique_splits), include=[])
+        existing_ids = set(existing.get("ids", []))
+        new_ids = [split_id for split_id in unique_splits if split_id not in existing_ids]
+
         # Add to vectorstore
-        vectorstore.add_documents(splits)
-        
+        if new_ids:
+            vectorstore.add_documents([unique_splits[split_id] for split_id in new_ids], ids=new_ids)
+
         return vectorstore
-    
+
     def similarity_search(self, collection_name: str, query: str, k: int = 3):
         """Recherche de documents similaires"""
         vectorstore = self.create_or_load_store(collection_name)
-        return vectorstore.similarity_search(query, k=k)
\ No newline at end of file
+        return vectorstore.similarity_search(query, k=k)
+
+
+class _FaissCollection:
+    """Collection FAISS persistée: index (.faiss) + documents (.json), chargée via mmap.
+
+    Au premier ajout, l'index mappé est chargé en mémoire une fois et y reste pour les ajouts suivants.
+    """
+
+    def __init__(self, directory: str, name: str):
+        import faiss
+
+        self._faiss = faiss
+        self.index_path = os.path.join(directory, f"{name}.faiss")
+        self.docs_path = os.path.join(directory, f"{name}.json")
+        self.index = None
+        # Faux tant que l'index est le mappage mmap en lecture seule du fichier
+        self._writable = True
+        self.documents: List[Dict] = []
+        self.ids = set()
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.index_path) and os.path.exists(self.docs_path):
+            # Index en lecture seule mappé en mémoire: pas de copie au chargement
+            self.index = faiss.read_index(
+                self.index_path,
+                faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+            )
+            self._writable = False
+            with open(self.docs_path, "r", encoding="utf-8") as f:
+                self.documents = json.load(f)
+            self.ids = {doc["id"] for doc in self.documents}
+
+    def _vectors(self, vectors: List[List[float]]):
+        import numpy as np
+
+        matrix = np.asarray(vectors, dtype="float32")
+        # Vecteurs normalisés: produit scalaire = similarité cosinus
+        self._faiss.normalize_L2(matrix)
+        return matrix
+
+    def add(self, documents: List[Document], ids: List[str], vectors: List[List[float]]) -> int:
+        """Ajoute les documents absents de l'index puis le réécrit sur disque (retourne le nombre ajouté)"""
+        with self._lock:
+            # Vérification et insertion sous le même verrou: deux ajouts concurrents n'insèrent qu'une fois
+            fresh: Dict[str, int] = {}
+            for position, doc_id in enumerate(ids):
+                if doc_id not in self.ids:
+                    fresh.setdefault(doc_id, position)
+            if not fresh:
+                return 0
+
+            matrix = self._vectors([vectors[position] for position in fresh.values()])
+            if self.index is None:
+                self.index = self._faiss.IndexFlatIP(matrix.shape[1])
+            elif not self._writable:
+                # L'index mappé est en lecture seule: chargé une fois en mémoire, puis gardé entre les ajouts
+                self.index = self._faiss.read_index(self.index_path)
+            self._writable = True
+
+            self.index.add(matrix)
+            self.documents.extend(
+                {"id": doc_id, "text": documents[position].page_content,
+                 "metadata": documents[position].metadata}
+                for doc_id, position in fresh.items()
+            )
+            self.ids.update(fresh)
+
+            # Écriture atomique des deux fichiers
+            self._faiss.write_index(self.index, self.index_path + ".tmp")
+            with open(self.docs_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(self.documents, f, ensure_ascii=False)
+            os.replace(self.index_path + ".tmp", self.index_path)
+            os.replace(self.docs_path + ".tmp", self.docs_path)
+            return len(fresh)
+
+    def search(self, vector: List[float], k: int) -> List[Document]:
+        """Retourne les k documents les plus proches"""
+        query = self._vectors([vector])
+        with self._lock:
+            if self.index is None or not self.documents:
+                return []
+            _, positions = self.index.search(query, min(k, len(self.documents)))
+        return [
+            Document(
+                page_content=self.documents[position]["text"],
+                metadata=self.documents[position]["metadata"]
+            )
+            for position in positions[0]
+            if position != -1
+        ]
+
+
+class FaissVectorStore(VectorStore):
+    """Alternative locale à Chroma: index FAISS persisté sur disque et chargé via mmap"""
+
+    def create_or_load_store(self, collection_name: str):
+        """Crée ou charge une collection FAISS (handle mis en cache)"""
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if collection is not None:
+                self.reused += 1
+                return collection
+
+            os.makedirs(self.persist_directory, exist_ok=True)
+            collection = _FaissCollection(self.persist_directory, collection_name)
+            self._collections[collection_name] = collection
+            self.opened += 1
+            return collection
+
+    def close(self) -> None:
+        """Libère tous les handles"""
+        with self._lock:
+            self._collections.clear()
+
+    def add_documents(self, collection_name: str, texts: List[str], metadatas: List[Dict] = None):
+        """Ajoute des documents à l'index FAISS (les chunks déjà présents sont ignorés)"""
+        collection = self.create_or_load_store(collection_name)
+
+        documents = [Document(page_content=text, metadata=self._sanitize_metadata(meta))
+                    for text, meta in zip(texts, metadatas or [{}]*len(texts))]
+        splits = self.text_splitter.split_documents(documents)
+
+        unique_splits = {}
+        for split in splits:
+            split_id = chunk_id(split.page_content)
+            if split_id not in collection.ids:
+                unique_splits.setdefault(split_id, split)
+
+        if unique_splits:
+            new_splits = list(unique_splits.values())
+            vectors = self.embeddings.embed_documents([split.page_content for split in new_splits])
+            collection.add(new_splits, list(unique_splits), vectors)
+
+        return collection
+
+    def similarity_search(self, collection_name: str, query: str, k: int = 3):
+        """Recherche de documents similaires"""
+        collection = self.create_or_load_store(collection_name)
+        return collection.search(self.embeddings.embed_query(query), k)
+
+
+def get_vector_store(embeddings, persist_directory: Optional[str] = None,
+                     embedding_cache: Optional[PersistentCache] = None,
+                     backend: Optional[str] = None) -> VectorStore:
+    """Instancie le vector store configuré (VECTOR_STORE_BACKEND=chroma|faiss)"""
+    backend = (backend or os.getenv("VECTOR_STORE_BACKEND", "chroma")).lower()
+    persist_directory = persist_directory or os.getenv("VECTOR_DB_PATH", "./data/vector_db")
+
+    if backend == "faiss":
+        return FaissVectorStore(embeddings, persist_directory, embedding_cache=embedding_cache)
+    return VectorStore(embeddings, persist_directory, embedding_cache=embedding_cache)
@@ -1,25 +1,56 @@
-from tavily import TavilyClient
 import os
 from typing import List, Dict
 
+TAVILY_API_URL = os.getenv("TAVILY_API_URL", "https://api.tavily.com")
+
+
 class WebSearchTool:
-    def __init__(self):
-        self.client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
-    
-    def search_company_info(self, company_name: str, additional_context: str = "") -> Dict:
-        """Recherche des informations sur une entreprise"""
-        query = f"{company_name} company information culture values {additional_context}"
-        
+    """Recherche web via l'API REST de Tavily, sur le pool HTTP keep-alive partagé"""
+
+    def __init__(self, http_pool=None):
+        # Pool (et httpx) récupéré à la première recherche s'il n'est pas injecté
+        self._http_pool = http_pool
+        self.api_key = os.getenv("TAVILY_API_KEY")
+
+    @property
+    def http_pool(self):
+        if self._http_pool is None:
+            from src.utils.http_pool import get_http_pool
+            self._http_pool = get_http_pool()
+        return self._http_pool
+
+    def _payload(self, query: str, search_depth: str, max_results: int) -> Dict:
+        return {
+            "query": query,
+            "search_depth": search_depth,
+            "max_results": max_results
+        }
+
+    def _headers(self) -> Dict:
+        # Authentification documentée de l'API: clé en en-tête Bearer uniquement
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    @staticmethod
+    def _company_query(company_name: str, additional_context: str = "") -> str:
+        return f"{company_name} company information culture values {additional_context}"
+
+    @staticmethod
+    def _tips_query(job_title: str, industry: str) -> str:
+        return f"interview tips {job_title} {industry} best practices"
+
+    def _search(self, query: str, search_depth: str, max_results: int) -> Dict:
+        """Exécute une recherche Tavily et normalise la réponse"""
         try:
-            response = self.client.search(
-                query=query,
-                search_depth="advanced",
-                max_results=5
+            response = self.http_pool.client.post(
+                f"{TAVILY_API_URL}/search",
+                json=self._payload(query, search_depth, max_results),
+                headers=self._headers()
             )
-            
+            response.raise_for_status()
+
             return {
                 "success": True,
-                "results": response.get("results", []),
+                "results": response.json().get("results", []),
                 "query": query
             }
         except Exception as e:
@@ -28,21 +59,20 @@ class WebSearchTool:
                 "error": str(e),
                 "results": []
             }
-    
-    def search_interview_tips(self, job_title: str, industry: str) -> Dict:
-        """Recherche des conseils d'entretien pour un poste"""
-        query = f"interview tips {job_title} {industry} best practices"
-        
+
+    async def _asearch(self, query: str, search_depth: str, max_results: int) -> Dict:
+        """Exécute une recherche Tavily asynchrone et normalise la réponse"""
         try:
-            response = self.client.search(
-                query=query,
-                search_depth="basic",
-                max_results=3
+            response = await self.http_pool.async_client.post(
+                f"{TAVILY_API_URL}/search",
+                json=self._payload(query, search_depth, max_results),
+                headers=self._headers()
             )
-            
+            response.raise_for_status()
+
             return {
                 "success": True,
-                "results": response.get("results", []),
+                "results": response.json().get("results", []),
                 "query": query
             }
         except Exception as e:
@@ -50,4 +80,20 @@ class WebSearchTool:
                 "success": False,
                 "error": str(e),
                 "results": []
-            }
\ No newline at end of file
+            }
+
+    def search_company_info(self, company_name: str, additional_context: str = "") -> Dict:
+        """Recherche des informations sur une entreprise"""
+        return self._search(self._company_query(company_name, additional_context), "advanced", 5)
+
+    async def asearch_company_info(self, company_name: str, additional_context: str = "") -> Dict:
+        """Recherche des informations sur une entreprise (version asynchrone)"""
+        return await self._asearch(self._company_query(company_name, additional_context), "advanced", 5)
+
+    def search_interview_tips(self, job_title: str, industry: str) -> Dict:
+        """Recherche des conseils d'entretien pour un poste"""
+        return self._search(self._tips_query(job_title, industry), "basic", 3)
+
+    async def asearch_interview_tips(self, job_title: str, industry: str) -> Dict:
+        """Recherche des conseils d'entretien pour un poste (version asynchrone)"""
+        return await self._asearch(self._tips_query(job_title, industry), "basic", 3)
@@ -3,23 +3,18 @@ from pathlib import Path
 import sys
 import json
 import os
+import re
+import uuid
 from datetime import datetime
 
 # Ajouter le répertoire parent au path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from src.agents.cv_analyzer import CVAnalyzerAgent
-from src.agents.jd_analyzer import JDAnalyzerAgent
-from src.agents.company_researcher import CompanyResearcherAgent
-from src.agents.question_generator import QuestionGeneratorAgent
-from src.agents.interview_coach import InterviewCoachAgent
-from src.agents.supervisor import InterviewPrepSupervisor, InterviewPrepState
+# Modules légers uniquement: langgraph, chromadb, httpx, langfuse, PyPDF2 et docx
+# sont importés à la première utilisation (cf. benchmarks/startup)
+from src.agents.base import AgentSession, set_agent_session
 from src.tools.document_parser import DocumentParser
-from src.tools.web_search import WebSearchTool
-from src.tools.vector_store import VectorStore
-from src.utils.llm_config import LLMConfig
-from src.utils.langfuse_config import LangfuseMonitoring
-from langgraph.checkpoint.memory import MemorySaver
+from src.utils.langfuse_config import NoOpMonitoring, get_monitoring
 
 AGENT_VERSION = "2025-11-18-r3"
 
@@ -87,22 +82,80 @@ def init_session_state():
         st.session_state.interview_started = False
     if "current_question" not in st.session_state:
         st.session_state.current_question = 0
+    if "session_id" not in st.session_state:
+        # Une session rouverte via son URL (?session=...) reprend son checkpoint
+        session_param = st.experimental_get_query_params().get("session", [""])[0]
+        restore = bool(re.fullmatch(r"[0-9a-f]{32}", session_param))
+        st.session_state.session_id = session_param if restore else uuid.uuid4().hex
+        # Seule une session rouverte a un checkpoint à relire
+        st.session_state.restore_pending = restore
+        st.experimental_set_query_params(session=st.session_state.session_id)
+
+def workflow_config() -> dict:
+    """Config LangGraph de la session: un thread de checkpoints par session"""
+    return {"configurable": {"thread_id": st.session_state.session_id}}
+
+def restore_workflow():
+    """Recharge l'état du workflow depuis le checkpoint de la session (après redémarrage)"""
+    if not st.session_state.get("restore_pending") or not st.session_state.agents_initialized:
+        return
+    st.session_state.restore_pending = False
+    if st.session_state.workflow_state is not None:
+        return
+    try:
+        snapshot = get_runtime().supervisor.get_graph().get_state(workflow_config())
+    except Exception:
+        return
+    if not snapshot.values:
+        return
+    
+    st.session_state.workflow_state = dict(snapshot.values)
+    st.session_state.current_step = "interview" if "conduct_interview" in (snapshot.next or ()) else "analysis"
+
+def flush_monitoring():
+    """Flush unique du monitoring en fin de session (les événements partent en arrière-plan)"""
+    langfuse_monitor = st.session_state.get("langfuse_monitor")
+    if langfuse_monitor:
+        try:
+            langfuse_monitor.flush()
+        except Exception:
+            pass
 
 def reset_agents():
-    """Force la réinitialisation complète des agents"""
+    """Réinitialise la session de l'utilisateur (les ressources partagées du process sont conservées)"""
+    flush_monitoring()
     st.session_state.agents_initialized = False
     st.session_state.agents_version = None
-    st.session_state.supervisor = None
-    st.session_state.vector_store = None
+    st.session_state.agent_session = None
     st.session_state.workflow_state = None
     st.session_state.current_step = "upload"
     st.session_state.interview_started = False
     st.session_state.current_question = 0
+    # Nouvelle session: les checkpoints de l'ancienne sont supprimés
+    try:
+        from src.utils.checkpointer import get_checkpointer
+        get_checkpointer().delete_thread(st.session_state.session_id)
+    except Exception:
+        pass
+    st.session_state.session_id = uuid.uuid4().hex
+    st.experimental_set_query_params(session=st.session_state.session_id)
     st.rerun()
 
+@st.cache_resource(show_spinner="🚀 Initialisation des agents IA...")
+def shared_runtime(agent_version: str) -> "AppRuntime":
+    """Agents, clients LLM et graphe compilé partagés par toutes les sessions du process"""
+    from src.utils.runtime import build_runtime
+    return build_runtime()
+
+def get_runtime() -> "AppRuntime":
+    """Ressources partagées de la version courante des agents (construites au premier usage)"""
+    return shared_runtime(AGENT_VERSION)
+
 def initialize_agents():
-    """Initialise tous les agents et outils"""
+    """Initialise les ressources partagées et le contexte de la session"""
     if st.session_state.agents_initialized and st.session_state.get("agents_version") == AGENT_VERSION:
+        # Les appels d'agents de ce rerun sont rattachés au monitoring de la session
+        set_agent_session(st.session_state.agent_session)
         return
     
     # Si on a des agents mais une ancienne version, forcer la réinit
@@ -136,7 +189,8 @@ def initialize_agents():
                 os.environ["LLM_MODEL"] = llm_model
 
             embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
-            if "nomic" in embedding_model.lower():
+            embedding_backend = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+            if embedding_backend != "local" and "nomic" in embedding_model.lower():
                 st.info("""
                 ℹ️ Le modèle d'embeddings configuré n'est pas compatible OpenAI.
                 Passage automatique à `text-embedding-3-small`. Mettez à jour votre `.env`.
@@ -144,87 +198,26 @@ def initialize_agents():
                 embedding_model = "text-embedding-3-small"
                 os.environ["EMBEDDING_MODEL"] = embedding_model
             
-            # Monitoring Langfuse (obligatoire)
-            langfuse_monitor = None
-            langfuse_keys_present = os.getenv("LANGFUSE_PUBLIC_KEY") and os.getenv("LANGFUSE_SECRET_KEY")
-            if not langfuse_keys_present:
-                st.error("❌ Monitoring Langfuse requis. Veuillez définir LANGFUSE_PUBLIC_KEY et LANGFUSE_SECRET_KEY dans votre environnement.")
-                st.stop()
+            # Clients LLM, embeddings, outils, agents et graphe: construits une fois par process,
+            # au premier usage (analyse), pour ne pas retarder l'affichage de la première page
+            
+            # Monitoring Langfuse (optionnel, échantillonné par session via LANGFUSE_SAMPLE_RATE)
             try:
-                langfuse_monitor = LangfuseMonitoring()
+                langfuse_monitor = get_monitoring(session_id=st.session_state.session_id)
             except Exception as monitor_error:
-                st.error(f"❌ Impossible d'initialiser Langfuse: {monitor_error}")
-                st.stop()
-            
-            # Embeddings
-            embeddings = LLMConfig.get_embeddings()
+                st.warning(f"⚠️ Langfuse indisponible, monitoring désactivé: {monitor_error}")
+                langfuse_monitor = NoOpMonitoring()
             
-            # Outils
-            web_search = WebSearchTool()
-            vector_store = VectorStore(embeddings)
-            
-            # Créer un LLM avec callback Langfuse pour chaque agent
-            # Le callback doit être attaché directement au LLM pour capturer les outputs
-            user_id = os.getenv("LANGFUSE_USER_ID", "anonymous_user")
-            
-            # Créer les callbacks handlers
-            cv_handler = langfuse_monitor.get_callback_handler("cv_analyzer", user_id)
-            jd_handler = langfuse_monitor.get_callback_handler("jd_analyzer", user_id)
-            company_handler = langfuse_monitor.get_callback_handler("company_researcher", user_id)
-            question_handler = langfuse_monitor.get_callback_handler("question_generator", user_id)
-            coach_handler = langfuse_monitor.get_callback_handler("interview_coach", user_id)
-            
-            # Créer un LLM avec callback pour chaque agent
-            llm_cv = LLMConfig.get_llm(callbacks=[cv_handler])
-            llm_jd = LLMConfig.get_llm(callbacks=[jd_handler])
-            llm_company = LLMConfig.get_llm(callbacks=[company_handler])
-            llm_question = LLMConfig.get_llm(callbacks=[question_handler])
-            llm_coach = LLMConfig.get_llm(callbacks=[coach_handler])
-            
-            agents = {
-                "cv_analyzer": CVAnalyzerAgent(
-                    llm_cv, 
-                    callbacks=[cv_handler],
-                    langfuse_monitor=langfuse_monitor
-                ),
-                "jd_analyzer": JDAnalyzerAgent(
-                    llm_jd, 
-                    callbacks=[jd_handler],
-                    langfuse_monitor=langfuse_monitor
-                ),
-                "company_researcher": CompanyResearcherAgent(
-                    llm_company, 
-                    web_search, 
-                    callbacks=[company_handler],
-                    langfuse_monitor=langfuse_monitor
-                ),
-                "question_generator": QuestionGeneratorAgent(
-                    llm_question, 
-                    callbacks=[question_handler],
-                    langfuse_monitor=langfuse_monitor
-                ),
-                "interview_coach": InterviewCoachAgent(
-                    llm_coach, 
-                    callbacks=[coach_handler],
-                    langfuse_monitor=langfuse_monitor
-                )
-            }
-            
-            # Memory saver - utiliser MemorySaver au lieu de SqliteSaver pour éviter le problème du context manager
-            # MemorySaver n'est pas un context manager et peut être utilisé directement
-            memory = MemorySaver()
-            
-            # Supervisor - passer le checkpointer directement
-            supervisor = InterviewPrepSupervisor(agents, vector_store, memory)
-            
-            # Vérifier que la méthode get_graph existe
-            if not hasattr(supervisor, 'get_graph'):
-                st.error("❌ Erreur: La méthode get_graph n'est pas disponible. Veuillez redémarrer Streamlit.")
-                st.stop()
+            # Seuls le monitoring et l'utilisateur tracé sont propres à la session:
+            # les handlers de callbacks de chaque agent sont créés à son premier appel
+            agent_session = AgentSession(
+                monitor=langfuse_monitor,
+                user_id=os.getenv("LANGFUSE_USER_ID", "anonymous_user")
+            )
+            set_agent_session(agent_session)
             
             # Stocker dans session state
-            st.session_state.supervisor = supervisor
-            st.session_state.vector_store = vector_store
+            st.session_state.agent_session = agent_session
             st.session_state.langfuse_monitor = langfuse_monitor
             st.session_state.agents_initialized = True
             st.session_state.agents_version = AGENT_VERSION
@@ -235,6 +228,25 @@ def initialize_agents():
             st.error(f"❌ Erreur lors de l'initialisation: {str(e)}")
             st.stop()
 
+def resume_workflow(human_feedback: str):
+    """Reprend le workflow depuis son checkpoint avec la seule décision humaine"""
+    supervisor = get_runtime().supervisor
+    config = {
+        **workflow_config(),
+        "recursion_limit": 50,
+    }
+    
+    # Le checkpoint doit être en pause avant la validation humaine
+    snapshot = supervisor.get_graph().get_state(config)
+    if "human_review" not in (snapshot.next or ()):
+        return False
+    
+    for state_update in supervisor.resume_after_review(config, human_feedback):
+        for node_state in state_update.values():
+            if isinstance(node_state, dict):
+                st.session_state.workflow_state = {**st.session_state.workflow_state, **node_state}
+    return True
+
 def upload_documents_section():
     """Section d'upload des documents"""
     st.markdown('<div class="step-header"><h2>📄 Étape 1: Upload des Documents</h2></div>', 
@@ -294,42 +306,17 @@ def upload_documents_section():
         
         # Parser les documents
         try:
-            # Sauvegarder temporairement le CV
-            cv_path = f"./data/cv/{cv_file.name}"
-            Path("./data/cv").mkdir(parents=True, exist_ok=True)
-            with open(cv_path, "wb") as f:
-                f.write(cv_file.getbuffer())
-            
-            cv_content = DocumentParser.parse_document(cv_path)["content"]
+            # Parser le CV directement depuis le buffer d'upload (format détecté par les octets)
+            cv_content = DocumentParser.parse_document(cv_file.getbuffer(), filename=cv_file.name)["content"]
             
             # Parser JD
             if jd_file:
-                jd_path = f"./data/jd/{jd_file.name}"
-                Path("./data/jd").mkdir(parents=True, exist_ok=True)
-                with open(jd_path, "wb") as f:
-                    f.write(jd_file.getbuffer())
-                jd_content = DocumentParser.parse_document(jd_path)["content"]
+                jd_content = DocumentParser.parse_document(jd_file.getbuffer(), filename=jd_file.name)["content"]
             else:
                 jd_content = jd_text
             
             # Initialiser l'état du workflow
-            initial_state = {
-                "cv_text": cv_content,
-                "cv_analysis": {},
-                "jd_text": jd_content,
-                "jd_analysis": {},
-                "company_name": company_name,
-                "company_info": {},
-                "questions": [],
-                "current_question_idx": 0,
-                "user_answers": [],
-                "feedback_history": [],
-                "general_tips": {},
-                "human_approval_needed": False,
-                "human_feedback": "",
-                "next_step": "",
-                "error": ""
-            }
+            initial_state = get_runtime().supervisor.initial_state(cv_content, jd_content, company_name)
             
             st.session_state.workflow_state = initial_state
             st.session_state.current_step = "analysis"
@@ -360,11 +347,10 @@ def analysis_section():
         # Exécuter le workflow jusqu'au point de validation humaine
         with st.spinner("🤖 Les agents travaillent sur votre profil..."):
             try:
-                supervisor = st.session_state.supervisor
-                config = {"configurable": {"thread_id": "interview_prep_1"}}
+                supervisor = get_runtime().supervisor
+                config = workflow_config()
                 
                 # Exécuter le workflow
-                # Avec MemorySaver, on peut utiliser le graph directement sans context manager
                 graph = supervisor.get_graph()
                 result = None
                 last_state = None
@@ -396,7 +382,7 @@ def analysis_section():
                                 progress_bar.progress(progress)
                                 
                                 step_names = {
-                                    "analyze_parallel": "📄 Analyse CV et JD en parallèle...",
+                                    "analyze_parallel": "📄 Analyse CV/JD et recherche web en parallèle...",
                                     "research_company": "🔍 Recherche d'informations sur l'entreprise...",
                                     "generate_questions": "❓ Génération des questions d'entretien...",
                                     "human_review": "✅ Analyse terminée !"
@@ -617,6 +603,9 @@ def analysis_section():
     with col2:
         if st.button("🔄 Régénérer Questions", use_container_width=True):
             st.session_state.workflow_state["human_feedback"] = "regenerate"
+            with st.spinner("❓ Régénération des questions..."):
+                if not resume_workflow("regenerate"):
+                    st.warning("⚠️ Aucun workflow en attente de validation, relancez l'analyse.")
             st.rerun()
     
     with col3:
@@ -638,19 +627,16 @@ def tips_section():
     # Générer les conseils si pas encore fait
     if not state.get("general_tips"):
         with st.spinner("📝 Génération de conseils personnalisés..."):
-            supervisor = st.session_state.supervisor
-            config = {
-                "configurable": {"thread_id": "interview_prep_1"},
-                "recursion_limit": 50,
-            }
-            
-            # Continuer le workflow
-            # Avec MemorySaver, on peut utiliser le graph directement sans context manager
-            graph = supervisor.get_graph()
-            for result in graph.stream(state, config):
-                st.session_state.workflow_state = list(result.values())[0]
-                if st.session_state.workflow_state.get("general_tips"):
-                    break
+            # Reprendre le workflow au checkpoint de validation humaine:
+            # seul le nœud generate_tips est exécuté (pas de nouvelle analyse)
+            if not resume_workflow(state.get("human_feedback") or "approved"):
+                # Pas de checkpoint en attente: générer les conseils directement
+                coach = get_runtime().agents["interview_coach"]
+                tips_result = coach.generate_general_tips(
+                    state.get("cv_analysis", {}),
+                    state.get("jd_analysis", {})
+                )
+                st.session_state.workflow_state["general_tips"] = tips_result.get("tips", {})
             
             state = st.session_state.workflow_state
     
@@ -710,6 +696,35 @@ def tips_section():
         st.session_state.interview_started = True
         st.rerun()
 
+def render_feedback_field(slots: dict, field: str, value):
+    """Affiche une section du feedback dans son emplacement dès qu'elle est disponible"""
+    slot = slots.get(field)
+    if slot is None:
+        return
+    
+    with slot.container():
+        if field == "score":
+            st.metric("Score", f"{value}/10")
+        elif field == "positive_points":
+            st.markdown("#### ✅ Points Positifs")
+            for point in value or []:
+                st.success(point)
+        elif field == "improvement_areas":
+            st.markdown("#### 📈 Points à Améliorer")
+            for point in value or []:
+                st.warning(point)
+        elif field == "improved_answer":
+            with st.expander("💡 Suggestion de Réponse Améliorée"):
+                st.write(value or "")
+        elif field == "specific_tips":
+            st.markdown("#### 🎯 Conseils Spécifiques")
+            for tip in value or []:
+                st.info(tip)
+        elif field == "encouragement":
+            st.markdown('<div class="success-box">', unsafe_allow_html=True)
+            st.markdown(f"**💪 {value or 'Continuez comme ça!'}**")
+            st.markdown('</div>', unsafe_allow_html=True)
+
 def interview_simulation_section():
     """Section de simulation d'entretien"""
     st.markdown('<div class="step-header"><h2>🎭 Étape 4: Simulation d\'Entretien</h2></div>',
@@ -777,65 +792,49 @@ def interview_simulation_section():
                     "timestamp": datetime.now().isoformat()
                 })
                 
-                # Obtenir le feedback
-                with st.spinner("🤖 Analyse de votre réponse..."):
-                    coach = st.session_state.supervisor.agents["interview_coach"]
-                    context = {
-                        "cv": state["cv_analysis"],
-                        "jd": state["jd_analysis"]
-                    }
-                    
-                    feedback_result = coach.evaluate_answer(
-                        current_question["question"],
-                        answer,
-                        context
+                # Obtenir le feedback en streaming: chaque section s'affiche dès qu'elle est complète
+                coach = get_runtime().agents["interview_coach"]
+                # Résumé CV/Poste calculé une fois par session: préfixe de prompt identique à chaque question
+                if not state.get("coaching_context"):
+                    state["coaching_context"] = coach.build_coaching_context(
+                        state["cv_analysis"], state["jd_analysis"]
                     )
+                context = state["coaching_context"]
+                
+                st.markdown("---")
+                st.markdown("### 📊 Feedback sur Votre Réponse")
+                feedback_slots = {
+                    field: st.empty()
+                    for field in (
+                        "score", "positive_points", "improvement_areas",
+                        "improved_answer", "specific_tips", "encouragement"
+                    )
+                }
+                
+                feedback = {}
+                try:
+                    with st.spinner("🤖 Analyse de votre réponse..."):
+                        for field, value in coach.stream_evaluate_answer(
+                            current_question["question"],
+                            answer,
+                            context
+                        ):
+                            feedback[field] = value
+                            render_feedback_field(feedback_slots, field, value)
+                except Exception as e:
+                    st.error(f"❌ Erreur lors de l'évaluation: {str(e)}")
+                
+                if feedback:
+                    # Sauvegarder le feedback
+                    if "feedback_history" not in state:
+                        state["feedback_history"] = []
                     
-                    if feedback_result["success"]:
-                        feedback = feedback_result["feedback"]
-                        
-                        # Afficher le feedback
-                        st.markdown("---")
-                        st.markdown("### 📊 Feedback sur Votre Réponse")
-                        
-                        # Score
-                        score = feedback.get("score", 0)
-                        st.metric("Score", f"{score}/10")
-                        
-                        # Points positifs
-                        st.markdown("#### ✅ Points Positifs")
-                        for point in feedback.get("positive_points", []):
-                            st.success(point)
-                        
-                        # Points à améliorer
-                        st.markdown("#### 📈 Points à Améliorer")
-                        for point in feedback.get("improvement_areas", []):
-                            st.warning(point)
-                        
-                        # Réponse améliorée
-                        with st.expander("💡 Suggestion de Réponse Améliorée"):
-                            st.write(feedback.get("improved_answer", ""))
-                        
-                        # Conseils spécifiques
-                        st.markdown("#### 🎯 Conseils Spécifiques")
-                        for tip in feedback.get("specific_tips", []):
-                            st.info(tip)
-                        
-                        # Encouragement
-                        st.markdown('<div class="success-box">', unsafe_allow_html=True)
-                        st.markdown(f"**💪 {feedback.get('encouragement', 'Continuez comme ça!')}**")
-                        st.markdown('</div>', unsafe_allow_html=True)
-                        
-                        # Sauvegarder le feedback
-                        if "feedback_history" not in state:
-                            state["feedback_history"] = []
-                        
-                        state["feedback_history"].append({
-                            "question_idx": current_idx,
-                            "feedback": feedback
-                        })
-                        
-                        st.session_state.workflow_state = state
+                    state["feedback_history"].append({
+                        "question_idx": current_idx,
+                        "feedback": feedback
+                    })
+                    
+                    st.session_state.workflow_state = state
     
     with col2:
         if st.button("⏭️ Question Suivante", use_container_width=True):
@@ -856,6 +855,11 @@ def report_section():
     st.balloons()
     st.success("🎉 Félicitations! Vous avez terminé votre préparation d'entretien!")
     
+    # Fin de session: un seul flush du monitoring
+    if not st.session_state.get("monitoring_flushed"):
+        flush_monitoring()
+        st.session_state.monitoring_flushed = True
+    
     # Statistiques globales
     st.markdown("### 📈 Vos Statistiques")
     
@@ -1036,11 +1040,20 @@ def main():
         # Status des agents
         if st.session_state.agents_initialized:
             st.success("🟢 Agents IA: Actifs")
+            if st.session_state.workflow_state is not None:
+                cache_stats = get_runtime().analysis_cache.stats()
+                st.caption(f"💾 Cache analyses: {cache_stats['hits']} hits / {cache_stats['misses']} miss")
+                pool_stats = get_runtime().http_pool.stats()
+                st.caption(
+                    f"🔌 Connexions HTTP: {pool_stats['connections_reused']} réutilisées / "
+                    f"{pool_stats['connections_opened']} ouvertes"
+                )
         else:
             st.warning("🟡 Agents IA: Non initialisés")
     
     # Initialiser les agents
     initialize_agents()
+    restore_workflow()
     
     # Router vers la bonne section
     if st.session_state.current_step == "upload":
@@ -0,0 +1,360 @@
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+_WHITESPACE = re.compile(r"\s+")
+# Nombre de clés par requête SQL (limite de paramètres des anciennes versions de SQLite: 999)
+_SQL_BATCH = 500
+
+
+def normalize_text(text: str) -> str:
+    """Normalise les espaces d'un texte avant hachage"""
+    return _WHITESPACE.sub(" ", (text or "").strip())
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Construit une clé SHA-256 stable à partir de plusieurs composants"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, ensure_ascii=False, sort_keys=True, default=str)
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+def llm_identity(llm) -> str:
+    """Retourne le nom du modèle utilisé par un LLM LangChain (pour les clés de cache)"""
+    return str(getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__)
+
+
+class PersistentCache:
+    """Cache clé/valeur persistant sur disque (SQLite) avec TTL et éviction LRU"""
+
+    def __init__(
+        self,
+        path: str = "./data/cache/llm_cache.db",
+        namespace: str = "default",
+        max_entries: int = 1000,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+    ):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Une seule connexion partagée entre threads, protégée par le verrou
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache_entries (namespace, accessed_at)"
+        )
+        self._conn.commit()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[Any]:
+        """Retourne la valeur en cache ou None (compte un hit ou un miss)"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            value, created_at = row
+            if self._is_expired(created_at, now):
+                self._conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                )
+                self._conn.commit()
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        """Enregistre une valeur sérialisable en JSON puis applique l'éviction"""
+        now = time.time()
+        serialized = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO cache_entries (namespace, key, value, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?)""",
+                (self.namespace, key, serialized, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Retourne les valeurs en cache des clés demandées, lues et rafraîchies en une transaction"""
+        now = time.time()
+        unique = list(dict.fromkeys(keys))
+        rows: Dict[str, Tuple[str, float]] = {}
+        with self._lock:
+            # Lecture par paquets pour rester sous la limite de paramètres de SQLite
+            for start in range(0, len(unique), _SQL_BATCH):
+                batch = unique[start:start + _SQL_BATCH]
+                placeholders = ", ".join("?" * len(batch))
+                for key, value, created_at in self._conn.execute(
+                    f"SELECT key, value, created_at FROM cache_entries WHERE namespace = ? AND key IN ({placeholders})",
+                    (self.namespace, *batch),
+                ):
+                    rows[key] = (value, created_at)
+
+            expired = {key for key, (_, created_at) in rows.items() if self._is_expired(created_at, now)}
+            found = [key for key in rows if key not in expired]
+            self._conn.executemany(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                [(self.namespace, key) for key in expired],
+            )
+            self._conn.executemany(
+                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                [(now, self.namespace, key) for key in found],
+            )
+            self._conn.commit()
+            self.evictions += len(expired)
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+
+        return {key: json.loads(rows[key][0]) for key in found}
+
+    def set_many(self, items: Dict[str, Any]) -> None:
+        """Enregistre plusieurs valeurs en une transaction puis applique l'éviction une seule fois"""
+        if not items:
+            return
+        now = time.time()
+        serialized = [(self.namespace, key, json.dumps(value, ensure_ascii=False), now, now)
+                      for key, value in items.items()]
+        with self._lock:
+            self._conn.executemany(
+                """INSERT OR REPLACE INTO cache_entries (namespace, key, value, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?)""",
+                serialized,
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Supprime les entrées expirées puis les moins récemment utilisées au-delà de max_entries"""
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND created_at < ?",
+                (self.namespace, now - self.ttl_seconds),
+            )
+            self.evictions += max(cursor.rowcount, 0)
+
+        if self.max_entries is None:
+            return
+
+        (count,) = self._conn.execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            cursor = self._conn.execute(
+                """DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                    SELECT key FROM cache_entries WHERE namespace = ?
+                    ORDER BY accessed_at ASC LIMIT ?
+                )""",
+                (self.namespace, self.namespace, overflow),
+            )
+            self.evictions += max(cursor.rowcount, 0)
+
+    def delete(self, key: str) -> None:
+        """Supprime une entrée"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """Vide toutes les entrées du namespace"""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+            ).fetchone()
+        return count
+
+    def stats(self) -> Dict:
+        """Retourne les compteurs hit/miss/éviction du cache"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self),
+        }
+
+    def close(self) -> None:
+        """Ferme la connexion SQLite"""
+        with self._lock:
+            self._conn.close()
+
+
+class _Flight:
+    """Appel en cours partagé par les appelants concurrents d'une même clé (threads et asyncio)"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, "asyncio.Future"]] = []
+
+    def finish(self, result: Any = None, error: Optional[BaseException] = None) -> None:
+        """Publie le résultat et réveille les appelants en attente (synchrones et async)"""
+        with self._lock:
+            self.result, self.error = result, error
+            self.done.set()
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                pass  # Boucle de l'appelant déjà fermée
+
+    def outcome(self) -> Any:
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def wait(self) -> Any:
+        self.done.wait()
+        return self.outcome()
+
+    async def await_result(self) -> Any:
+        """Attend le résultat sans bloquer la boucle, quelle que soit la boucle ou le thread du calcul"""
+        future = None
+        with self._lock:
+            if not self.done.is_set():
+                loop = asyncio.get_running_loop()
+                future = loop.create_future()
+                self._waiters.append((loop, future))
+        if future is not None:
+            await future
+        return self.outcome()
+
+
+def _wake(future: "asyncio.Future") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class SingleFlight:
+    """Fusionne les appels concurrents identiques: un seul calcul, résultat partagé.
+
+    Les appelants arrivant pendant qu'un calcul est en cours pour la même clé
+    attendent son résultat (ou son exception) au lieu de le relancer. La table des
+    calculs en cours est commune aux appels synchrones (do) et asynchrones (ado).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def _join(self, key: str) -> Tuple[_Flight, bool]:
+        """Calcul en cours pour la clé (créé si absent) et rôle de l'appelant (leader ou non)"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+                return flight, True
+            self.coalesced += 1
+            return flight, False
+
+    def _finish(self, key: str, flight: _Flight, result: Any = None,
+                error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.finish(result, error)
+
+    def do(self, key: str, func: Callable, *args, **kwargs) -> Any:
+        """Exécute func une seule fois pour les appels concurrents de même clé"""
+        flight, leader = self._join(key)
+        if not leader:
+            return flight.wait()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, flight, error=e)
+            raise
+        self._finish(key, flight, result)
+        return result
+
+    async def ado(self, key: str, func: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        """Exécute la coroutine une seule fois pour les appels concurrents de même clé"""
+        flight, leader = self._join(key)
+        if not leader:
+            return await flight.await_result()
+
+        task = asyncio.get_running_loop().create_task(func(*args, **kwargs))
+
+        def publish(done: "asyncio.Task") -> None:
+            if done.cancelled():
+                self._finish(key, flight, error=asyncio.CancelledError())
+            elif done.exception() is not None:
+                self._finish(key, flight, error=done.exception())
+            else:
+                self._finish(key, flight, done.result())
+
+        task.add_done_callback(publish)
+        # shield: l'annulation de l'appelant n'annule pas le calcul partagé
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict:
+        """Calculs lancés et appels fusionnés"""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._flights)
+            }
@@ -0,0 +1,177 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+# Nombre de checkpoints conservés par thread (seul le dernier sert à reprendre le workflow)
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "5"))
+# Durée de rétention d'une session inactive et nombre maximal de sessions conservées
+CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", str(7 * 24 * 3600)))
+CHECKPOINT_MAX_THREADS = int(os.getenv("CHECKPOINT_MAX_THREADS", "1000"))
+# Intervalle minimal entre deux purges des sessions expirées
+CHECKPOINT_PRUNE_INTERVAL = float(os.getenv("CHECKPOINT_PRUNE_INTERVAL", "60"))
+
+
+class PrunableSqliteSaver(SqliteSaver):
+    """Checkpointer SQLite sur disque avec rétention par thread et éviction des sessions.
+
+    La connexion est ouverte directement (sans le context manager de
+    SqliteSaver.from_conn_string), ce qui permet de garder le checkpointer
+    entre les reruns Streamlit.
+    """
+
+    def __init__(self, path: str = "./data/checkpoints.db", keep_last: Optional[int] = CHECKPOINT_KEEP_LAST,
+                 ttl_seconds: Optional[float] = CHECKPOINT_TTL_SECONDS,
+                 max_threads: Optional[int] = CHECKPOINT_MAX_THREADS,
+                 prune_interval: float = CHECKPOINT_PRUNE_INTERVAL):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        super().__init__(sqlite3.connect(path, check_same_thread=False))
+        self.path = path
+        self.keep_last = keep_last
+        self.ttl_seconds = ttl_seconds
+        self.max_threads = max_threads
+        self.prune_interval = prune_interval
+        self.evicted_checkpoints = 0
+        self.evicted_threads = 0
+        self._last_prune = 0.0
+
+    def setup(self) -> None:
+        """Crée les tables de LangGraph et la table d'activité des sessions"""
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS checkpoint_threads (
+                thread_id TEXT PRIMARY KEY,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_checkpoint_threads_updated ON checkpoint_threads (updated_at)"
+        )
+        self.conn.commit()
+
+    def put(self, config: Dict, checkpoint: Dict, metadata: Dict, new_versions: Dict) -> Dict:
+        """Enregistre un checkpoint puis applique la rétention du thread"""
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = str(saved["configurable"]["thread_id"])
+        now = time.time()
+
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO checkpoint_threads (thread_id, updated_at) VALUES (?, ?)",
+                (thread_id, now),
+            )
+            if self.keep_last is not None:
+                self._trim_thread(cur, thread_id, saved["configurable"]["checkpoint_ns"])
+
+        if now - self._last_prune >= self.prune_interval:
+            self.prune(now)
+        return saved
+
+    def _trim_thread(self, cur: sqlite3.Cursor, thread_id: str, checkpoint_ns: str) -> None:
+        """Supprime les checkpoints (et leurs writes) au-delà des keep_last plus récents"""
+        stale = [
+            row[0] for row in cur.execute(
+                """SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?
+                ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?""",
+                (thread_id, checkpoint_ns, self.keep_last),
+            ).fetchall()
+        ]
+        if not stale:
+            return
+        params = [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id in stale]
+        cur.executemany(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+        )
+        cur.executemany(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+        )
+        self.evicted_checkpoints += len(stale)
+
+    @staticmethod
+    def _delete_threads(cur: sqlite3.Cursor, thread_ids: Sequence[str]) -> None:
+        params = [(thread_id,) for thread_id in thread_ids]
+        cur.executemany("DELETE FROM checkpoints WHERE thread_id = ?", params)
+        cur.executemany("DELETE FROM writes WHERE thread_id = ?", params)
+        cur.executemany("DELETE FROM checkpoint_threads WHERE thread_id = ?", params)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Supprime les sessions expirées puis les plus anciennes au-delà de max_threads"""
+        now = time.time() if now is None else now
+        self._last_prune = now
+        with self.cursor() as cur:
+            expired = set()
+            if self.ttl_seconds is not None:
+                expired.update(row[0] for row in cur.execute(
+                    "SELECT thread_id FROM checkpoint_threads WHERE updated_at < ?",
+                    (now - self.ttl_seconds,),
+                ))
+            if self.max_threads is not None:
+                expired.update(row[0] for row in cur.execute(
+                    "SELECT thread_id FROM checkpoint_threads ORDER BY updated_at DESC LIMIT -1 OFFSET ?",
+                    (self.max_threads,),
+                ))
+            if expired:
+                self._delete_threads(cur, sorted(expired))
+        self.evicted_threads += len(expired)
+        return len(expired)
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Supprime tous les checkpoints d'une session"""
+        with self.cursor() as cur:
+            self._delete_threads(cur, [str(thread_id)])
+
+    def stats(self) -> Dict:
+        """Nombre de sessions et de checkpoints conservés, compteurs d'éviction"""
+        with self.cursor(transaction=False) as cur:
+            (threads,) = cur.execute("SELECT COUNT(*) FROM checkpoint_threads").fetchone()
+            (checkpoints,) = cur.execute("SELECT COUNT(*) FROM checkpoints").fetchone()
+        return {
+            "threads": threads,
+            "checkpoints": checkpoints,
+            "evicted_checkpoints": self.evicted_checkpoints,
+            "evicted_threads": self.evicted_threads
+        }
+
+    # SqliteSaver est synchrone: les variantes async (graph.astream) s'exécutent dans un thread
+    async def aget_tuple(self, config: Dict):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[Dict], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[Dict] = None, limit: Optional[int] = None) -> AsyncIterator:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config: Dict, checkpoint: Dict, metadata: Dict, new_versions: Dict) -> Dict:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: Dict, writes: Sequence[Tuple[str, Any]], task_id: str) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id)
+
+    def close(self) -> None:
+        """Ferme la connexion SQLite"""
+        with self.lock:
+            self.conn.close()
+
+
+_checkpointer: Optional[PrunableSqliteSaver] = None
+_checkpointer_lock = threading.Lock()
+
+
+def get_checkpointer() -> PrunableSqliteSaver:
+    """Checkpointer partagé par toutes les sessions du process (CHECKPOINT_DB_PATH)"""
+    global _checkpointer
+    with _checkpointer_lock:
+        if _checkpointer is None:
+            _checkpointer = PrunableSqliteSaver(os.getenv("CHECKPOINT_DB_PATH", "./data/checkpoints.db"))
+        return _checkpointer
@@ -0,0 +1,221 @@
+import asyncio
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+# Limites du pool de connexions partagé (OpenAI, embeddings, Tavily)
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "20"))
+HTTP_POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "10"))
+HTTP_POOL_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY", "30"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "60"))
+# HTTP/2 (nécessite le paquet h2, sinon repli sur HTTP/1.1)
+HTTP_POOL_HTTP2 = os.getenv("HTTP_POOL_HTTP2", "false").lower() == "true"
+
+# Événements httpcore signalant l'ouverture d'une nouvelle connexion
+_CONNECT_EVENTS = {"connection.connect_tcp.complete", "connection.connect_unix_socket.complete"}
+
+
+class PoolStats:
+    """Compteurs du pool: requêtes émises, connexions ouvertes et réutilisées"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self) -> None:
+        with self._lock:
+            self.connections_opened += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "connections_reused": max(self.requests - self.connections_opened, 0)
+            }
+
+
+class _CountingTransport(httpx.HTTPTransport):
+    """Transport synchrone qui compte les connexions ouvertes via l'extension trace de httpcore"""
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self._stats.record_request()
+        parent = request.extensions.get("trace")
+
+        def trace(event_name: str, info: Dict) -> None:
+            if event_name in _CONNECT_EVENTS:
+                self._stats.record_connection()
+            if parent is not None:
+                parent(event_name, info)
+
+        request.extensions["trace"] = trace
+        return super().handle_request(request)
+
+
+class _AsyncCountingTransport(httpx.AsyncHTTPTransport):
+    """Transport asynchrone qui compte les connexions ouvertes"""
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._stats.record_request()
+        parent = request.extensions.get("trace")
+
+        async def trace(event_name: str, info: Dict) -> None:
+            if event_name in _CONNECT_EVENTS:
+                self._stats.record_connection()
+            if parent is not None:
+                await parent(event_name, info)
+
+        request.extensions["trace"] = trace
+        return await super().handle_async_request(request)
+
+
+class _LoopLocalAsyncTransport(httpx.AsyncBaseTransport):
+    """Un pool async par boucle asyncio: les connexions async sont liées à la boucle qui les a ouvertes.
+
+    Chaque pool est fermé à l'arrêt de sa boucle: une tâche sentinelle, annulée par
+    asyncio.run en fin de boucle, ferme ses connexions tant que la boucle tourne encore.
+    """
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        self._stats = stats
+        self._kwargs = kwargs
+        self._lock = threading.Lock()
+        self._transports: Dict[asyncio.AbstractEventLoop, Tuple[_AsyncCountingTransport, asyncio.Task]] = {}
+
+    def _transport(self) -> _AsyncCountingTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            # Boucles fermées sans annuler leurs tâches: rien à attendre, le pool est abandonné
+            for closed in [other for other in self._transports if other.is_closed()]:
+                del self._transports[closed]
+            entry = self._transports.get(loop)
+            if entry is None:
+                transport = _AsyncCountingTransport(self._stats, **self._kwargs)
+                entry = self._transports[loop] = (transport, loop.create_task(self._close_on_shutdown(loop)))
+            return entry[0]
+
+    async def _close_on_shutdown(self, loop: asyncio.AbstractEventLoop) -> None:
+        try:
+            await loop.create_future()
+        finally:
+            await self._close_loop(loop)
+
+    async def _close_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        with self._lock:
+            entry = self._transports.pop(loop, None)
+        if entry is not None:
+            await entry[0].aclose()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        """Ferme le pool de la boucle courante"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._transports.get(loop)
+        if entry is not None:
+            entry[1].cancel()
+            await self._close_loop(loop)
+
+    def close(self) -> None:
+        """Ferme les pools de toutes les boucles encore ouvertes (depuis du code synchrone)"""
+        with self._lock:
+            entries = list(self._transports.items())
+        for loop, (_, sentinel) in entries:
+            if loop.is_closed():
+                with self._lock:
+                    self._transports.pop(loop, None)
+            elif loop.is_running():
+                # La sentinelle ferme le pool dans sa propre boucle
+                loop.call_soon_threadsafe(sentinel.cancel)
+            else:
+                sentinel.cancel()
+                loop.run_until_complete(asyncio.gather(sentinel, return_exceptions=True))
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class HttpPool:
+    """Clients HTTP keep-alive partagés par les clients LLM, les embeddings et la recherche web"""
+
+    def __init__(self, max_connections: int = HTTP_POOL_MAX_CONNECTIONS,
+                 max_keepalive: int = HTTP_POOL_MAX_KEEPALIVE,
+                 keepalive_expiry: float = HTTP_POOL_KEEPALIVE_EXPIRY,
+                 timeout: float = HTTP_POOL_TIMEOUT, http2: bool = HTTP_POOL_HTTP2):
+        self.http2 = http2 and _http2_available()
+        self._stats = PoolStats()
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.client = httpx.Client(
+            transport=_CountingTransport(self._stats, limits=limits, http2=self.http2),
+            timeout=timeout
+        )
+        self._async_transport = _LoopLocalAsyncTransport(self._stats, limits=limits, http2=self.http2)
+        self.async_client = httpx.AsyncClient(transport=self._async_transport, timeout=timeout)
+
+    def warm_up(self, urls: Iterable[str]) -> Dict[str, bool]:
+        """Ouvre à l'avance les connexions (TCP + TLS) vers les hôtes utilisés"""
+        warmed = {}
+        for url in urls:
+            try:
+                # Toute réponse HTTP suffit: seule la connexion gardée dans le pool importe
+                self.client.head(url)
+                warmed[url] = True
+            except httpx.HTTPError:
+                warmed[url] = False
+        return warmed
+
+    def stats(self) -> Dict:
+        """Requêtes, connexions ouvertes et réutilisées, protocole"""
+        return {**self._stats.snapshot(), "http2": self.http2}
+
+    def close(self) -> None:
+        """Ferme le client synchrone et les pools async encore ouverts"""
+        self.client.close()
+        self._async_transport.close()
+
+
+def warm_up_urls() -> List[str]:
+    """Hôtes contactés par l'application: API OpenAI (ou compatible) et Tavily"""
+    return [
+        os.getenv("OPENAI_API_BASE") or "https://api.openai.com/v1",
+        os.getenv("TAVILY_API_URL", "https://api.tavily.com"),
+    ]
+
+
+_http_pool: Optional[HttpPool] = None
+_http_pool_lock = threading.Lock()
+
+
+def get_http_pool() -> HttpPool:
+    """Pool HTTP partagé par tout le process"""
+    global _http_pool
+    with _http_pool_lock:
+        if _http_pool is None:
+            _http_pool = HttpPool()
+        return _http_pool
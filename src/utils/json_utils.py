@@ -1,150 +1,379 @@
-import ast
 import json
 import re
-from typing import Any
-
-try:
-    import json5
-except ImportError:  # pragma: no cover
-    json5 = None
-
-
-_TOKEN_FIXER = re.compile(
-    r'(?<![A-Za-z0-9_"\'])\b(true|false|null)\b(?![A-Za-z0-9_"\'])',
-    re.IGNORECASE,
-)
-
-
-def _harmonize_brackets(text: str) -> str:
-    """Corrige l'ordre de fermeture des crochets/accolades en ignorant le contenu des chaînes."""
-    if not text:
-        return text
-
-    result = []
-    stack = []
-    in_string = False
-    escape = False
-
-    for char in text:
-        if in_string:
-            result.append(char)
-            if escape:
-                escape = False
-            elif char == "\\":
-                escape = True
-            elif char == '"':
-                in_string = False
+from collections import Counter
+from json.decoder import scanstring
+from typing import Any, List, Optional, Tuple
+
+
+# Espaces et commentaires (// ... et /* ... */) ignorés entre les tokens
+_SKIP = re.compile(r"(?:\s+|//[^\n]*|/\*.*?(?:\*/|\Z))*", re.DOTALL)
+# Token nu: nombre, littéral (true/None...) ou texte non quoté
+_BARE = re.compile(r"[^\s,:{}\[\]\"']+")
+_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_LITERALS = {
+    "true": True, "false": False, "null": None, "none": None,
+}
+_SIMPLE_ESCAPES = {
+    "n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f",
+    "\\": "\\", "/": "/", '"': '"', "'": "'",
+}
+_CLOSERS = "}]"
+_MISSING = object()
+
+
+def _read_quoted(text: str, pos: int) -> Tuple[str, int]:
+    """Lit une chaîne entre guillemets (doubles ou simples) à partir de pos; tolère la troncature"""
+    quote = text[pos]
+    if quote == '"':
+        try:
+            return scanstring(text, pos + 1, False)
+        except ValueError:
+            pass
+
+    chars: List[str] = []
+    i = pos + 1
+    length = len(text)
+    while i < length:
+        char = text[i]
+        if char == quote:
+            return "".join(chars), i + 1
+        if char == "\\" and i + 1 < length:
+            escaped = text[i + 1]
+            if escaped == "u" and i + 6 <= length:
+                try:
+                    chars.append(chr(int(text[i + 2 : i + 6], 16)))
+                    i += 6
+                    continue
+                except ValueError:
+                    pass
+            chars.append(_SIMPLE_ESCAPES.get(escaped, escaped))
+            i += 2
             continue
+        chars.append(char)
+        i += 1
+    # Chaîne non terminée (sortie tronquée): la fermer en fin de texte
+    return "".join(chars), length
+
+
+def _bare_value(token: str) -> Any:
+    """Convertit un token nu en littéral, nombre ou texte"""
+    literal = _LITERALS.get(token.lower(), _MISSING)
+    if literal is not _MISSING:
+        return literal
+    if _NUMBER.fullmatch(token):
+        if any(char in token for char in ".eE"):
+            return float(token)
+        return int(token)
+    return token
+
+
+def _read_bare_text(text: str, pos: int) -> Tuple[str, int]:
+    """Lit une valeur texte non quotée (URL, phrase) jusqu'au prochain , } ] ou " hors parenthèses.
+
+    Une fin de ligne termine toujours la valeur. Un commentaire n'est reconnu que précédé
+    d'un espace: le // d'une URL fait partie de la valeur.
+    """
+    depth = 0
+    i = pos
+    length = len(text)
+    while i < length:
+        char = text[i]
+        if char == "\n":
+            break
+        if depth == 0:
+            if char in ',}]"':
+                break
+            if char == "/" and text[i - 1].isspace() and text.startswith(("//", "/*"), i):
+                break
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        i += 1
+    return text[pos:i].rstrip(), i
+
+
+def _repair_loads(text: str) -> Any:
+    """Parse du JSON approximatif en une seule passe.
+
+    Tolère le texte parasite autour de la valeur racine, les virgules finales ou
+    manquantes, les guillemets simples, les clés et valeurs texte non quotées, les
+    littéraux Python, les commentaires entre les tokens, les fermetures inversées ou
+    orphelines et les fermetures manquantes (sortie tronquée).
+    """
+    length = len(text)
+    start = min((idx for idx in (text.find("{"), text.find("[")) if idx != -1), default=-1)
+    if start == -1:
+        raise ValueError("Impossible de parser le JSON: aucun objet ou tableau trouvé")
+
+    root = {} if text[start] == "{" else []
+    # Pile des conteneurs ouverts: [conteneur, clé en attente de valeur]
+    stack: List[list] = [[root, None]]
+    i = start + 1
 
-        if char == '"':
-            in_string = True
-            result.append(char)
-            continue
+    while stack:
+        i = _SKIP.match(text, i).end()
+        if i >= length:
+            break
 
-        if char in "{[":
-            stack.append(char)
-            result.append(char)
+        char = text[i]
+        frame = stack[-1]
+        container, key = frame
+        is_object = isinstance(container, dict)
+
+        # Fermeture (une fermeture inversée ferme le conteneur courant)
+        if char in _CLOSERS:
+            stack.pop()
+            i += 1
             continue
 
-        if char in "}]":
-            if not stack:
-                # ignorer le caractère orphelin
-                continue
+        if char == ",":
+            # Virgule avant la valeur d'une clé: valeur manquante, la clé est abandonnée
+            frame[1] = None
+            i += 1
+            continue
 
-            expected = stack[-1]
-            if (expected == "{" and char == "}") or (expected == "[" and char == "]"):
-                stack.pop()
-                result.append(char)
+        if is_object and key is None:
+            # Lecture d'une clé
+            if char in "\"'":
+                key, i = _read_quoted(text, i)
+            elif char == ":" or char in "{[":
+                # Valeur sans clé: ignorer le caractère
+                i += 1
                 continue
-
-            # si la fermeture ne correspond pas, substituer par celle attendue
-            stack.pop()
-            substitute = "]" if expected == "[" else "}"
-            result.append(substitute)
+            else:
+                match = _BARE.match(text, i)
+                key, i = match.group(), match.end()
+            frame[1] = key
+            i = _SKIP.match(text, i).end()
+            if i < length and text[i] == ":":
+                i += 1
             continue
 
-        result.append(char)
+        if char == ":":
+            i += 1
+            continue
 
-    # Ajouter les fermetures manquantes restantes
-    while stack:
-        opener = stack.pop()
-        result.append("}" if opener == "{" else "]")
-
-    return "".join(result)
-
-
-def _balance_brackets(text: str) -> str:
-    """Nettoie approximativement le JSON retourné par un LLM."""
-    balanced = (text or "").strip()
-    if not balanced:
-        return balanced
-
-    # Supprimer les caractères après la dernière accolade/crochet fermant
-    last_idx = max(balanced.rfind("}"), balanced.rfind("]"))
-    if last_idx != -1:
-        balanced = balanced[: last_idx + 1]
-
-    # Supprimer les virgules finales avant ] ou }
-    balanced = re.sub(r",\s*(\]|\})", r"\1", balanced)
-
-    # Supprimer les virgules en fin de document
-    balanced = balanced.rstrip(",")
-
-    for open_bracket, close_bracket in (("{", "}"), ("[", "]")):
-        diff = balanced.count(open_bracket) - balanced.count(close_bracket)
-        if diff > 0:
-            balanced += close_bracket * diff
-        elif diff < 0:
-            # trop de closings: retirer les derniers
-            remove_count = abs(diff)
-            while remove_count > 0 and balanced:
-                if balanced.endswith(close_bracket):
-                    balanced = balanced[:-1]
-                    remove_count -= 1
-                else:
-                    break
-    return balanced
-
-
-def _normalize_literals(text: str) -> str:
-    """Convertit true/false/null en True/False/None hors des chaînes."""
-    return _TOKEN_FIXER.sub(
-        lambda match: {"true": "True", "false": "False", "null": "None"}[
-            match.group(1).lower()
-        ],
-        text,
-    )
-
-
-def safe_json_loads(payload: str) -> Any:
-    """Parse une chaîne JSON en tolérant plusieurs formats imparfaits."""
+        # Lecture d'une valeur
+        if char in "{[":
+            value = {} if char == "{" else []
+            i += 1
+        elif char in "\"'":
+            value, i = _read_quoted(text, i)
+        else:
+            match = _BARE.match(text, i)
+            value = _bare_value(match.group())
+            if isinstance(value, str):
+                # Texte non quoté: lu en entier, commentaires et espaces compris
+                value, i = _read_bare_text(text, i)
+            else:
+                i = match.end()
+
+        if is_object:
+            container[key] = value
+            frame[1] = None
+        else:
+            container.append(value)
+
+        if isinstance(value, (dict, list)):
+            stack.append([value, None])
+
+    # Conteneurs restés ouverts (sortie tronquée): ils sont déjà rattachés à leur parent
+    return root
+
+
+def _count_stage(stages: Optional[Counter], stage: str) -> None:
+    if stages is not None:
+        stages[stage] += 1
+
+
+def extract_json_payload(raw_text: str, stages: Optional[Counter] = None) -> str:
+    """Nettoie la réponse du LLM pour extraire uniquement le JSON"""
+    cleaned = (raw_text or "").strip()
+    if not cleaned:
+        raise ValueError("Réponse LLM vide - impossibilité de parser le JSON.")
+
+    if "```json" in cleaned:
+        cleaned = cleaned.split("```json", 1)[1]
+        cleaned = cleaned.split("```", 1)[0].strip()
+        _count_stage(stages, "extract.fence_json")
+    elif "```" in cleaned:
+        cleaned = cleaned.split("```", 1)[1]
+        cleaned = cleaned.split("```", 1)[0].strip()
+        _count_stage(stages, "extract.fence")
+
+    # Dernier recours : extraire entre la première { et la dernière }
+    start_idx = cleaned.find("{")
+    end_idx = cleaned.rfind("}")
+    if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
+        if start_idx > 0 or end_idx < len(cleaned) - 1:
+            _count_stage(stages, "extract.brace_slice")
+        cleaned = cleaned[start_idx : end_idx + 1]
+
+    return cleaned
+
+
+def safe_json_loads(payload: str, stages: Optional[Counter] = None) -> Any:
+    """Parse une chaîne JSON en tolérant plusieurs formats imparfaits.
+
+    ``stages`` (optionnel) compte l'étape qui a abouti: parse.fast, parse.repair
+    ou parse.failed (utilisé par les benchmarks).
+    """
     if payload is None:
         raise ValueError("Payload JSON vide.")
 
     if isinstance(payload, (dict, list)):
         return payload
 
-    harmonized = _harmonize_brackets(payload)
-    candidate = _balance_brackets(harmonized)
-    last_error = None
+    # Chemin rapide: JSON valide, parsé par le décodeur C
+    try:
+        value = json.loads(payload, strict=False)
+        _count_stage(stages, "parse.fast")
+        return value
+    except json.JSONDecodeError:
+        pass
 
-    for strict in (True, False):
+    try:
+        value = _repair_loads(payload)
+    except ValueError:
+        _count_stage(stages, "parse.failed")
+        raise
+    _count_stage(stages, "parse.repair")
+    return value
+
+
+class IncrementalJSONReader:
+    """Lecteur JSON incrémental: émet chaque champ d'un objet racine dès qu'il est complet.
+
+    Les fragments (tokens LLM) sont passés à ``feed`` au fil de l'eau; chaque appel
+    retourne la liste des couples (clé, valeur) terminés depuis l'appel précédent.
+    Le texte n'est parcouru qu'une seule fois.
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self._text = ""
+        self._pos = 0
+        self._started = False
+        self._done = False
+        self._state = "key"
+        self._key = None
+        self._token_start = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def _emit(self, raw: str, completed: list) -> None:
+        """Parse la valeur brute d'un champ et l'ajoute aux champs terminés"""
+        raw = raw.strip()
+        if not raw or self._key is None:
+            return
         try:
-            return json.loads(candidate, strict=strict)
-        except json.JSONDecodeError as exc:
-            last_error = exc
+            value = json.loads(raw, strict=False)
+        except json.JSONDecodeError:
+            try:
+                value = safe_json_loads(raw)
+            except ValueError:
+                return
+        self.fields[self._key] = value
+        completed.append((self._key, value))
+        self._key = None
+
+    def feed(self, chunk: str) -> list:
+        """Ajoute un fragment de texte et retourne les champs complétés"""
+        completed = []
+        if self._done or not chunk:
+            return completed
+
+        self._text += chunk
+        text = self._text
+        i = self._pos
+        length = len(text)
+
+        while i < length and not self._done:
+            char = text[i]
+
+            # Ignorer tout ce qui précède l'objet racine (```json, texte libre...)
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                i += 1
+                continue
 
-    if json5:
-        try:
-            return json5.loads(candidate)
-        except Exception as exc:  # pragma: no cover
-            last_error = exc
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._state == "key_string":
+                        try:
+                            self._key = json.loads(text[self._token_start : i + 1], strict=False)
+                        except json.JSONDecodeError:
+                            self._key = text[self._token_start + 1 : i]
+                        self._state = "colon"
+                    elif self._state == "value" and self._depth == 0:
+                        self._emit(text[self._token_start : i + 1], completed)
+                        self._state = "after_value"
+                i += 1
+                continue
 
-    try:
-        python_like = _normalize_literals(candidate)
-        return ast.literal_eval(python_like)
-    except Exception as exc:  # pragma: no cover
-        last_error = exc
+            if self._state == "key":
+                if char == '"':
+                    self._in_string = True
+                    self._token_start = i
+                    self._state = "key_string"
+                elif char == "}":
+                    self._done = True
+                i += 1
+                continue
+
+            if self._state == "colon":
+                if char == ":":
+                    self._state = "value_start"
+                i += 1
+                continue
+
+            if self._state == "value_start":
+                if char.isspace():
+                    i += 1
+                    continue
+                self._token_start = i
+                self._depth = 0
+                self._state = "value"
+
+            if self._state == "value":
+                if char == '"':
+                    self._in_string = True
+                elif char in "{[":
+                    self._depth += 1
+                elif char in "}]":
+                    if self._depth == 0:
+                        # Fin de l'objet racine juste après un scalaire
+                        self._emit(text[self._token_start : i], completed)
+                        self._done = True
+                    else:
+                        self._depth -= 1
+                        if self._depth == 0:
+                            self._emit(text[self._token_start : i + 1], completed)
+                            self._state = "after_value"
+                elif char == "," and self._depth == 0:
+                    self._emit(text[self._token_start : i], completed)
+                    self._state = "key"
+                i += 1
+                continue
 
-    raise ValueError(f"Impossible de parser le JSON: {last_error}")
+            # after_value
+            if char == ",":
+                self._state = "key"
+            elif char == "}":
+                self._done = True
+            i += 1
 
+        self._pos = i
+        return completed
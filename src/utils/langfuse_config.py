@@ -1,30 +1,225 @@
+import abc
+import atexit
+import hashlib
 import json
-from langfuse import Langfuse
-from langfuse.callback import CallbackHandler
+import queue
+import random
+import threading
+import time
 import os
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
-class LangfuseMonitoring:
-    def __init__(self):
-        self.langfuse = Langfuse(
-            public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
-            secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
-            host=os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
-        )
+if TYPE_CHECKING:
+    from langfuse import Langfuse
+
+
+class BackgroundExporter:
+    """File bornée + thread d'export: le monitoring ne bloque jamais le chemin utilisateur.
+
+    Les événements sont traités par lots dans un thread démon; si la file est pleine,
+    l'événement est abandonné et compté (drop-on-overflow).
+    """
+
+    def __init__(self, max_queue_size: int = 1000, batch_size: int = 50,
+                 flush_interval: float = 1.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self._thread = threading.Thread(target=self._run, name="langfuse-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, func: Callable, *args, **kwargs) -> bool:
+        """Met un événement en file sans bloquer; retourne False s'il est abandonné"""
+        if self._stop.is_set():
+            return False
+        try:
+            self._queue.put_nowait((func, args, kwargs))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def _next_batch(self) -> List:
+        """Attend un événement puis prend ceux déjà en file, jusqu'à batch_size"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if not batch:
+                continue
+            exported = failed = 0
+            for func, args, kwargs in batch:
+                try:
+                    func(*args, **kwargs)
+                    exported += 1
+                except Exception:
+                    failed += 1  # Le monitoring ne doit jamais faire échouer l'application
+                finally:
+                    self._queue.task_done()
+            with self._lock:
+                self.exported += exported
+                self.failed += failed
+                self.batches += 1
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Attend que la file soit vidée (au plus timeout secondes)"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline or not self._thread.is_alive():
+                return False
+            time.sleep(0.01)
+        return True
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Vide la file puis arrête le thread d'export"""
+        self.flush(timeout)
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+
+    def stats(self) -> Dict:
+        """Compteurs de l'exporteur"""
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "submitted": self.submitted,
+                "exported": self.exported,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches
+            }
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def get_background_exporter() -> BackgroundExporter:
+    """Exporteur partagé par le process, vidé puis arrêté à la sortie"""
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = BackgroundExporter(
+                max_queue_size=int(os.getenv("LANGFUSE_QUEUE_SIZE", "1000")),
+                batch_size=int(os.getenv("LANGFUSE_BATCH_SIZE", "50"))
+            )
+            atexit.register(_exporter.shutdown)
+        return _exporter
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_langfuse_client() -> "Langfuse":
+    """Client Langfuse unique pour le process (partagé par tous les handlers et sessions)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            # Import différé: le SDK n'est chargé que si une session est effectivement tracée
+            from langfuse import Langfuse
+
+            _client = Langfuse(
+                public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
+                secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
+                host=os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
+            )
+        return _client
+
+
+class BaseMonitoring(abc.ABC):
+    """Interface de monitoring utilisée par les agents et l'UI"""
+
+    enabled = True
+
+    @abc.abstractmethod
+    def get_callback_handler(self, trace_name: str, user_id: str = None):
+        """Callback LangChain pour tracer les appels LLM (None si désactivé)"""
+
+    @abc.abstractmethod
+    def log_agent_execution(self, agent_name: str, input_data: dict, output_data: dict, metadata: dict = None):
+        """Trace l'exécution d'un agent"""
+
+    @abc.abstractmethod
+    def log_workflow_step(self, step_name: str, state: dict, success: bool):
+        """Trace une étape du workflow"""
+
+    @abc.abstractmethod
+    def flush(self, timeout: float = 10.0) -> None:
+        """Envoie les événements en attente"""
+
+
+class NoOpMonitoring(BaseMonitoring):
+    """Monitoring désactivé: aucun client, aucun handler, aucun thread.
+
+    Évalué à False, ce qui court-circuite les ``if langfuse_monitor`` existants.
+    """
+
+    enabled = False
+
+    def __bool__(self) -> bool:
+        return False
+
+    def get_callback_handler(self, trace_name: str, user_id: str = None):
+        return None
+
+    def log_agent_execution(self, agent_name: str, input_data: dict, output_data: dict, metadata: dict = None):
+        return None
+
+    def log_workflow_step(self, step_name: str, state: dict, success: bool):
+        return None
+
+    def flush(self, timeout: float = 10.0) -> None:
+        return None
+
+
+class LangfuseMonitoring(BaseMonitoring):
+    def __init__(self, exporter: BackgroundExporter = None, session_id: Optional[str] = None,
+                 client: Optional["Langfuse"] = None):
+        self.langfuse = client or get_langfuse_client()
+        self.session_id = session_id
+        # Tous les événements de monitoring passent par l'exporteur en arrière-plan
+        self.exporter = exporter or get_background_exporter()
+        self._handlers: List = []
         
     def get_callback_handler(self, trace_name: str, user_id: str = None):
-        """Crée un callback handler pour tracer les opérations"""
-        handler = CallbackHandler(
-            trace_name=trace_name,
-            user_id=user_id,
-            public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
-            secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
-            host=os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
-        )
+        """Crée un callback handler pour tracer les opérations (sur le client partagé)"""
+        trace = self.langfuse.trace(name=trace_name, user_id=user_id, session_id=self.session_id)
+        handler = trace.get_langchain_handler(update_parent=True)
+        # Les handlers envoient leurs données en tâche de fond; flush unique en fin de session
+        self._handlers.append(handler)
         return handler
-    
+
+    def flush(self, timeout: float = 10.0) -> None:
+        """Envoie tout ce qui est en attente (fin de session ou arrêt du process)"""
+        self.exporter.flush(timeout)
+        try:
+            self.langfuse.flush()
+        except Exception:
+            pass
+
     def _format_payload(self, payload):
         """Convertit un payload en chaîne JSON pour l'affichage Langfuse"""
         if payload is None:
@@ -37,7 +232,11 @@ class LangfuseMonitoring:
             return str(payload)
 
     def log_agent_execution(self, agent_name: str, input_data: dict, output_data: dict, metadata: dict = None):
-        """Log l'exécution d'un agent"""
+        """Log l'exécution d'un agent (en arrière-plan, sans bloquer l'appelant)"""
+        return self.exporter.submit(self._export_agent_execution, agent_name, input_data, output_data, metadata)
+
+    def _export_agent_execution(self, agent_name: str, input_data: dict, output_data: dict, metadata: dict = None):
+        """Envoie l'exécution d'un agent à Langfuse (exécuté par l'exporteur)"""
         metadata = metadata or {}
         trace = self.langfuse.trace(
             name=f"agent_{agent_name}",
@@ -58,12 +257,42 @@ class LangfuseMonitoring:
         return trace
     
     def log_workflow_step(self, step_name: str, state: dict, success: bool):
-        """Log une étape du workflow"""
+        """Log une étape du workflow (en arrière-plan, sans bloquer l'appelant)"""
+        return self.exporter.submit(self._export_workflow_step, step_name, list(state.keys()), success)
+
+    def _export_workflow_step(self, step_name: str, state_keys: list, success: bool):
+        """Envoie une étape du workflow à Langfuse (exécuté par l'exporteur)"""
         self.langfuse.trace(
             name=f"workflow_step_{step_name}",
             metadata={
                 "step": step_name,
                 "success": success,
-                "state_keys": list(state.keys())
+                "state_keys": state_keys
             }
-        )
\ No newline at end of file
+        )
+
+
+def _sampled(session_id: Optional[str], rate: float) -> bool:
+    """Échantillonnage stable par session (même décision à chaque rerun)"""
+    if rate >= 1:
+        return True
+    if rate <= 0:
+        return False
+    if session_id is None:
+        return random.random() < rate
+    bucket = int(hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+    return bucket < rate
+
+
+def get_monitoring(session_id: Optional[str] = None, sample_rate: Optional[float] = None) -> BaseMonitoring:
+    """Retourne le monitoring de la session: Langfuse si configuré et échantillonné, sinon no-op"""
+    if os.getenv("LANGFUSE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return NoOpMonitoring()
+    if not (os.getenv("LANGFUSE_PUBLIC_KEY") and os.getenv("LANGFUSE_SECRET_KEY")):
+        return NoOpMonitoring()
+
+    if sample_rate is None:
+        sample_rate = float(os.getenv("LANGFUSE_SAMPLE_RATE", "1.0"))
+    if not _sampled(session_id, sample_rate):
+        return NoOpMonitoring()
+    return LangfuseMonitoring(session_id=session_id)
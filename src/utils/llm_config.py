@@ -1,9 +1,19 @@
 import os
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from src.utils.http_pool import get_http_pool
 
 load_dotenv()
 
+# Budgets de sortie par agent (surchargés par LLM_MAX_TOKENS_<AGENT>, ex: LLM_MAX_TOKENS_QUESTION_GENERATOR)
+DEFAULT_MAX_TOKENS = {
+    "cv_analyzer": 800,
+    "jd_analyzer": 800,
+    "company_researcher": 700,
+    "question_generator": 1600,
+    "interview_coach": 1200,
+}
+
 
 class LLMConfig:
     @staticmethod
@@ -18,10 +28,24 @@ class LLMConfig:
         return api_key
 
     @staticmethod
-    def get_llm(temperature=0.3, model=None, callbacks=None, max_tokens=512):
-        """Initialise le LLM OpenAI"""
+    def get_max_tokens(agent_name: str) -> int:
+        """Budget de tokens de sortie d'un agent"""
+        default = int(os.getenv("LLM_MAX_TOKENS", DEFAULT_MAX_TOKENS.get(agent_name, 512)))
+        return int(os.getenv(f"LLM_MAX_TOKENS_{agent_name.upper()}", default))
+
+    @staticmethod
+    def structured_output_mode() -> str:
+        """Mode de sortie des agents: text (défaut), json (JSON mode) ou schema (tool calling)"""
+        return os.getenv("LLM_STRUCTURED_OUTPUT", "text").lower()
+
+    @staticmethod
+    def get_llm(temperature=0.3, model=None, callbacks=None, max_tokens=512, json_mode=False):
+        """Initialise le LLM OpenAI (json_mode: le provider garantit un objet JSON valide)"""
         api_key = LLMConfig._ensure_openai_key()
         model_name = model or os.getenv("LLM_MODEL", "gpt-4o-mini")
+        model_kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+        # Connexions keep-alive partagées par tous les clients du process
+        http_pool = get_http_pool()
 
         return ChatOpenAI(
             api_key=api_key,
@@ -30,18 +54,41 @@ class LLMConfig:
             max_tokens=max_tokens,
             callbacks=callbacks,
             base_url=os.getenv("OPENAI_API_BASE"),
+            model_kwargs=model_kwargs,
+            http_client=http_pool.client,
+            http_async_client=http_pool.async_client,
         )
 
     @staticmethod
-    def get_embeddings(model: str | None = None):
-        """Initialise les embeddings OpenAI"""
+    def get_embeddings(model: str | None = None, backend: str | None = None):
+        """Initialise les embeddings (OpenAI ou sentence-transformers en local)"""
+        backend = (backend or os.getenv("EMBEDDING_BACKEND", "openai")).lower()
+        if backend == "local":
+            return LLMConfig.get_local_embeddings(model)
+
         api_key = LLMConfig._ensure_openai_key()
         embedding_model = model or os.getenv(
             "EMBEDDING_MODEL", "text-embedding-3-small"
         )
 
+        http_pool = get_http_pool()
+
         return OpenAIEmbeddings(
             api_key=api_key,
             model=embedding_model,
             base_url=os.getenv("OPENAI_API_BASE"),
-        )
\ No newline at end of file
+            http_client=http_pool.client,
+            http_async_client=http_pool.async_client,
+        )
+
+    @staticmethod
+    def get_local_embeddings(model: str | None = None):
+        """Initialise des embeddings locaux (CPU, sans appel réseau) via sentence-transformers"""
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        model_name = model or os.getenv("LOCAL_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={"device": os.getenv("LOCAL_EMBEDDING_DEVICE", "cpu")},
+            encode_kwargs={"normalize_embeddings": True},
+        )
@@ -0,0 +1,172 @@
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+# Ordre d'importance des champs (les derniers sont supprimés en premier quand le budget est dépassé)
+FIELD_PRIORITIES = {
+    "cv": ["summary", "skills", "experience_years", "experience_domains", "strengths",
+           "education", "areas_for_improvement"],
+    "jd": ["job_title", "seniority_level", "required_skills", "key_responsibilities",
+           "experience_required", "preferred_skills", "summary", "company_culture", "industry"],
+    "company": ["company_name", "main_activity", "values", "company_culture", "recent_news",
+                "industry_challenges", "interesting_facts"],
+}
+
+_DEFAULT_ENCODING = "cl100k_base"
+_WORD_BOUNDARY = re.compile(r"\s+\S*$")
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: Optional[str]):
+    """Encodage tiktoken du modèle (None si tiktoken ou ses fichiers BPE sont indisponibles)"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(_DEFAULT_ENCODING)
+        except KeyError:
+            return tiktoken.get_encoding(_DEFAULT_ENCODING)
+    except Exception:
+        # Fichiers BPE non téléchargeables (hors ligne): l'échec est mémorisé par lru_cache
+        # et les tokens sont estimés (~4 caractères/token)
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Compte les tokens d'un texte (approximation ~4 caractères/token sans tiktoken)"""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_text(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """Coupe un texte libre au budget, sur une frontière de mot"""
+    text = (text or "").strip()
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    encoding = _encoding(model)
+    if encoding is None:
+        cut = text[: max_tokens * 4]
+    else:
+        cut = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    # Ne pas s'arrêter au milieu d'un mot
+    cut = _WORD_BOUNDARY.sub("", cut) or cut
+    return cut.rstrip() + "…"
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def _ordered_keys(data: Dict, priorities: Sequence[str]) -> List[str]:
+    """Clés par importance décroissante: champs prioritaires puis les autres"""
+    ranked = [key for key in priorities if key in data]
+    return ranked + [key for key in data if key not in ranked]
+
+
+def fit_json(data: Any, max_tokens: int, priorities: Sequence[str] = (),
+             model: Optional[str] = None) -> str:
+    """Sérialise des données en JSON compact tenant dans max_tokens.
+
+    Réductions successives, chaque étape produisant un JSON valide:
+    1. suppression des champs vides;
+    2. suppression des éléments de liste en fin de liste (champs les moins prioritaires d'abord);
+    3. raccourcissement des textes libres longs sur une frontière de mot;
+    4. suppression des champs les moins prioritaires;
+    5. en dernier recours, raccourcissement du champ restant.
+    """
+    if not isinstance(data, dict):
+        if isinstance(data, list):
+            items = list(data)
+            while len(items) > 1 and count_tokens(_dumps(items), model) > max_tokens:
+                items.pop()
+            return _dumps(items)
+        if isinstance(data, str):
+            return _dumps(truncate_text(data, max_tokens, model))
+        return _dumps(data)
+
+    fitted = {key: data[key] for key in _ordered_keys(data, priorities) if not _is_empty(data[key])}
+
+    def fits() -> bool:
+        return count_tokens(_dumps(fitted), model) <= max_tokens
+
+    if fits():
+        return _dumps(fitted)
+
+    # 2. Raccourcir les listes, en commençant par les champs les moins importants
+    for key in reversed(list(fitted)):
+        value = fitted[key]
+        if isinstance(value, list):
+            value = list(value)
+            fitted[key] = value
+            while len(value) > 1 and not fits():
+                value.pop()
+        if fits():
+            return _dumps(fitted)
+
+    # 3. Raccourcir les textes longs (sur une frontière de mot) pour ne pas évincer les autres champs
+    text_budget = max(max_tokens // 3, 1)
+    for key, value in fitted.items():
+        if isinstance(value, str) and count_tokens(value, model) > text_budget:
+            fitted[key] = truncate_text(value, text_budget, model)
+    if fits():
+        return _dumps(fitted)
+
+    # 4. Supprimer les champs les moins importants (garder au moins le premier)
+    while len(fitted) > 1 and not fits():
+        fitted.pop(list(fitted)[-1])
+    if fits():
+        return _dumps(fitted)
+
+    # 5. Dernier recours: le champ restant est raccourci (le JSON reste valide)
+    key = next(iter(fitted))
+    value = fitted[key]
+    overhead = count_tokens(_dumps({key: ""}), model)
+    if isinstance(value, str):
+        fitted[key] = truncate_text(value, max(max_tokens - overhead, 1), model)
+    elif isinstance(value, list):
+        fitted[key] = [truncate_text(str(item), max(max_tokens - overhead, 1), model) for item in value[:1]]
+    return _dumps(fitted)
+
+
+class PromptBuilder:
+    """Assemble un prompt section par section, chacune avec son budget de tokens"""
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model
+        self.token_counts: Dict[str, int] = {}
+
+    def json_section(self, name: str, data: Any, max_tokens: int,
+                     priorities: Optional[Sequence[str]] = None) -> str:
+        """Section JSON compacte, réduite champ par champ pour tenir dans le budget"""
+        if priorities is None:
+            priorities = FIELD_PRIORITIES.get(name, ())
+        text = fit_json(data or {}, max_tokens, priorities, self.model)
+        self.token_counts[name] = count_tokens(text, self.model)
+        return text
+
+    def text_section(self, name: str, text: str, max_tokens: int) -> str:
+        """Section de texte libre, coupée au budget sur une frontière de mot"""
+        text = truncate_text(text, max_tokens, self.model)
+        self.token_counts[name] = count_tokens(text, self.model)
+        return text
+
+    def finish(self, prompt: str) -> str:
+        """Enregistre la taille totale du prompt assemblé"""
+        self.token_counts["total"] = count_tokens(prompt, self.model)
+        return prompt
+
+    def report(self) -> Dict[str, int]:
+        """Nombre de tokens par section et total"""
+        return dict(self.token_counts)
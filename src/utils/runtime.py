@@ -0,0 +1,121 @@
+import os
+import threading
+from typing import Dict
+
+from src.agents.company_researcher import CompanyResearcherAgent
+from src.agents.cv_analyzer import CVAnalyzerAgent
+from src.agents.interview_coach import InterviewCoachAgent
+from src.agents.jd_analyzer import JDAnalyzerAgent
+from src.agents.question_generator import QuestionGeneratorAgent
+from src.agents.supervisor import InterviewPrepSupervisor
+from src.tools.document_parser import DocumentParser
+from src.tools.vector_store import get_vector_store
+from src.tools.web_search import WebSearchTool
+from src.utils.cache import PersistentCache
+from src.utils.checkpointer import get_checkpointer
+from src.utils.http_pool import HttpPool, get_http_pool, warm_up_urls
+from src.utils.llm_config import LLMConfig
+
+
+class AppRuntime:
+    """Ressources sans état de session, construites une fois et partagées par le process"""
+
+    def __init__(self, supervisor: InterviewPrepSupervisor, vector_store, analysis_cache: PersistentCache,
+                 http_pool: HttpPool):
+        self.supervisor = supervisor
+        self.vector_store = vector_store
+        self.analysis_cache = analysis_cache
+        self.http_pool = http_pool
+
+    @property
+    def agents(self) -> Dict:
+        return self.supervisor.agents
+
+
+def build_runtime() -> AppRuntime:
+    """Construit clients LLM, embeddings, outils, agents et graphe compilé.
+
+    Les agents ne portent aucun callback de session: le monitoring de chaque
+    session est fourni à l'appel via src.agents.base.agent_session.
+    """
+    # Pool HTTP keep-alive partagé par les clients OpenAI, les embeddings et Tavily
+    http_pool = get_http_pool()
+    if os.getenv("HTTP_POOL_WARMUP", "true").lower() == "true":
+        # Handshakes TCP/TLS faits en arrière-plan, sans retarder le démarrage
+        threading.Thread(target=http_pool.warm_up, args=(warm_up_urls(),), daemon=True).start()
+
+    embeddings = LLMConfig.get_embeddings()
+
+    web_search = WebSearchTool(http_pool)
+    embedding_cache = PersistentCache(
+        path=os.getenv("EMBEDDING_CACHE_PATH", "./data/cache/embeddings.db"),
+        namespace="embeddings",
+        max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000")),
+        ttl_seconds=None
+    )
+    vector_store = get_vector_store(embeddings, embedding_cache=embedding_cache)
+
+    # Cache persistant des analyses CV/JD (évite de repayer les mêmes appels LLM)
+    analysis_cache = PersistentCache(
+        path=os.getenv("LLM_CACHE_PATH", "./data/cache/llm_cache.db"),
+        namespace="analysis",
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000")),
+        ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    )
+
+    # Cache des recherches entreprise (Tavily + synthèse): les infos publiques changent peu
+    company_cache = PersistentCache(
+        path=os.getenv("LLM_CACHE_PATH", "./data/cache/llm_cache.db"),
+        namespace="company",
+        max_entries=int(os.getenv("COMPANY_CACHE_MAX_ENTRIES", "2000")),
+        ttl_seconds=float(os.getenv("COMPANY_CACHE_TTL_SECONDS", str(3 * 24 * 3600)))
+    )
+
+    # Cache des documents parsés: tier disque partagé entre sessions et redémarrages
+    DocumentParser.configure_cache(
+        disk_cache=PersistentCache(
+            path=os.getenv("PARSE_CACHE_PATH", "./data/cache/documents.db"),
+            namespace="documents",
+            max_entries=int(os.getenv("PARSE_CACHE_DISK_MAX_ENTRIES", "500")),
+            ttl_seconds=None
+        )
+    )
+
+    # Mode de sortie structurée (LLM_STRUCTURED_OUTPUT=text|json|schema)
+    output_mode = LLMConfig.structured_output_mode()
+    json_mode = output_mode == "json"
+
+    def agent_llm(agent_name: str):
+        """LLM de l'agent avec son budget de sortie"""
+        return LLMConfig.get_llm(json_mode=json_mode, max_tokens=LLMConfig.get_max_tokens(agent_name))
+
+    agents = {
+        "cv_analyzer": CVAnalyzerAgent(
+            agent_llm("cv_analyzer"),
+            cache=analysis_cache,
+            structured_output=output_mode
+        ),
+        "jd_analyzer": JDAnalyzerAgent(
+            agent_llm("jd_analyzer"),
+            cache=analysis_cache,
+            structured_output=output_mode
+        ),
+        "company_researcher": CompanyResearcherAgent(
+            agent_llm("company_researcher"),
+            web_search,
+            cache=company_cache,
+            structured_output=output_mode
+        ),
+        "question_generator": QuestionGeneratorAgent(
+            agent_llm("question_generator"),
+            structured_output=output_mode
+        ),
+        "interview_coach": InterviewCoachAgent(
+            agent_llm("interview_coach"),
+            structured_output=output_mode
+        )
+    }
+
+    # Graphe compilé une fois; chaque session a son propre thread de checkpoints
+    supervisor = InterviewPrepSupervisor(agents, vector_store, get_checkpointer())
+    return AppRuntime(supervisor, vector_store, analysis_cache, http_pool)
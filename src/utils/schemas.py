@@ -0,0 +1,76 @@
+# Schémas des réponses JSON des agents (mode structured output)
+# pydantic_v1: format attendu par with_structured_output dans langchain-core 0.2
+from typing import List, Optional
+from langchain_core.pydantic_v1 import BaseModel, Field
+
+
+class CVAnalysis(BaseModel):
+    """Analyse structurée d'un CV"""
+    skills: List[str] = Field(default_factory=list, description="Compétences principales")
+    experience_years: Optional[float] = Field(None, description="Années d'expérience")
+    experience_domains: List[str] = Field(default_factory=list, description="Domaines d'expérience")
+    education: str = Field("", description="Formation")
+    strengths: List[str] = Field(default_factory=list, description="3-5 points forts")
+    areas_for_improvement: List[str] = Field(default_factory=list, description="2-3 points à améliorer")
+    summary: str = Field("", description="Résumé en 2-3 phrases")
+
+
+class JDAnalysis(BaseModel):
+    """Analyse structurée d'une description de poste"""
+    job_title: str = Field("", description="Intitulé du poste")
+    seniority_level: str = Field("", description="junior/mid/senior")
+    required_skills: List[str] = Field(default_factory=list, description="Compétences requises")
+    preferred_skills: List[str] = Field(default_factory=list, description="Compétences appréciées")
+    experience_required: str = Field("", description="Expérience demandée")
+    key_responsibilities: List[str] = Field(default_factory=list, description="Responsabilités clés")
+    company_culture: str = Field("", description="Culture d'entreprise")
+    industry: str = Field("", description="Secteur d'activité")
+    summary: str = Field("", description="Résumé en 2-3 phrases")
+
+
+class CompanyInfo(BaseModel):
+    """Synthèse des informations sur l'entreprise"""
+    company_name: str = Field("", description="Nom de l'entreprise")
+    main_activity: str = Field("", description="Activité principale")
+    recent_news: List[str] = Field(default_factory=list, description="2-3 actualités récentes")
+    company_culture: str = Field("", description="Culture d'entreprise")
+    values: List[str] = Field(default_factory=list, description="Valeurs")
+    industry_challenges: List[str] = Field(default_factory=list, description="Défis du secteur")
+    interesting_facts: List[str] = Field(default_factory=list, description="Faits intéressants")
+
+
+class InterviewQuestion(BaseModel):
+    """Question d'entretien personnalisée"""
+    category: str = Field("", description="technique/comportementale/entreprise")
+    question: str = Field(..., description="Question posée au candidat")
+    objective: str = Field("", description="Intention du recruteur")
+    tips: List[str] = Field(default_factory=list, description="2 conseils concrets")
+    difficulty: str = Field("medium", description="easy/medium/hard")
+
+
+class QuestionList(BaseModel):
+    """Liste de questions d'entretien"""
+    questions: List[InterviewQuestion] = Field(default_factory=list)
+
+
+class AnswerFeedback(BaseModel):
+    """Évaluation d'une réponse du candidat"""
+    score: float = Field(..., description="Note sur 10")
+    positive_points: List[str] = Field(default_factory=list, description="2-3 points positifs")
+    improvement_areas: List[str] = Field(default_factory=list, description="2-3 points à améliorer")
+    improved_answer: str = Field("", description="Suggestion de réponse améliorée")
+    specific_tips: List[str] = Field(default_factory=list, description="2-3 conseils spécifiques")
+    encouragement: str = Field("", description="Message d'encouragement personnalisé")
+
+
+class PreparationTips(BaseModel):
+    """Conseils généraux de préparation"""
+    preparation_checklist: List[str] = Field(default_factory=list, description="5-7 actions à faire")
+    strengths_to_highlight: List[str] = Field(default_factory=list, description="Points forts à mettre en avant")
+    potential_concerns: List[str] = Field(
+        default_factory=list,
+        description="Points qui pourraient inquiéter le recruteur + comment les adresser"
+    )
+    dress_code: str = Field("", description="Conseils vestimentaires")
+    body_language: str = Field("", description="Conseils de langage corporel")
+    common_mistakes: List[str] = Field(default_factory=list, description="Erreurs à éviter")
@@ -55,4 +55,229 @@ def test_cv_analyzer_error_handling(llm):
     result = analyzer.analyze("")
     
     # Should handle empty input gracefully
-    assert "error" in result or result["success"] is False
\ No newline at end of file
+    assert "error" in result or result["success"] is False
+
+def test_cv_analyzer_uses_cache(tmp_path, sample_cv):
+    """Test that a repeated analysis is served from the cache"""
+    from langchain_core.language_models import FakeListChatModel
+    from src.utils.cache import PersistentCache
+
+    fake_llm = FakeListChatModel(responses=['{"skills": ["Python"]}'])
+    cache = PersistentCache(path=str(tmp_path / "llm_cache.db"))
+    analyzer = CVAnalyzerAgent(fake_llm, cache=cache)
+
+    first = analyzer.analyze(sample_cv)
+    second = analyzer.analyze(sample_cv + "\n  ")
+
+    assert first["success"] is True
+    assert second.get("cached") is True
+    assert second["analysis"] == first["analysis"]
+    assert cache.stats()["hits"] == 1
+
+def test_coach_stream_evaluate_answer():
+    """Test streaming evaluation yields each feedback field"""
+    from langchain_core.language_models import FakeListChatModel
+    from src.agents.interview_coach import InterviewCoachAgent
+
+    fake_llm = FakeListChatModel(responses=[
+        '{"score": 7, "positive_points": ["Structuré"], "improvement_areas": ["Chiffrer"], '
+        '"improved_answer": "...", "specific_tips": ["STAR"], "encouragement": "Bravo"}'
+    ])
+    coach = InterviewCoachAgent(fake_llm)
+
+    fields = list(coach.stream_evaluate_answer("Q?", "Ma réponse", {"cv": {}, "jd": {}}))
+
+    assert fields[0] == ("score", 7)
+    assert dict(fields)["encouragement"] == "Bravo"
+    assert len(fields) == 6
+
+def test_cv_analyzer_schema_output(sample_cv):
+    """Test schema-constrained output bypasses JSON extraction"""
+    from langchain_core.language_models import FakeListChatModel
+    from langchain_core.runnables import RunnableLambda
+    from src.utils.schemas import CVAnalysis
+
+    class _SchemaLLM(FakeListChatModel):
+        def with_structured_output(self, schema, **kwargs):
+            return RunnableLambda(lambda _: schema(skills=["Python", "Docker"], experience_years=5))
+
+    analyzer = CVAnalyzerAgent(_SchemaLLM(responses=["ignored"]), structured_output="schema")
+    result = analyzer.analyze(sample_cv)
+
+    assert result["success"] is True
+    assert result["analysis"]["skills"] == ["Python", "Docker"]
+    assert result["analysis"]["experience_years"] == 5
+    assert analyzer._output_llm(CVAnalysis) is analyzer._output_llm(CVAnalysis)
+
+def test_question_generator_continues_truncated_output():
+    """Test that an output cut by max_tokens is resumed instead of repaired"""
+    from langchain_core.messages import AIMessage
+    from src.agents.base import AgentSession, agent_session
+    from src.agents.question_generator import QuestionGeneratorAgent
+
+    class _TruncatingLLM:
+        def __init__(self):
+            self.calls = []
+            self.responses = [
+                AIMessage(content='{"questions": [{"question": "Q1"}, {"quest',
+                          response_metadata={"finish_reason": "length"}),
+                AIMessage(content='ion": "Q2"}]}', response_metadata={"finish_reason": "stop"}),
+            ]
+
+        def invoke(self, messages, config=None):
+            self.calls.append(messages)
+            return self.responses[len(self.calls) - 1]
+
+    llm = _TruncatingLLM()
+    generator = QuestionGeneratorAgent(llm)
+    session = AgentSession()
+    with agent_session(session):
+        result = generator.generate_questions({"skills": ["Python"]}, {"job_title": "Dev"}, {})
+
+    assert [q["question"] for q in result["questions"]] == ["Q1", "Q2"]
+    assert generator.continuations == 1
+    assert session.continuations == {"question_generator": 1}
+    # La relance contient la sortie partielle comme message assistant
+    assert llm.calls[1][1].content.endswith('{"quest')
+
+def test_coach_reuses_compact_coaching_context():
+    """Test that evaluation prompts share the session context as a stable prefix"""
+    from langchain_core.language_models import FakeListChatModel
+    from src.agents.interview_coach import InterviewCoachAgent
+
+    coach = InterviewCoachAgent(FakeListChatModel(responses=["{}"]))
+    cv = {"skills": ["Python", "Docker"], "education": "BS", "summary": "Développeur " * 200}
+    jd = {"job_title": "Dev", "required_skills": ["Python"], "company_culture": "Start-up"}
+    context = coach.build_coaching_context(cv, jd)
+
+    # Seuls les champs utiles à l'évaluation sont conservés
+    assert "Docker" in context and '"job_title":"Dev"' in context
+    assert "summary" not in context and "company_culture" not in context
+    assert context == coach.build_coaching_context(cv, jd)
+
+    first, _ = coach._evaluation_prompt("Q1?", "Réponse 1", context)
+    second, _ = coach._evaluation_prompt("Q2?", "Réponse 2", context)
+    prefix = first[:first.index("QUESTION:")]
+    assert second.startswith(prefix) and context in prefix
+    assert coach._evaluation_prompt("Q1?", "Réponse 1", {"cv": cv, "jd": jd})[0] == first
+
+def test_shared_agent_uses_current_session_monitoring():
+    """Test that a process-wide agent logs to the monitor of the calling session"""
+    from langchain_core.language_models import FakeListChatModel
+    from langchain_core.runnables.config import ContextThreadPoolExecutor
+    from src.agents.base import AgentSession, agent_session
+    from src.agents.interview_coach import InterviewCoachAgent
+
+    class _Monitor:
+        def __init__(self):
+            self.handlers, self.logs = [], []
+
+        def get_callback_handler(self, agent_name, user_id):
+            self.handlers.append((agent_name, user_id))
+            return None
+
+        def log_agent_execution(self, agent_name, input_data, output_data):
+            self.logs.append(agent_name)
+
+    coach = InterviewCoachAgent(FakeListChatModel(responses=['{"score": 7}']))
+    first, second = _Monitor(), _Monitor()
+
+    with agent_session(AgentSession(first, user_id="alice")):
+        # Le contexte de session suit les appels exécutés dans un pool de threads
+        with ContextThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(coach.evaluate_answer, "Q?", "Réponse", "CONTEXTE").result()
+    with agent_session(AgentSession(second, user_id="bob")):
+        coach.evaluate_answer("Q?", "Réponse", "CONTEXTE")
+    coach.evaluate_answer("Q?", "Réponse", "CONTEXTE")
+
+    assert first.logs == ["interview_coach_evaluate"]
+    assert second.logs == ["interview_coach_evaluate"]
+    assert first.handlers == [("interview_coach", "alice")]
+
+def test_company_researcher_caches_and_coalesces_research(tmp_path):
+    """Test that company research is cached by normalized name and shared by concurrent sessions"""
+    import asyncio
+    from langchain_core.language_models import FakeListChatModel
+    from src.agents.company_researcher import CompanyResearcherAgent, normalize_company_name
+    from src.utils.cache import PersistentCache
+
+    class _WebSearch:
+        def __init__(self):
+            self.calls = 0
+
+        async def asearch_company_info(self, company_name):
+            self.calls += 1
+            await asyncio.sleep(0.01)
+            return {"success": True, "results": [{"title": company_name, "content": "Éditeur SaaS"}]}
+
+    web_search = _WebSearch()
+    cache = PersistentCache(path=str(tmp_path / "company.db"), ttl_seconds=3600)
+    researcher = CompanyResearcherAgent(
+        FakeListChatModel(responses=['{"company_name": "Acme", "main_activity": "SaaS"}']),
+        web_search, cache=cache
+    )
+
+    async def research_concurrently():
+        return await asyncio.gather(*(researcher.aresearch("Acme", "Tech") for _ in range(3)))
+
+    results = asyncio.run(research_concurrently())
+    again = asyncio.run(researcher.aresearch("ACME SAS", " tech "))
+
+    assert normalize_company_name("Société Générale S.A.") == normalize_company_name("societe generale")
+    assert normalize_company_name("AG Insurance") == "ag insurance"
+    assert normalize_company_name("Acme Holdings Inc. Ltd") == "acme holdings"
+    assert web_search.calls == 1
+    assert all(result["success"] for result in results)
+    assert researcher.inflight.stats()["coalesced"] == 2
+    assert again.get("cached") is True
+    assert again["info"] == results[0]["info"]
+
+
+def test_company_researcher_does_not_cache_empty_results(tmp_path):
+    """Test that zero-result searches and empty syntheses are not cached"""
+    import asyncio
+    from langchain_core.language_models import FakeListChatModel
+    from src.agents.company_researcher import CompanyResearcherAgent
+    from src.utils.cache import PersistentCache
+
+    class _WebSearch:
+        def __init__(self):
+            self.results = []
+            self.calls = 0
+
+        async def asearch_company_info(self, company_name):
+            self.calls += 1
+            return {"success": True, "results": list(self.results)}
+
+    web_search = _WebSearch()
+    cache = PersistentCache(path=str(tmp_path / "company.db"), ttl_seconds=3600)
+    researcher = CompanyResearcherAgent(
+        FakeListChatModel(responses=["[]", '{"company_name": "Acme", "main_activity": "SaaS"}']),
+        web_search, cache=cache
+    )
+
+    asyncio.run(researcher.asearch("Acme"))
+    web_search.results = [{"title": "Acme", "content": "Éditeur SaaS"}]
+    empty = asyncio.run(researcher.aresearch("Acme"))
+    filled = asyncio.run(researcher.aresearch("Acme"))
+
+    assert web_search.calls == 2
+    assert empty["info"] == [] and not empty.get("cached")
+    assert filled["info"]["main_activity"] == "SaaS" and not filled.get("cached")
+    assert asyncio.run(researcher.aresearch("Acme")).get("cached") is True
+
+
+def test_llm_clients_share_the_http_pool(monkeypatch):
+    """Test that the pinned langchain-openai accepts the pooled httpx clients"""
+    from src.utils.http_pool import get_http_pool
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    pool = get_http_pool()
+    llm = LLMConfig.get_llm(max_tokens=100)
+    embeddings = LLMConfig.get_embeddings(backend="openai")
+
+    # ChatOpenAI -> openai.OpenAI -> httpx.Client
+    assert llm.client._client._client is pool.client
+    assert llm.async_client._client._client is pool.async_client
+    assert embeddings.client._client._client is pool.client
+    assert embeddings.async_client._client._client is pool.async_client
@@ -2,6 +2,45 @@ import pytest
 from src.tools.document_parser import DocumentParser
 from pathlib import Path
 
+def _zip_bytes(names):
+    """Archive ZIP en mémoire contenant les entrées données"""
+    import io
+    import zipfile
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name in names:
+            archive.writestr(name, "<xml/>")
+    return buffer.getvalue()
+
+def _write_pdf(path, page_texts):
+    """Écrit un PDF minimal avec une ligne de texte par page"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in page_texts:
+        stream = f"BT /F1 12 Tf 20 100 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 300 200] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    output = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode("latin-1")
+    output += (f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+               f"startxref\n{xref_offset}\n%%EOF\n").encode("latin-1")
+    path.write_bytes(output)
+
 def test_parse_text_file(tmp_path):
     """Test parsing text file"""
     # Create temporary file
@@ -16,4 +55,144 @@ def test_parse_text_file(tmp_path):
 def test_unsupported_format():
     """Test unsupported file format"""
     with pytest.raises(ValueError):
-        DocumentParser.parse_document("test.xyz")
\ No newline at end of file
+        DocumentParser.parse_document("test.xyz")
+
+def test_parse_document_from_bytes(tmp_path):
+    """Test parsing in-memory uploads with format detection from magic bytes"""
+    from src.tools.document_parser import detect_format
+
+    text_result = DocumentParser.parse_document(memoryview("Développeur Python".encode("utf-8")))
+    assert text_result["content"] == "Développeur Python"
+    assert text_result["extension"] == "txt"
+
+    pdf_path = tmp_path / "cv.pdf"
+    _write_pdf(pdf_path, ["Experience"])
+    pdf_result = DocumentParser.parse_document(pdf_path.read_bytes(), filename="cv.pdf")
+    assert pdf_result["extension"] == "pdf"
+    assert "Experience" in pdf_result["content"]
+    assert pdf_result["file_path"] == "cv.pdf"
+
+    assert detect_format(_zip_bytes(["word/document.xml"])) == "docx"
+    with pytest.raises(ValueError, match="document Word"):
+        detect_format(_zip_bytes(["xl/workbook.xml"]))
+    with pytest.raises(ValueError, match="ZIP invalide"):
+        detect_format(b"PK\x03\x04rest")
+    with pytest.raises(ValueError, match="97-2003"):
+        DocumentParser.parse_document(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1legacy")
+    legacy_doc = tmp_path / "cv.doc"
+    legacy_doc.write_bytes(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1legacy")
+    with pytest.raises(ValueError, match="97-2003"):
+        DocumentParser.parse_document(str(legacy_doc))
+    with pytest.raises(ValueError):
+        DocumentParser.parse_document(b"\xff\xfe\x00binary")
+
+def test_parse_document_cache(tmp_path):
+    """Test that identical file contents are parsed only once"""
+    from src.utils.cache import PersistentCache
+
+    DocumentParser.clear_cache()
+    disk_cache = PersistentCache(path=str(tmp_path / "documents.db"), namespace="documents", ttl_seconds=None)
+    DocumentParser.configure_cache(disk_cache=disk_cache)
+    try:
+        first = DocumentParser.parse_document(b"CV modele", filename="a.txt")
+        second = DocumentParser.parse_document(memoryview(b"CV modele"), filename="b.txt")
+
+        assert second["content"] == first["content"]
+        assert second["file_path"] == "b.txt"
+        assert DocumentParser.cache_stats()["hits"] == 1
+        assert len(disk_cache) == 1
+
+        # Le tier disque survit au vidage du LRU mémoire
+        DocumentParser.clear_cache()
+        DocumentParser.parse_document(b"CV modele")
+        assert DocumentParser.cache_stats()["hits"] == 1
+    finally:
+        DocumentParser.configure_cache(disk_cache=None)
+        DocumentParser.clear_cache()
+
+def test_vector_store_reuses_collection_handles(tmp_path):
+    """Test that collection handles and chromadb clients are shared"""
+    from langchain_core.embeddings import FakeEmbeddings
+    from src.tools.vector_store import VectorStore
+
+    embeddings = FakeEmbeddings(size=8)
+    store = VectorStore(embeddings, persist_directory=str(tmp_path))
+    other = VectorStore(embeddings, persist_directory=str(tmp_path))
+
+    store.add_documents("cv_data", ["Python developer"])
+    store.similarity_search("cv_data", "Python")
+    other.similarity_search("cv_data", "Python")
+
+    assert store.stats() == {"open_collections": 1, "opened": 1, "reused": 1}
+    assert store._get_client() is other._get_client()
+
+    store.close()
+    other.close()
+    assert store.stats()["open_collections"] == 0
+
+def test_vector_store_deduplicates_chunks(tmp_path):
+    """Test that re-ingesting a document adds no rows and computes no embeddings"""
+    from langchain_core.embeddings import FakeEmbeddings
+    from src.tools.vector_store import VectorStore
+    from src.utils.cache import PersistentCache
+
+    cache = PersistentCache(path=str(tmp_path / "embeddings.db"), namespace="embeddings")
+    store = VectorStore(FakeEmbeddings(size=8), persist_directory=str(tmp_path / "db"),
+                        embedding_cache=cache)
+    cv_text = "Python developer with 5 years of Docker experience"
+
+    collection = store.add_documents("cv_data", [cv_text], [{"type": "cv", "analysis": {"skills": ["Python"]}}])
+    computed = store.embeddings.computed
+    store.add_documents("cv_data", [cv_text], [{"type": "cv", "analysis": {"skills": ["Python"]}}])
+
+    assert len(collection.get()["ids"]) == 1
+    assert store.embeddings.computed == computed
+    store.close()
+
+def test_faiss_vector_store_persists_index(tmp_path):
+    """Test the FAISS backend: dedup, persistence and reload"""
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from src.tools.vector_store import FaissVectorStore, get_vector_store
+
+    embeddings = DeterministicFakeEmbedding(size=16)
+    store = get_vector_store(embeddings, persist_directory=str(tmp_path), backend="faiss")
+    assert isinstance(store, FaissVectorStore)
+
+    store.add_documents("cv_data", ["Python developer"], [{"type": "cv"}])
+    store.add_documents("cv_data", ["Python developer"], [{"type": "cv"}])
+    assert (tmp_path / "cv_data.faiss").exists()
+
+    reloaded = FaissVectorStore(embeddings, persist_directory=str(tmp_path))
+    results = reloaded.similarity_search("cv_data", "Python developer", k=3)
+
+    assert [doc.page_content for doc in results] == ["Python developer"]
+    assert results[0].metadata == {"type": "cv"}
+
+    # Après le premier ajout, l'index reste en mémoire (pas de relecture du fichier à chaque ajout)
+    collection = reloaded.create_or_load_store("cv_data")
+    reloaded.add_documents("cv_data", ["Docker expert"])
+    index = collection.index
+    reloaded.add_documents("cv_data", ["Kubernetes expert"])
+    assert collection.index is index and index.ntotal == 3
+
+    # Un chunk déjà présent (ajout concurrent) n'est pas inséré deux fois
+    from langchain_core.documents import Document
+    from src.tools.vector_store import chunk_id
+    duplicate = [Document(page_content="Docker expert")]
+    assert collection.add(duplicate, [chunk_id("Docker expert")], embeddings.embed_documents(["Docker expert"])) == 0
+    assert len(collection.documents) == 3
+
+def test_parse_pdf_parallel_matches_serial(tmp_path):
+    """Test that page-parallel extraction keeps page order"""
+    pdf_path = tmp_path / "portfolio.pdf"
+    _write_pdf(pdf_path, [f"Page {idx}" for idx in range(12)])
+
+    serial = DocumentParser.parse_pdf(str(pdf_path), parallel=False)
+    parallel = DocumentParser.parse_pdf(str(pdf_path), parallel=True, max_workers=3)
+    pages = list(DocumentParser.iter_pdf_pages(str(pdf_path), parallel=True, max_workers=3))
+
+    assert parallel == serial
+    # Octets en mémoire: transmis une fois par worker
+    assert DocumentParser.parse_pdf(pdf_path.read_bytes(), parallel=True, max_workers=2) == serial
+    assert len(pages) == 12
+    assert "Page 0" in pages[0] and "Page 11" in pages[-1]
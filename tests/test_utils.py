@@ -0,0 +1,331 @@
+import pytest
+from src.utils.cache import PersistentCache, make_cache_key, normalize_text
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = PersistentCache(path=str(tmp_path / "cache.db"), namespace="test", max_entries=3)
+    yield cache
+    cache.close()
+
+def test_cache_key_is_stable_across_whitespace():
+    """Test normalized cache keys"""
+    key_a = make_cache_key("cv", normalize_text("Python   Docker\n"), "template", "gpt-4o-mini")
+    key_b = make_cache_key("cv", normalize_text(" Python Docker"), "template", "gpt-4o-mini")
+    key_c = make_cache_key("cv", normalize_text("Python Docker"), "template", "gpt-4o")
+
+    assert key_a == key_b
+    assert key_a != key_c
+
+def test_cache_hit_and_miss_counters(cache):
+    """Test hit/miss counters"""
+    assert cache.get("missing") is None
+    cache.set("key", {"skills": ["Python"]})
+
+    assert cache.get("key") == {"skills": ["Python"]}
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+def test_cache_size_eviction(cache):
+    """Test LRU eviction when max_entries is exceeded"""
+    for idx in range(3):
+        cache.set(f"key_{idx}", idx)
+    cache.get("key_0")  # key_1 devient la plus ancienne
+    cache.set("key_3", 3)
+
+    assert len(cache) == 3
+    assert cache.get("key_1") is None
+    assert cache.get("key_0") == 0
+
+def test_cache_ttl_expiration(tmp_path):
+    """Test TTL expiration"""
+    cache = PersistentCache(path=str(tmp_path / "ttl.db"), ttl_seconds=0)
+    cache.set("key", "value")
+
+    assert cache.get("key") is None
+    assert cache.stats()["evictions"] >= 1
+
+def test_cache_persists_on_disk(tmp_path):
+    """Test persistence across instances"""
+    path = str(tmp_path / "persist.db")
+    PersistentCache(path=path).set("key", [1, 2, 3])
+
+    assert PersistentCache(path=path).get("key") == [1, 2, 3]
+
+def test_cache_get_many_and_set_many(cache):
+    """Test batched reads and writes"""
+    cache.set_many({"key_0": [0.0], "key_1": [1.0]})
+
+    assert cache.get_many(["key_0", "missing", "key_1", "key_0"]) == {"key_0": [0.0], "key_1": [1.0]}
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+    cache.set_many({"key_2": 2, "key_3": 3})  # key_0 et key_1 relues: aucune n'est la plus ancienne
+    assert len(cache) == 3
+    assert cache.get_many([]) == {}
+
+def test_single_flight_coalesces_concurrent_calls():
+    """Test that concurrent identical sync and async calls share a single computation"""
+    import asyncio
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from src.utils.cache import SingleFlight
+
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"success": True}
+
+    async def acompute():
+        calls.append(1)
+        return {"success": False}
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(flight.do, "acme", compute)
+        assert started.wait(5)
+        # Appelants synchrones (UI) et asynchrones (lot) partagent le même calcul
+        followers = [executor.submit(flight.do, "acme", compute) for _ in range(2)]
+        followers.append(executor.submit(asyncio.run, flight.ado("acme", acompute)))
+        deadline = time.monotonic() + 5
+        while flight.stats()["coalesced"] < 3:
+            assert time.monotonic() < deadline, "followers never joined the in-flight call"
+            time.sleep(0.001)
+        release.set()
+        results = [leader.result(timeout=5)] + [future.result(timeout=5) for future in followers]
+
+    assert calls == [1]
+    assert all(result == {"success": True} for result in results)
+    assert flight.stats() == {"calls": 1, "coalesced": 3, "in_flight": 0}
+
+def test_incremental_reader_emits_fields_in_order():
+    """Test incremental JSON reading chunk by chunk"""
+    from src.utils.json_utils import IncrementalJSONReader
+
+    payload = '```json\n{"score": 8, "positive_points": ["Clair", "Exemple {STAR}"], "improved_answer": "Je \\"dirais\\"..."}\n```'
+    reader = IncrementalJSONReader()
+    emitted = []
+    for idx in range(0, len(payload), 4):
+        emitted.extend(reader.feed(payload[idx:idx + 4]))
+
+    assert [key for key, _ in emitted] == ["score", "positive_points", "improved_answer"]
+    assert emitted[0] == ("score", 8)
+    assert emitted[1][1] == ["Clair", "Exemple {STAR}"]
+    assert reader.done is True
+
+def test_incremental_reader_emits_score_before_completion():
+    """Test that a field is available before the whole object is received"""
+    from src.utils.json_utils import IncrementalJSONReader
+
+    reader = IncrementalJSONReader()
+    assert reader.feed('{"score": 6,') == [("score", 6)]
+    assert reader.feed(' "positive_points": ["a"') == []
+    assert reader.feed(']}') == [("positive_points", ["a"])]
+
+@pytest.mark.parametrize("payload, expected", [
+    ('{"skills": ["Python", "SQL",],}', {"skills": ["Python", "SQL"]}),
+    ("{'level': 'senior', 'remote': True, 'team': None}", {"level": "senior", "remote": True, "team": None}),
+    ('Voici le résultat: {"score": 7} Bonne chance', {"score": 7}),
+    ('{"questions": [{"q": "Pourquoi ?"}}', {"questions": [{"q": "Pourquoi ?"}]}),
+    ('{"summary": "Profil backend", "skills": ["Python", "Dja', {"summary": "Profil backend", "skills": ["Python", "Dja"]}),
+    ('{score: 8, "tips": ["a" "b"]}', {"score": 8, "tips": ["a", "b"]}),
+    ('{"a": https://example.com/x, "b": 1}', {"a": "https://example.com/x", "b": 1}),
+    ('{"msg": I am bare text // commentaire\n}', {"msg": "I am bare text"}),
+])
+def test_safe_json_loads_repairs_llm_output(payload, expected):
+    """Test single-pass repair of malformed LLM JSON"""
+    from src.utils.json_utils import safe_json_loads
+
+    assert safe_json_loads(payload) == expected
+
+def test_safe_json_loads_rejects_text_without_json():
+    """Test that plain text is rejected"""
+    from src.utils.json_utils import safe_json_loads
+
+    with pytest.raises(ValueError):
+        safe_json_loads("Je ne peux pas répondre.")
+
+def test_json_repair_benchmark_thresholds():
+    """Test JSON repair pipeline against the benchmark regression thresholds"""
+    from benchmarks.json_repair import check_thresholds, run_benchmark
+
+    report = run_benchmark(repeat=20, fuzz_rounds=30)
+
+    assert check_thresholds(report) == []
+    assert report["by_category"]["unquoted_values"] == 1.0
+    assert report["fuzz"]["by_kind"]["unquoted_value"] > 0
+    assert report["stage_hit_rates"]["parse.fast"] > 0
+    assert report["stage_hit_rates"]["parse.repair"] > 0
+
+def test_tool_modules_defer_heavy_imports():
+    """Test that tool modules do not import their heavy dependencies at cold start"""
+    from benchmarks.startup import check_thresholds, run_benchmark
+
+    report = run_benchmark(["src.tools.document_parser", "src.tools.web_search"], repeat=1)
+
+    assert check_thresholds(report) == []
+    assert report["modules"]["src.tools.document_parser"]["eager_heavy"] == []
+
+def test_background_exporter_batches_and_drops():
+    """Test non-blocking monitoring export with drop-on-overflow"""
+    import threading
+    from src.utils.langfuse_config import BackgroundExporter
+
+    release = threading.Event()
+    exported = []
+    exporter = BackgroundExporter(max_queue_size=2, batch_size=10, flush_interval=0.05)
+    try:
+        # Bloquer le thread d'export sur le premier événement pour remplir la file
+        exporter.submit(release.wait)
+        while exporter.stats()["queued"]:
+            pass
+        assert exporter.submit(exported.append, 1)
+        assert exporter.submit(exported.append, 2)
+        assert exporter.submit(exported.append, 3) is False
+
+        release.set()
+        assert exporter.flush(timeout=5)
+        stats = exporter.stats()
+        assert exported == [1, 2]
+        assert stats["dropped"] == 1
+        assert stats["exported"] == 3
+    finally:
+        release.set()
+        exporter.shutdown()
+
+def test_monitoring_is_noop_without_keys_or_when_sampled_out(monkeypatch):
+    """Test optional monitoring and per-session sampling"""
+    from src.utils.langfuse_config import BaseMonitoring, NoOpMonitoring, _sampled, get_monitoring
+
+    with pytest.raises(TypeError):
+        BaseMonitoring()
+
+    monkeypatch.delenv("LANGFUSE_PUBLIC_KEY", raising=False)
+    monitor = get_monitoring(session_id="abc")
+    assert isinstance(monitor, NoOpMonitoring)
+    assert not monitor
+    assert monitor.get_callback_handler("cv_analyzer") is None
+
+    monkeypatch.setenv("LANGFUSE_PUBLIC_KEY", "pk")
+    monkeypatch.setenv("LANGFUSE_SECRET_KEY", "sk")
+    assert isinstance(get_monitoring(session_id="abc", sample_rate=0), NoOpMonitoring)
+
+    sessions = [f"session-{idx}" for idx in range(1000)]
+    sampled = [session for session in sessions if _sampled(session, 0.2)]
+    assert 100 < len(sampled) < 300
+    assert sampled == [session for session in sessions if _sampled(session, 0.2)]
+
+def test_count_tokens_falls_back_when_encoding_cannot_load(monkeypatch):
+    """Test that an offline tiktoken (BPE download failure) falls back to the estimate once"""
+    import sys
+    import types
+    from src.utils import prompt_builder
+
+    attempts = []
+
+    def unavailable(*args, **kwargs):
+        attempts.append(args)
+        raise ConnectionError("BPE download failed")
+
+    fake_tiktoken = types.SimpleNamespace(get_encoding=unavailable, encoding_for_model=unavailable)
+    monkeypatch.setitem(sys.modules, "tiktoken", fake_tiktoken)
+    prompt_builder._encoding.cache_clear()
+    try:
+        assert prompt_builder.count_tokens("abcdefgh") == 2
+        assert prompt_builder.count_tokens("abcd") == 1
+        assert prompt_builder.PromptBuilder().text_section("cv", "mot " * 100, 10).endswith("…")
+        assert len(attempts) == 1
+    finally:
+        prompt_builder._encoding.cache_clear()
+
+def test_fit_json_drops_low_priority_fields_without_cutting_values():
+    """Test token-budgeted JSON sections stay valid"""
+    import json
+    from src.utils.prompt_builder import FIELD_PRIORITIES, PromptBuilder, count_tokens, fit_json
+
+    cv_analysis = {
+        "areas_for_improvement": ["Leadership", "Frontend"] * 20,
+        "education": "Master Informatique",
+        "summary": "Développeur backend avec 5 ans d'expérience.",
+        "skills": [f"Compétence {idx}" for idx in range(60)],
+        "experience_years": 5,
+        "hobbies": "",
+    }
+
+    fitted = fit_json(cv_analysis, 120, FIELD_PRIORITIES["cv"])
+    data = json.loads(fitted)
+
+    assert count_tokens(fitted) <= 120
+    assert list(data)[:2] == ["summary", "skills"]
+    assert "hobbies" not in data
+    # Les listes les moins prioritaires sont réduites en premier, élément par élément
+    assert len(data.get("areas_for_improvement", [])) <= 1
+    assert len(data["skills"]) > 1
+    assert all(skill.startswith("Compétence") for skill in data["skills"])
+
+    builder = PromptBuilder()
+    section = builder.json_section("cv", cv_analysis, 120)
+    prompt = builder.finish(f"PROFIL:\n{section}")
+    assert builder.report()["cv"] == count_tokens(section)
+    assert builder.report()["total"] == count_tokens(prompt)
+
+def test_http_pool_reuses_keepalive_connections(monkeypatch):
+    """Test that the shared pool reuses connections across sync, async and web search calls"""
+    import asyncio
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from src.tools import web_search
+    from src.utils.http_pool import HttpPool
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            body = json.dumps({"results": [{"title": "Acme", "url": "https://acme.test"}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(web_search, "TAVILY_API_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    pool = HttpPool(http2=False)
+    tool = web_search.WebSearchTool(pool)
+
+    async def search_twice():
+        return [await tool.asearch_company_info("Acme") for _ in range(2)]
+
+    try:
+        results = [tool.search_company_info("Acme") for _ in range(3)]
+        # Chaque asyncio.run a sa propre boucle, donc son propre pool async, fermé avec elle
+        results += asyncio.run(search_twice()) + asyncio.run(search_twice())
+        assert pool._async_transport._transports == {}
+
+        # Boucle encore ouverte: son pool est fermé par HttpPool.close
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(tool.asearch_company_info("Acme"))
+        transport = next(iter(pool._async_transport._transports.values()))[0]
+    finally:
+        pool.close()
+        server.shutdown()
+    loop.close()
+
+    assert all(result["success"] for result in results)
+    assert results[0]["results"][0]["title"] == "Acme"
+    assert pool.stats() == {"requests": 8, "connections_opened": 4, "connections_reused": 4, "http2": False}
+    assert pool._async_transport._transports == {}
+    assert transport._pool.connections == []
@@ -29,4 +29,210 @@ def test_full_workflow(supervisor):
     
     assert final_state is not None
     assert "questions" in final_state
-    assert len(final_state["questions"]) > 0
\ No newline at end of file
+    assert len(final_state["questions"]) > 0
+
+class _StubAgent:
+    """Agent factice qui compte ses appels"""
+    def __init__(self, **results):
+        self.results = results
+        self.calls = []
+
+    def __getattr__(self, name):
+        if name in self.results:
+            def method(*args, **kwargs):
+                self.calls.append(name)
+                return self.results[name]
+            return method
+
+        # Variante async (aanalyze, aresearch, ...) des méthodes déclarées
+        if name.startswith("a") and name[1:] in self.results:
+            async def amethod(*args, **kwargs):
+                self.calls.append(name)
+                return self.results[name[1:]]
+            return amethod
+
+        raise AttributeError(name)
+
+
+class _StubVectorStore:
+    def add_documents(self, *args, **kwargs):
+        return None
+
+
+@pytest.fixture
+def stub_agents():
+    return {
+        "cv_analyzer": _StubAgent(analyze={"success": True, "analysis": {"skills": ["Python"]}}),
+        "jd_analyzer": _StubAgent(analyze={"success": True, "analysis": {"job_title": "Dev"}}),
+        "company_researcher": _StubAgent(
+            search={"success": True, "results": [{"url": "https://acme.test", "content": "ACME"}]},
+            research={"success": True, "info": {"company_name": "ACME"}}
+        ),
+        "question_generator": _StubAgent(generate_questions={
+            "success": True,
+            "questions": [{"question": "Pourquoi nous?"}]
+        }),
+        "interview_coach": _StubAgent(
+            generate_general_tips={"success": True, "tips": {"preparation_checklist": ["Relire le CV"]}},
+            build_coaching_context='CANDIDAT: {"skills":["Python"]}\nPOSTE: {"job_title":"Dev"}'
+        ),
+    }
+
+
+def test_resume_after_review_only_runs_tips(stub_agents):
+    """Test that resuming from the checkpoint does not replay the analysis"""
+    from langgraph.checkpoint.memory import MemorySaver
+
+    supervisor = InterviewPrepSupervisor(stub_agents, _StubVectorStore(), MemorySaver())
+    config = {"configurable": {"thread_id": "test_resume"}}
+    initial_state = {
+        "cv_text": "CV",
+        "jd_text": "JD",
+        "company_name": "ACME",
+        "user_answers": [],
+        "feedback_history": [],
+    }
+
+    for _ in supervisor.graph.stream(initial_state, config):
+        pass
+    assert supervisor.graph.get_state(config).next == ("human_review",)
+
+    final_state = None
+    for update in supervisor.resume_after_review(config, "approved"):
+        final_state = list(update.values())[0]
+
+    assert final_state["general_tips"]["preparation_checklist"] == ["Relire le CV"]
+    # Le contexte de coaching est calculé une fois après l'analyse
+    assert '"job_title":"Dev"' in final_state["coaching_context"]
+    assert stub_agents["cv_analyzer"].calls == ["analyze"]
+    # La recherche web est lancée en parallèle des analyses, puis réutilisée
+    assert stub_agents["company_researcher"].calls == ["search", "research"]
+    assert stub_agents["question_generator"].calls == ["generate_questions"]
+    assert stub_agents["interview_coach"].calls == ["build_coaching_context", "generate_general_tips"]
+    assert supervisor.graph.get_state(config).next == ("conduct_interview",)
+
+
+def test_coaching_context_left_empty_when_an_analysis_failed(stub_agents):
+    """Test that a failed analysis does not freeze an empty coaching digest in the state"""
+    from langgraph.checkpoint.memory import MemorySaver
+
+    supervisor = InterviewPrepSupervisor(stub_agents, _StubVectorStore(), MemorySaver())
+    merged = supervisor._merge_analyses({}, {}, "CV text is empty", {"job_title": "Dev"}, "")
+
+    assert merged["coaching_context"] == ""
+    assert merged["error"] == "CV: CV text is empty"
+    assert stub_agents["interview_coach"].calls == []
+
+
+def test_async_workflow_uses_async_agents(stub_agents):
+    """Test the native asyncio path through graph.astream"""
+    import asyncio
+    from langgraph.checkpoint.memory import MemorySaver
+
+    supervisor = InterviewPrepSupervisor(stub_agents, _StubVectorStore(), MemorySaver())
+    config = {"configurable": {"thread_id": "test_async"}}
+    initial_state = {
+        "cv_text": "CV",
+        "jd_text": "JD",
+        "company_name": "ACME",
+        "user_answers": [],
+        "feedback_history": [],
+    }
+
+    async def run():
+        last_state = None
+        async for update in supervisor.graph.astream(initial_state, config):
+            last_state = list(update.values())[0]
+        async for update in await supervisor.aresume_after_review(config, "approved"):
+            last_state = list(update.values())[0]
+        return last_state
+
+    final_state = asyncio.run(run())
+
+    assert final_state["general_tips"]["preparation_checklist"] == ["Relire le CV"]
+    assert stub_agents["cv_analyzer"].calls == ["aanalyze"]
+    assert stub_agents["jd_analyzer"].calls == ["aanalyze"]
+    assert stub_agents["interview_coach"].calls == ["build_coaching_context", "agenerate_general_tips"]
+
+
+def test_sqlite_checkpointer_survives_restart_and_prunes(stub_agents, tmp_path):
+    """Test that sessions resume from disk and old checkpoints/sessions are evicted"""
+    from src.utils.checkpointer import PrunableSqliteSaver
+
+    path = str(tmp_path / "checkpoints.db")
+    initial_state = {
+        "cv_text": "CV",
+        "jd_text": "JD",
+        "company_name": "ACME",
+        "user_answers": [],
+        "feedback_history": [],
+    }
+
+    saver = PrunableSqliteSaver(path, keep_last=2, max_threads=1)
+    supervisor = InterviewPrepSupervisor(stub_agents, _StubVectorStore(), saver)
+    for thread_id in ("old_session", "new_session"):
+        for _ in supervisor.graph.stream(initial_state, {"configurable": {"thread_id": thread_id}}):
+            pass
+    saver.close()
+
+    # Un nouveau process relit la session depuis le disque et la reprend
+    restarted = PrunableSqliteSaver(path, keep_last=2, max_threads=1)
+    supervisor = InterviewPrepSupervisor(stub_agents, _StubVectorStore(), restarted)
+    config = {"configurable": {"thread_id": "new_session"}}
+    assert supervisor.graph.get_state(config).next == ("human_review",)
+    for _ in supervisor.resume_after_review(config, "approved"):
+        pass
+    assert supervisor.graph.get_state(config).next == ("conduct_interview",)
+
+    restarted.prune()
+    stats = restarted.stats()
+    assert stats["threads"] == 1
+    assert stats["evicted_threads"] == 1
+    assert stats["checkpoints"] <= 2
+    assert not supervisor.graph.get_state({"configurable": {"thread_id": "old_session"}}).values
+
+
+def test_batch_runner_streams_results_and_resumes(stub_agents, tmp_path):
+    """Test the headless batch runner: JSONL output, resume after a crash, latency report"""
+    import asyncio
+    import json
+    from src.cli.batch_prep import BatchRunner, discover_items, percentile
+    from src.utils.checkpointer import PrunableSqliteSaver
+
+    cv_dir = tmp_path / "cvs"
+    cv_dir.mkdir()
+    for name in ("alice", "bob"):
+        (cv_dir / f"{name}.txt").write_text(f"CV de {name}", encoding="utf-8")
+    (tmp_path / "offre.txt").write_text("Développeur Python", encoding="utf-8")
+    items = discover_items(str(cv_dir), str(tmp_path / "offre.txt"), "ACME")
+    output = tmp_path / "out" / "results.jsonl"
+    output.parent.mkdir()
+    # Ligne tronquée laissée par un arrêt brutal
+    output.write_text('{"id": "alice", "stat', encoding="utf-8")
+
+    supervisor = InterviewPrepSupervisor(
+        stub_agents, _StubVectorStore(), PrunableSqliteSaver(str(tmp_path / "checkpoints.db"))
+    )
+    runner = BatchRunner(supervisor, str(output), concurrency=2, parse_workers=1, monitoring=False)
+
+    # Bob s'est arrêté avant la validation humaine: il reprend de son checkpoint
+    config = {"configurable": {"thread_id": runner.thread_id(items[1], "CV de bob", "Développeur Python")}}
+    for _ in supervisor.graph.stream(supervisor.initial_state("CV de bob", "Développeur Python", "ACME"), config):
+        pass
+
+    report = asyncio.run(runner.run(items))
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()[1:]]
+
+    assert sorted(record["id"] for record in records) == ["alice", "bob"]
+    assert all(record["status"] == "ok" for record in records)
+    assert records[0]["questions"] == [{"question": "Pourquoi nous?"}]
+    assert records[0]["general_tips"]["preparation_checklist"] == ["Relire le CV"]
+    # Analyses: 1 appel synchrone (bob avant l'arrêt) + 1 appel async (alice)
+    assert stub_agents["cv_analyzer"].calls == ["analyze", "aanalyze"]
+    assert report["succeeded"] == 2 and report["failed"] == 0
+    assert report["latency_seconds"]["p99"] >= report["latency_seconds"]["p50"] > 0
+
+    # Relance: tout est déjà traité
+    assert asyncio.run(runner.run(items))["skipped"] == 2
+    assert percentile([3.0, 1.0, 2.0, 4.0], 50) == 2.0
+    assert percentile([3.0, 1.0, 2.0, 4.0], 99) == 4.0